@@ -26,7 +26,7 @@ from pathlib import Path
 import yaml
 
 from dev import REPO_ROOT, VERSIONS_FILE
-from shared import tf_retry
+from shared import tf_plugin_cache, tf_retry
 
 MAX_WORKERS = min(os.cpu_count() or 4, 8)
 
@@ -186,6 +186,10 @@ def main() -> int:
 
     targets = discover_targets()
 
+    cache_dir = tf_plugin_cache.enable()
+    print(f"Warming provider plugin cache at {cache_dir}...")
+    tf_plugin_cache.warm_up(targets, ["mise", "x", f"terraform@{versions[0]}", "--", "terraform"])
+
     jobs: list[TestJob] = []
     # Serialize Terraform versions per target because examples share on-disk working data.
     target_locks = {target: threading.Lock() for target in targets}
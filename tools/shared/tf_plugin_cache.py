@@ -0,0 +1,100 @@
+"""Shared Terraform provider plugin cache for workspace runs and compat jobs.
+
+`enable` points `TF_PLUGIN_CACHE_DIR` at a shared directory (unless the caller already set
+one) and `warm_up` fetches every required provider once, so later `terraform init` calls
+link from the cache instead of downloading. The warm-up holds `tf_retry.plugin_cache_lock`
+exclusively while it populates the cache; the inits after it share the lock and run
+concurrently against the warm cache.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+from collections.abc import Iterable
+from pathlib import Path
+
+from shared import tf_retry
+from tf_utils import versions_tf_common
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = Path.home() / ".terraform.d" / "plugin-cache"
+# Lets Terraform reuse cached packages when a lock file has no checksum for them yet, which
+# weakens the lock file's checksum verification; opt-in only (`enable(may_break_lock_file=True)`
+# or set in the environment).
+MAY_BREAK_LOCK_FILE_ENV = "TF_PLUGIN_CACHE_MAY_BREAK_DEPENDENCY_LOCK_FILE"
+WARM_UP_TF = "providers.tf"
+
+
+def enable(cache_dir: Path | None = None, may_break_lock_file: bool = False) -> Path:
+    if existing := tf_retry.plugin_cache_dir():
+        cache_dir = existing
+    cache_dir = cache_dir or DEFAULT_CACHE_DIR
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    os.environ[tf_retry.PLUGIN_CACHE_ENV] = str(cache_dir)
+    if may_break_lock_file:
+        os.environ.setdefault(MAY_BREAK_LOCK_FILE_ENV, "true")
+    return cache_dir
+
+
+def collect_provider_constraints(source_dirs: Iterable[Path]) -> dict[str, list[str]]:
+    """Map provider source -> distinct version constraints across `*.tf` in `source_dirs`."""
+    constraints: dict[str, list[str]] = {}
+    for source_dir in source_dirs:
+        for tf_file in sorted(source_dir.glob("*.tf")):
+            data = versions_tf_common.parse_versions_tf_dict(tf_file.read_text())
+            if data is None:
+                continue
+            for entry in versions_tf_common.all_provider_entries(data):
+                source = (entry.source or f"hashicorp/{entry.name}").lower()
+                versions = constraints.setdefault(source, [])
+                if entry.version and entry.version not in versions:
+                    versions.append(entry.version)
+    return constraints
+
+
+def generate_warm_up_tf(constraints: dict[str, list[str]]) -> str:
+    lines = ["terraform {", "  required_providers {"]
+    for i, (source, versions) in enumerate(sorted(constraints.items())):
+        lines.append(f"    p{i} = {{")
+        lines.append(f'      source  = "{source}"')
+        if versions:
+            lines.append(f'      version = "{", ".join(versions)}"')
+        lines.append("    }")
+    lines.extend(["  }", "}", ""])
+    return "\n".join(lines)
+
+
+def warm_up(
+    source_dirs: Iterable[Path],
+    terraform_cmd: list[str] | None = None,
+    pinned: dict[str, str] | None = None,
+) -> bool:
+    """Fetch each provider required by `source_dirs` into the plugin cache with one init.
+
+    `pinned` replaces the constraints of a provider source (e.g. an exact version override).
+    Failures are logged and ignored: every job still runs its own init afterwards.
+    """
+    if tf_retry.plugin_cache_dir() is None:
+        return False
+    constraints = collect_provider_constraints(source_dirs)
+    for source, version in (pinned or {}).items():
+        constraints[source.lower()] = [f"= {version}"]
+    if not constraints:
+        return False
+    cmd = [*(terraform_cmd or ["terraform"]), "init", "-backend=false", "-input=false"]
+    with tempfile.TemporaryDirectory(prefix="tf-plugin-cache-") as tmp:
+        work_dir = Path(tmp)
+        (work_dir / WARM_UP_TF).write_text(generate_warm_up_tf(constraints))
+        logger.info(f"Warming plugin cache with {len(constraints)} providers...")
+        try:
+            tf_retry.run_terraform_init(cmd, work_dir, lock_plugin_cache=True)
+        except tf_retry.TerraformInitError as e:
+            logger.warning(f"plugin cache warm-up failed: {e.stderr[:200]}")
+            return False
+        except OSError as e:
+            logger.warning(f"plugin cache warm-up failed: {e}")
+            return False
+    return True
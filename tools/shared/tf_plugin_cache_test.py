@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from shared import tf_plugin_cache, tf_retry
+
+VERSIONS_TF = """\
+terraform {
+  required_providers {
+    mongodbatlas = {
+      source  = "mongodb/mongodbatlas"
+      version = "~> 2.14"
+    }
+    random = {
+      source  = "hashicorp/random"
+      version = "~> 3.0"
+    }
+  }
+}
+"""
+
+EXAMPLE_VERSIONS_TF = """\
+terraform {
+  required_providers {
+    mongodbatlas = {
+      source  = "mongodb/mongodbatlas"
+      version = "~> 2.15"
+    }
+  }
+}
+
+provider "mongodbatlas" {}
+"""
+
+
+@pytest.fixture()
+def source_dirs(tmp_path: Path) -> list[Path]:
+    ws_dir = tmp_path / "workspace"
+    example_dir = tmp_path / "example"
+    for d, content in ((ws_dir, VERSIONS_TF), (example_dir, EXAMPLE_VERSIONS_TF)):
+        d.mkdir()
+        (d / "versions.tf").write_text(content)
+    return [ws_dir, example_dir]
+
+
+def test_collect_provider_constraints_merges_dirs(source_dirs: list[Path]):
+    assert tf_plugin_cache.collect_provider_constraints(source_dirs) == {
+        "mongodb/mongodbatlas": ["~> 2.14", "~> 2.15"],
+        "hashicorp/random": ["~> 3.0"],
+    }
+
+
+def test_generate_warm_up_tf():
+    content = tf_plugin_cache.generate_warm_up_tf(
+        {"mongodb/mongodbatlas": ["~> 2.14", "~> 2.15"], "hashicorp/random": []}
+    )
+    assert 'source  = "mongodb/mongodbatlas"' in content
+    assert 'version = "~> 2.14, ~> 2.15"' in content
+    assert 'source  = "hashicorp/random"' in content
+    assert content.count("version =") == 1
+
+
+def test_enable_respects_existing_cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv(tf_retry.PLUGIN_CACHE_ENV, str(tmp_path / "mine"))
+    monkeypatch.setenv(tf_plugin_cache.MAY_BREAK_LOCK_FILE_ENV, "false")
+    assert tf_plugin_cache.enable(tmp_path / "default") == tmp_path / "mine"
+    assert (tmp_path / "mine").is_dir()
+    assert not (tmp_path / "default").exists()
+    assert tf_plugin_cache.os.environ[tf_plugin_cache.MAY_BREAK_LOCK_FILE_ENV] == "false"
+
+
+def test_enable_leaves_lock_file_checks_alone_unless_asked(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.delenv(tf_retry.PLUGIN_CACHE_ENV, raising=False)
+    monkeypatch.delenv(tf_plugin_cache.MAY_BREAK_LOCK_FILE_ENV, raising=False)
+    tf_plugin_cache.enable(tmp_path / "cache")
+    assert tf_plugin_cache.MAY_BREAK_LOCK_FILE_ENV not in tf_plugin_cache.os.environ
+    tf_plugin_cache.enable(tmp_path / "cache", may_break_lock_file=True)
+    assert tf_plugin_cache.os.environ[tf_plugin_cache.MAY_BREAK_LOCK_FILE_ENV] == "true"
+
+
+def test_warm_up_runs_single_init_with_pinned_version(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, source_dirs: list[Path]
+):
+    monkeypatch.setenv(tf_retry.PLUGIN_CACHE_ENV, str(tmp_path / "cache"))
+    calls: list[tuple[list[str], str]] = []
+
+    def fake_init(
+        cmd: list[str], work_dir: Path, lock_plugin_cache: bool = False
+    ) -> subprocess.CompletedProcess:
+        assert lock_plugin_cache
+        calls.append((cmd, (work_dir / tf_plugin_cache.WARM_UP_TF).read_text()))
+        return subprocess.CompletedProcess(args=cmd, returncode=0)
+
+    monkeypatch.setattr(tf_retry, "run_terraform_init", fake_init)
+
+    assert tf_plugin_cache.warm_up(source_dirs, pinned={"mongodb/mongodbatlas": "2.15.1"})
+    assert len(calls) == 1
+    cmd, content = calls[0]
+    assert cmd == ["terraform", "init", "-backend=false", "-input=false"]
+    assert 'version = "= 2.15.1"' in content
+    assert 'version = "~> 3.0"' in content
+
+
+def test_warm_up_failure_is_not_fatal(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, source_dirs: list[Path]
+):
+    monkeypatch.setenv(tf_retry.PLUGIN_CACHE_ENV, str(tmp_path / "cache"))
+
+    def failing_init(cmd: list[str], work_dir: Path, **_) -> subprocess.CompletedProcess:
+        raise tf_retry.TerraformInitError("Invalid provider configuration", work_dir)
+
+    monkeypatch.setattr(tf_retry, "run_terraform_init", failing_init)
+
+    assert not tf_plugin_cache.warm_up(source_dirs)
+
+
+def test_warm_up_skipped_without_cache_dir(
+    monkeypatch: pytest.MonkeyPatch, source_dirs: list[Path]
+):
+    monkeypatch.delenv(tf_retry.PLUGIN_CACHE_ENV, raising=False)
+    assert not tf_plugin_cache.warm_up(source_dirs)
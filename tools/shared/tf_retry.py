@@ -1,9 +1,15 @@
 from __future__ import annotations
 
 import contextlib
+import fcntl
 import logging
+import os
+import re
 import shutil
 import subprocess
+import threading
+from collections import Counter
+from collections.abc import Generator
 from pathlib import Path
 
 from tenacity import (
@@ -25,6 +31,20 @@ TRANSIENT_PATTERNS = [
 ]
 
 CHECKSUM_PATTERN = "does not match any of the checksums recorded"
+# e.g. "Error while installing mongodb/mongodbatlas v2.14.0" or
+# "the local package for registry.terraform.io/mongodb/mongodbatlas 2.14.0"
+PROVIDER_VERSION_PATTERN = re.compile(
+    r"(?:(?P<host>[\w-]+(?:\.[\w-]+)+)/)?(?P<namespace>[\w-]+)/(?P<type>[\w-]+)"
+    r" v?(?P<version>\d+\.\d+\.\d+(?:-[\w.]+)?)"
+)
+DEFAULT_PROVIDER_HOST = "registry.terraform.io"
+PLUGIN_CACHE_ENV = "TF_PLUGIN_CACHE_DIR"
+PLUGIN_CACHE_LOCK_FILE = ".lock"
+TF_DATA_DIR_ENV = "TF_DATA_DIR"
+
+# Retries of `run_terraform_init` in this process, per work dir (see `retry_count`).
+_retries: Counter[Path] = Counter()
+_retries_lock = threading.Lock()
 
 
 class TerraformInitError(RuntimeError):
@@ -40,13 +60,69 @@ def _is_transient(error: BaseException) -> bool:
     return any(p in error.stderr for p in TRANSIENT_PATTERNS)
 
 
-def _cleanup_terraform_cache(work_dir: Path) -> None:
-    for subdir in (".terraform/providers", ".terraform/modules"):
-        path = work_dir / subdir
-        if path.exists():
-            logger.info(f"removing stale cache: {path}")
-            with contextlib.suppress(FileNotFoundError):
-                shutil.rmtree(path)
+def plugin_cache_dir() -> Path | None:
+    if value := os.environ.get(PLUGIN_CACHE_ENV):
+        return Path(value)
+    return None
+
+
+@contextlib.contextmanager
+def plugin_cache_lock(shared: bool = False) -> Generator[None]:
+    """Lock the shared plugin cache; Terraform does not lock it itself.
+
+    Inits that only link from the cache hold it `shared` and run concurrently; populating
+    or removing cached packages holds it exclusively, so no init links from a package
+    while it is written or deleted.
+    """
+    cache_dir = plugin_cache_dir()
+    if cache_dir is None:
+        yield
+        return
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    with (cache_dir / PLUGIN_CACHE_LOCK_FILE).open("w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def data_dir(work_dir: Path) -> Path:
+    return work_dir / os.environ.get(TF_DATA_DIR_ENV, ".terraform")
+
+
+def _provider_package_dirs(stderr: str) -> set[Path]:
+    """Relative `<host>/<namespace>/<type>/<version>` dirs of providers named in `stderr`."""
+    return {
+        Path(m["host"] or DEFAULT_PROVIDER_HOST, m["namespace"], m["type"], m["version"])
+        for m in PROVIDER_VERSION_PATTERN.finditer(stderr)
+    }
+
+
+def _remove_tree(path: Path) -> None:
+    if path.exists():
+        logger.info(f"removing stale cache: {path}")
+        with contextlib.suppress(FileNotFoundError):
+            shutil.rmtree(path)
+
+
+def _cleanup_terraform_cache(work_dir: Path, stderr: str = "") -> None:
+    """Drop only the provider packages named in `stderr` from the working dir and plugin cache.
+
+    Falls back to removing the whole providers/modules dirs when no provider can be parsed.
+    """
+    tf_data_dir = data_dir(work_dir)
+    packages = _provider_package_dirs(stderr)
+    if not packages:
+        for subdir in ("providers", "modules"):
+            _remove_tree(tf_data_dir / subdir)
+        return
+    for package in sorted(packages):
+        _remove_tree(tf_data_dir / "providers" / package)
+    if (cache_dir := plugin_cache_dir()) is not None:
+        with plugin_cache_lock():
+            for package in sorted(packages):
+                _remove_tree(cache_dir / package)
 
 
 def _log_retry(state: RetryCallState) -> None:
@@ -55,10 +131,19 @@ def _log_retry(state: RetryCallState) -> None:
     logger.warning(f"terraform init retry #{state.attempt_number} in {work_dir}")
 
 
+def retry_count(work_dir: Path) -> int:
+    """Number of `run_terraform_init` retries in `work_dir` so far in this process."""
+    with _retries_lock:
+        return _retries[work_dir]
+
+
 def _before_retry(state: RetryCallState) -> None:
     exc = state.outcome.exception() if state.outcome else None
+    if isinstance(exc, TerraformInitError):
+        with _retries_lock:
+            _retries[exc.work_dir] += 1
     if isinstance(exc, TerraformInitError) and CHECKSUM_PATTERN in exc.stderr:
-        _cleanup_terraform_cache(exc.work_dir)
+        _cleanup_terraform_cache(exc.work_dir, exc.stderr)
     _log_retry(state)
 
 
@@ -69,8 +154,17 @@ def _before_retry(state: RetryCallState) -> None:
     before_sleep=_before_retry,
     reraise=True,
 )
-def run_terraform_init(cmd: list[str], work_dir: Path) -> subprocess.CompletedProcess:
-    result = subprocess.run(cmd, cwd=work_dir, capture_output=True, text=True)
+def run_terraform_init(
+    cmd: list[str], work_dir: Path, lock_plugin_cache: bool = False
+) -> subprocess.CompletedProcess:
+    """Run `terraform init`, retrying transient registry and checksum errors.
+
+    Only cache-populating inits (the warm-up) should `lock_plugin_cache` exclusively; the
+    others hold the lock shared, so concurrent workspaces, shards and copies link providers
+    from the warm cache together but never while a checksum retry removes a package.
+    """
+    with plugin_cache_lock(shared=not lock_plugin_cache):
+        result = subprocess.run(cmd, cwd=work_dir, capture_output=True, text=True)
     if result.returncode != 0:
         raise TerraformInitError(result.stderr, work_dir)
     return result
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import subprocess
+import threading
 from pathlib import Path
 from unittest.mock import patch
 
@@ -35,6 +36,7 @@ def test_transient_error_retries_then_succeeds(tmp_path: Path):
     ):
         result = run_terraform_init(["terraform", "init"], tmp_path)
     assert result.returncode == 0
+    assert tf_retry.retry_count(tmp_path) == 1
 
 
 def test_non_transient_error_no_retry(tmp_path: Path):
@@ -95,3 +97,82 @@ def test_checksum_error_cleans_cache(tmp_path: Path):
         run_terraform_init(["terraform", "init"], tmp_path)
     assert not providers_dir.exists()
     assert not modules_dir.exists()
+
+
+def test_checksum_error_repairs_only_named_provider(tmp_path: Path, monkeypatch):
+    cache_dir = tmp_path / "plugin-cache"
+    monkeypatch.setenv(tf_retry.PLUGIN_CACHE_ENV, str(cache_dir))
+    monkeypatch.delenv(tf_retry.TF_DATA_DIR_ENV, raising=False)
+    work_dir = tmp_path / "ws"
+    package = Path("registry.terraform.io", "mongodb", "mongodbatlas", "2.14.0")
+    other = Path("registry.terraform.io", "hashicorp", "random", "3.6.0")
+    for root in (work_dir / ".terraform" / "providers", cache_dir):
+        (root / package).mkdir(parents=True)
+        (root / other).mkdir(parents=True)
+    modules_dir = work_dir / ".terraform" / "modules"
+    modules_dir.mkdir(parents=True)
+
+    checksum_err = (
+        "Error while installing mongodb/mongodbatlas v2.14.0: the local package for "
+        "registry.terraform.io/mongodb/mongodbatlas 2.14.0 does not match any of the "
+        "checksums recorded in the dependency lock file"
+    )
+    side_effects = [_make_result(1, stderr=checksum_err), _make_result(0)]
+    with (
+        patch(f"{MODULE}.subprocess.run", side_effect=side_effects),
+        patch.object(tf_retry.run_terraform_init.retry, "wait", return_value=0),  # pyright: ignore[reportFunctionMemberAccess]
+    ):
+        run_terraform_init(["terraform", "init"], work_dir)
+
+    for root in (work_dir / ".terraform" / "providers", cache_dir):
+        assert not (root / package).exists()
+        assert (root / other).exists()
+    assert modules_dir.exists()
+
+
+def _lock_blocks(cache_dir: Path, operation: int) -> bool:
+    with (cache_dir / tf_retry.PLUGIN_CACHE_LOCK_FILE).open("w") as f:
+        try:
+            tf_retry.fcntl.flock(f, operation | tf_retry.fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        tf_retry.fcntl.flock(f, tf_retry.fcntl.LOCK_UN)
+        return False
+
+
+@pytest.mark.parametrize("lock_plugin_cache", [True, False])
+def test_init_holds_plugin_cache_lock_exclusively_only_when_asked(
+    tmp_path: Path, monkeypatch, lock_plugin_cache: bool
+):
+    cache_dir = tmp_path / "plugin-cache"
+    cache_dir.mkdir()
+    monkeypatch.setenv(tf_retry.PLUGIN_CACHE_ENV, str(cache_dir))
+    blocked: list[tuple[bool, bool]] = []
+
+    def record_lock(*_, **__):
+        shared = _lock_blocks(cache_dir, tf_retry.fcntl.LOCK_SH)
+        blocked.append((shared, _lock_blocks(cache_dir, tf_retry.fcntl.LOCK_EX)))
+        return _make_result(0)
+
+    with patch(f"{MODULE}.subprocess.run", side_effect=record_lock):
+        run_terraform_init(["terraform", "init"], tmp_path, lock_plugin_cache=lock_plugin_cache)
+    assert blocked == [(lock_plugin_cache, True)]
+
+
+def test_cache_cleanup_waits_for_inits_linking_from_the_cache(tmp_path: Path, monkeypatch):
+    cache_dir = tmp_path / "plugin-cache"
+    monkeypatch.setenv(tf_retry.PLUGIN_CACHE_ENV, str(cache_dir))
+    package = Path("registry.terraform.io", "mongodb", "mongodbatlas", "2.14.0")
+    (cache_dir / package).mkdir(parents=True)
+    stderr = "Error while installing mongodb/mongodbatlas v2.14.0"
+
+    with tf_retry.plugin_cache_lock(shared=True):
+        cleanup = threading.Thread(
+            target=tf_retry._cleanup_terraform_cache, args=(tmp_path / "ws", stderr)
+        )
+        cleanup.start()
+        cleanup.join(timeout=0.2)
+        assert cleanup.is_alive()
+        assert (cache_dir / package).exists()
+    cleanup.join()
+    assert not (cache_dir / package).exists()
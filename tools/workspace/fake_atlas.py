@@ -0,0 +1,334 @@
+# path-sync copy -n sdlc
+"""In-memory stand-in for the Atlas Admin API endpoints used by the module's resources.
+
+Serves `/api/atlas/v2/...` for projects (settings, limits, teams, IP addresses), IP
+access lists, maintenance windows, backup compliance policies, log integrations and
+alert configurations, so apply/import/destroy loops run locally in seconds. Paths are
+handled generically: a segment in `COLLECTIONS` is a list that accepts POST, the segment
+after it is an item key, anything else is a singleton object. Requests are not
+authenticated (digest auth clients only answer a challenge, which is never sent).
+
+Start it in-process with `run --fake-atlas` (state lasts for that run) or standalone with
+`python -m workspace.fake_atlas` and export the printed variables so several runs share
+the same state.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import copy
+import json
+import os
+import threading
+import time
+from collections import Counter
+from collections.abc import Generator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import typer
+
+app = typer.Typer()
+
+API_PREFIX = "/api/atlas/v2/"
+BASE_URL_ENV = "MONGODB_ATLAS_BASE_URL"
+PUBLIC_KEY_ENV = "MONGODB_ATLAS_PUBLIC_API_KEY"
+PRIVATE_KEY_ENV = "MONGODB_ATLAS_PRIVATE_API_KEY"
+# Service account / token credentials would make the provider request an OAuth token.
+UNSET_ENVS = (
+    "MONGODB_ATLAS_CLIENT_ID",
+    "MONGODB_ATLAS_CLIENT_SECRET",
+    "MONGODB_ATLAS_ACCESS_TOKEN",
+)
+COLLECTIONS = frozenset(
+    {
+        "groups",
+        "accessList",
+        "alertConfigs",
+        "clusters",
+        "limits",
+        "logIntegrations",
+        "teams",
+    }
+)
+# Item key fields; the first one present in a created item is used, otherwise a new `id`.
+KEY_FIELDS: dict[str, tuple[str, ...]] = {
+    "accessList": ("ipAddress", "cidrBlock", "awsSecurityGroup"),
+    "limits": ("name",),
+}
+# Listed as a bare JSON array instead of a paginated {"results": [...]} object.
+PLAIN_LISTS = frozenset({"limits"})
+# Items created by PATCH/PUT on their key instead of POST.
+UPSERT_COLLECTIONS = frozenset({"limits"})
+SINGLETONS = frozenset({"settings", "maintenanceWindow", "ipAddresses", "backupCompliancePolicy"})
+# GET answers these before anything was written; other singletons are 404 until written.
+SINGLETON_DEFAULTS: dict[str, dict[str, Any]] = {
+    "settings": {
+        "isCollectDatabaseSpecificsStatisticsEnabled": True,
+        "isDataExplorerEnabled": True,
+        "isExtendedStorageSizesEnabled": False,
+        "isPerformanceAdvisorEnabled": True,
+        "isRealtimePerformancePanelEnabled": True,
+        "isSchemaAdvisorEnabled": True,
+    },
+    "maintenanceWindow": {
+        "dayOfWeek": 0,
+        "hourOfDay": 0,
+        "autoDeferOnceEnabled": False,
+        "startASAP": False,
+        "numberOfDeferrals": 0,
+    },
+    "ipAddresses": {"services": {"clusters": []}},
+}
+ACCESS_LIST_STATUS = "status"
+GROUP_BY_NAME = "byName"
+
+ApiPath = tuple[str, ...]
+
+
+def _now() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+def route_of(path: ApiPath) -> str:
+    """Path with item keys replaced by `{id}`, used to count requests per endpoint."""
+    parts = [
+        "{id}" if i and path[i - 1] in COLLECTIONS and part != GROUP_BY_NAME else part
+        for i, part in enumerate(path)
+    ]
+    return "/".join(parts)
+
+
+class FakeAtlas:
+    """Thread-safe in-memory store; `handle` maps one request to (status, JSON payload)."""
+
+    def __init__(self) -> None:
+        self.objects: dict[ApiPath, dict[str, Any]] = {}
+        self.requests: Counter[str] = Counter()
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def _new_id(self) -> str:
+        self._next_id += 1
+        return f"{self._next_id:024x}"
+
+    def _children(self, path: ApiPath) -> list[dict[str, Any]]:
+        depth = len(path) + 1
+        return [obj for key, obj in self.objects.items() if len(key) == depth and key[:-1] == path]
+
+    def _list(self, path: ApiPath, query: dict[str, list[str]]) -> Any:
+        items = self._children(path)
+        if path[-1] in PLAIN_LISTS:
+            return items
+        if int(query.get("pageNum", ["1"])[0]) > 1:
+            items = []
+        return {"results": items, "totalCount": len(self._children(path)), "links": []}
+
+    def _create(self, path: ApiPath, body: dict[str, Any]) -> dict[str, Any]:
+        collection = path[-1]
+        item = dict(body)
+        if collection == "groups":
+            item.setdefault("clusterCount", 0)
+            item.setdefault("created", _now())
+        if collection == "accessList" and "ipAddress" in item:
+            item.setdefault("cidrBlock", f"{item['ipAddress']}/32")
+        if collection in ("accessList", "alertConfigs", "logIntegrations") and len(path) > 1:
+            item.setdefault("groupId", path[-2])
+        fields = KEY_FIELDS.get(collection, ("id",))
+        key = next((item[f] for f in fields if item.get(f)), None)
+        if key is None:
+            key = item["id"] = self._new_id()
+        self.objects[(*path, str(key))] = item
+        return item
+
+    def _delete(self, path: ApiPath) -> bool:
+        doomed = [key for key in self.objects if key[: len(path)] == path]
+        for key in doomed:
+            del self.objects[key]
+        return bool(doomed)
+
+    def handle(
+        self, method: str, path: ApiPath, query: dict[str, list[str]], body: Any
+    ) -> tuple[int, Any]:
+        with self._lock:
+            self.requests[f"{method} {route_of(path)}"] += 1
+            if not path:
+                return _not_found(path)
+            if path[:2] == ("groups", GROUP_BY_NAME) and len(path) == 3 and method == "GET":
+                groups = [g for g in self._children(("groups",)) if g.get("name") == path[2]]
+                return (200, groups[0]) if groups else _not_found(path)
+            if path[-1] in COLLECTIONS:
+                return self._handle_collection(method, path, query, body)
+            return self._handle_object(method, path, body)
+
+    def _handle_collection(
+        self, method: str, path: ApiPath, query: dict[str, list[str]], body: Any
+    ) -> tuple[int, Any]:
+        if len(path) >= 3 and path[:2] not in self.objects:
+            return _not_found(path[:2])
+        if method == "GET":
+            return 200, self._list(path, query)
+        if method == "POST":
+            # Access list entries are posted as a list and answered with the full list.
+            if isinstance(body, list):
+                for entry in body:
+                    self._create(path, entry)
+                return 201, self._list(path, query)
+            return 201, self._create(path, body or {})
+        return _method_not_allowed(method, path)
+
+    def _new_object(self, path: ApiPath) -> dict[str, Any]:
+        """Initial content of an upserted singleton or item, before the request body."""
+        name = path[-1]
+        if name in SINGLETONS:
+            return copy.deepcopy(SINGLETON_DEFAULTS.get(name, {}))
+        return {KEY_FIELDS.get(path[-2], ("id",))[0]: name}
+
+    def _handle_object(self, method: str, path: ApiPath, body: Any) -> tuple[int, Any]:
+        name = path[-1]
+        stored = self.objects.get(path)
+        parent_exists = len(path) < 3 or path[:2] in self.objects
+        upsertable = parent_exists and (
+            name in SINGLETONS or (len(path) > 1 and path[-2] in UPSERT_COLLECTIONS)
+        )
+        if method == "GET":
+            if stored is not None:
+                return 200, stored
+            if name == ACCESS_LIST_STATUS and path[:-1] in self.objects:
+                return 200, {"STATUS": "ACTIVE"}
+            if name in SINGLETON_DEFAULTS and parent_exists:
+                return 200, copy.deepcopy(SINGLETON_DEFAULTS[name])
+            return _not_found(path)
+        if method in ("PATCH", "PUT"):
+            if stored is None and not upsertable:
+                return _not_found(path)
+            if stored is not None and method == "PATCH":
+                updated = dict(stored)
+            else:
+                updated = self._new_object(path)
+                if stored is not None and "id" in stored:
+                    updated["id"] = stored["id"]
+            updated.update(body or {})
+            self.objects[path] = updated
+            return 200, updated
+        if method == "DELETE":
+            if self._delete(path) or (name in SINGLETONS and parent_exists):
+                return 204, None
+            return _not_found(path)
+        return _method_not_allowed(method, path)
+
+    def summary(self) -> str:
+        total = sum(self.requests.values())
+        lines = [f"Fake Atlas served {total} requests"]
+        lines.extend(f"  {count:>5}  {route}" for route, count in self.requests.most_common())
+        return "\n".join(lines)
+
+
+def _error(status: int, code: str, detail: str) -> tuple[int, dict[str, Any]]:
+    return status, {"detail": detail, "error": status, "errorCode": code, "reason": detail}
+
+
+def _not_found(path: ApiPath) -> tuple[int, dict[str, Any]]:
+    return _error(404, "RESOURCE_NOT_FOUND", f"No resource at {API_PREFIX}{'/'.join(path)}")
+
+
+def _method_not_allowed(method: str, path: ApiPath) -> tuple[int, dict[str, Any]]:
+    return _error(405, "METHOD_NOT_ALLOWED", f"{method} not supported on {'/'.join(path)}")
+
+
+def _handler(fake: FakeAtlas) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _respond(self) -> None:
+            url = urlsplit(self.path)
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            if not url.path.startswith(API_PREFIX):
+                status, payload = _error(404, "RESOURCE_NOT_FOUND", f"Unknown path {url.path}")
+            else:
+                try:
+                    body = json.loads(raw) if raw else None
+                except json.JSONDecodeError:
+                    status, payload = _error(400, "INVALID_JSON", "Request body is not JSON")
+                else:
+                    path = tuple(unquote(p) for p in url.path[len(API_PREFIX) :].split("/") if p)
+                    status, payload = fake.handle(self.command, path, parse_qs(url.query), body)
+            data = b"" if payload is None else json.dumps(payload).encode()
+            self.send_response(status)
+            # Versioned clients send e.g. application/vnd.atlas.2023-01-01+json and expect it back.
+            accept = self.headers.get("Accept", "")
+            content_type = accept if "json" in accept and "," not in accept else "application/json"
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = _respond
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    return Handler
+
+
+@contextlib.contextmanager
+def serve(host: str = "127.0.0.1", port: int = 0) -> Generator[tuple[FakeAtlas, str]]:
+    """Serve a fresh FakeAtlas in a background thread; yields it with its base URL."""
+    fake = FakeAtlas()
+    server = ThreadingHTTPServer((host, port), _handler(fake))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, args=(0.1,), daemon=True)
+    thread.start()
+    try:
+        yield fake, f"http://{host}:{server.server_address[1]}/"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def provider_env(base_url: str) -> dict[str, str]:
+    return {BASE_URL_ENV: base_url, PUBLIC_KEY_ENV: "fake-public", PRIVATE_KEY_ENV: "fake-private"}
+
+
+@contextlib.contextmanager
+def session(enabled: bool) -> Generator[None]:
+    """Point the provider of terraform subprocesses at a fresh fake for the block."""
+    if not enabled:
+        yield
+        return
+    saved = dict(os.environ)
+    with serve() as (fake, base_url):
+        typer.echo(f"Fake Atlas Admin API at {base_url}")
+        for name in UNSET_ENVS:
+            os.environ.pop(name, None)
+        os.environ.update(provider_env(base_url))
+        try:
+            yield
+        finally:
+            os.environ.clear()
+            os.environ.update(saved)
+            typer.echo(fake.summary())
+
+
+@app.command()
+def main(
+    host: str = typer.Option("127.0.0.1", "--host"),
+    port: int = typer.Option(8080, "--port", "-p"),
+) -> None:
+    with serve(host, port) as (fake, base_url):
+        typer.echo(f"Fake Atlas Admin API at {base_url}; export in the terraform shell:")
+        for name in UNSET_ENVS:
+            typer.echo(f"  unset {name}")
+        for name, value in provider_env(base_url).items():
+            typer.echo(f"  export {name}={value}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        typer.echo(fake.summary())
+
+
+if __name__ == "__main__":
+    app()
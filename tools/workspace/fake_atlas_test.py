@@ -0,0 +1,107 @@
+# path-sync copy -n sdlc
+from __future__ import annotations
+
+import json
+import os
+import urllib.error
+import urllib.request
+from collections.abc import Callable, Generator
+from typing import Any
+
+import pytest
+
+from workspace import fake_atlas
+
+Api = Callable[..., tuple[int, Any]]
+
+
+@pytest.fixture()
+def api() -> Generator[Api]:
+    with fake_atlas.serve() as (_, base_url):
+
+        def call(method: str, path: str, body: Any = None) -> tuple[int, Any]:
+            data = None if body is None else json.dumps(body).encode()
+            request = urllib.request.Request(
+                f"{base_url}api/atlas/v2/{path}", data=data, method=method
+            )
+            request.add_header("Accept", "application/vnd.atlas.2023-01-01+json")
+            try:
+                with urllib.request.urlopen(request) as response:
+                    assert response.headers["Content-Type"] == request.get_header("Accept")
+                    raw = response.read()
+                    return response.status, json.loads(raw) if raw else None
+            except urllib.error.HTTPError as e:
+                return e.code, json.loads(e.read())
+
+        yield call
+
+
+def test_project_lifecycle(api: Api):
+    status, project = api("POST", "groups", {"name": "p1", "orgId": "o1"})
+    assert status == 201
+    assert project["clusterCount"] == 0
+    group = f"groups/{project['id']}"
+    assert api("GET", "groups/byName/p1") == (200, project)
+    assert api("GET", f"{group}/settings")[1]["isDataExplorerEnabled"] is True
+    api("PATCH", f"{group}/settings", {"isDataExplorerEnabled": False})
+    assert api("GET", f"{group}/settings")[1]["isDataExplorerEnabled"] is False
+
+    limit = "atlas.project.deployment.clusters"
+    api("PATCH", f"{group}/limits/{limit}", {"value": 50})
+    assert api("GET", f"{group}/limits") == (200, [{"name": limit, "value": 50}])
+    assert api("GET", f"{group}/teams")[1]["results"] == []
+
+    assert api("DELETE", group) == (204, None)
+    assert api("GET", group)[0] == 404
+    assert api("GET", f"{group}/settings")[1]["errorCode"] == "RESOURCE_NOT_FOUND"
+
+
+def test_access_list_entries_are_keyed_by_ip_or_cidr(api: Api):
+    _, project = api("POST", "groups", {"name": "p1"})
+    access_list = f"groups/{project['id']}/accessList"
+    entries = [{"ipAddress": "198.51.100.10"}, {"cidrBlock": "203.0.113.0/24"}]
+    status, listing = api("POST", access_list, entries)
+    assert (status, listing["totalCount"]) == (201, 2)
+    status, entry = api("GET", f"{access_list}/198.51.100.10")
+    assert (status, entry["cidrBlock"]) == (200, "198.51.100.10/32")
+    assert api("GET", f"{access_list}/203.0.113.0%2F24/status") == (200, {"STATUS": "ACTIVE"})
+    assert api("DELETE", f"{access_list}/203.0.113.0%2F24") == (204, None)
+    assert api("GET", access_list)[1]["totalCount"] == 1
+    assert api("POST", "groups/missing/accessList", entries)[0] == 404
+
+
+def test_singletons_and_items(api: Api):
+    _, project = api("POST", "groups", {"name": "p1"})
+    group = f"groups/{project['id']}"
+    assert api("GET", f"{group}/backupCompliancePolicy")[0] == 404
+    api("PUT", f"{group}/backupCompliancePolicy", {"authorizedEmail": "a@example.com"})
+    assert api("GET", f"{group}/backupCompliancePolicy")[1]["authorizedEmail"] == "a@example.com"
+    api("PATCH", f"{group}/maintenanceWindow", {"dayOfWeek": 7})
+    api("DELETE", f"{group}/maintenanceWindow")
+    assert api("GET", f"{group}/maintenanceWindow")[1]["dayOfWeek"] == 0
+
+    _, alert = api("POST", f"{group}/alertConfigs", {"eventTypeName": "NO_PRIMARY"})
+    assert alert["groupId"] == project["id"]
+    status, updated = api("PUT", f"{group}/alertConfigs/{alert['id']}", {"enabled": False})
+    assert (status, updated) == (200, {"id": alert["id"], "enabled": False})
+    assert api("PATCH", f"{group}/alertConfigs/unknown", {"enabled": True})[0] == 404
+
+
+def test_requests_are_counted_per_route():
+    fake = fake_atlas.FakeAtlas()
+    _, project = fake.handle("POST", ("groups",), {}, {"name": "p1"})
+    fake.handle("GET", ("groups", project["id"]), {}, None)
+    fake.handle("GET", ("groups", project["id"]), {}, None)
+    assert fake.requests == {"POST groups": 1, "GET groups/{id}": 2}
+    assert "3 requests" in fake.summary()
+
+
+def test_session_sets_provider_env_temporarily(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("MONGODB_ATLAS_CLIENT_ID", "real-client")
+    monkeypatch.delenv(fake_atlas.BASE_URL_ENV, raising=False)
+    with fake_atlas.session(True):
+        base_url = os.environ[fake_atlas.BASE_URL_ENV]
+        assert base_url.startswith("http://127.0.0.1:")
+        assert "MONGODB_ATLAS_CLIENT_ID" not in os.environ
+    assert fake_atlas.BASE_URL_ENV not in os.environ
+    assert os.environ["MONGODB_ATLAS_CLIENT_ID"] == "real-client"
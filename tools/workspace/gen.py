@@ -3,11 +3,13 @@
 
 from __future__ import annotations
 
+import json
 from pathlib import Path
+from typing import Any
 
 import typer
 
-from workspace import models
+from workspace import models, snapshot_bundle
 
 app = typer.Typer()
 
@@ -17,6 +19,9 @@ PLAN_SNAPSHOTS_DIR = "plan_snapshots"
 PLAN_SNAPSHOTS_ACTUAL_DIR = "plan_snapshots_actual"
 TEST_PLAN_SNAPSHOT_PY = "test_plan_snapshot.py"
 EXAMPLES_DIR_NAME = "examples"
+# Loaded by `terraform test` from the workspace root; see plan.run_terraform_test_plan.
+OFFLINE_TFTEST = "offline.generated.tftest.hcl"
+OFFLINE_RUN = "offline_plan"
 
 
 def generate_variables_tf(config: models.WsConfig) -> str | None:
@@ -48,13 +53,22 @@ def parse_include_examples(value: str, config: models.WsConfig) -> list[models.E
     ]
 
 
+def example_targets(examples: list[models.Example], config: models.WsConfig) -> list[str]:
+    """`-target` addresses for a partial selection; none when every example is selected."""
+    if {ex.identifier for ex in examples} >= {ex.identifier for ex in config.examples}:
+        return []
+    return [f"module.ex_{ex.identifier}" for ex in examples]
+
+
 def generate_modules_tf(
-    config: models.WsConfig, examples: list[models.Example], ws_dir: Path
+    config: models.WsConfig,
+    examples: list[models.Example],
+    ws_dir: Path,
+    rel_examples: str = f"../../{EXAMPLES_DIR_NAME}",
 ) -> str | None:
     if not examples:
         return None
     examples_dir = models.REPO_ROOT / EXAMPLES_DIR_NAME
-    rel_examples = f"../../{EXAMPLES_DIR_NAME}"
     lines = ["# Generated by workspace - do not edit manually", ""]
     for ex in examples:
         example_path = ex.example_path(examples_dir)
@@ -82,6 +96,51 @@ def generate_modules_tf(
     return "\n".join(lines)
 
 
+def hcl_value(value: Any) -> str:
+    """Render a YAML value as an HCL literal (strings are never interpolated)."""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int | float):
+        return json.dumps(value)
+    if isinstance(value, str):
+        return json.dumps(value).replace("${", "$${").replace("%{", "%%{")
+    if isinstance(value, list):
+        return f"[{', '.join(hcl_value(v) for v in value)}]"
+    if isinstance(value, dict):
+        return (
+            f"{{ {', '.join(f'{hcl_value(str(k))} = {hcl_value(v)}' for k, v in value.items())} }}"
+        )
+    raise ValueError(f"Unsupported value for HCL: {value!r}")
+
+
+def _defaults_block(kind: str, type_name: str, defaults: dict[str, Any]) -> list[str]:
+    lines = [f'  {kind} "{type_name}" {{', "    defaults = {"]
+    lines.extend(f"      {name} = {hcl_value(value)}" for name, value in defaults.items())
+    lines.extend(["    }", "  }"])
+    return lines
+
+
+def generate_offline_tftest(config: models.WsConfig) -> str:
+    """`terraform test` file planning the workspace against mock providers (no credentials)."""
+    lines = ["# Generated by workspace - do not edit manually", ""]
+    for provider in config.offline.mock_providers:
+        lines.append(f'mock_provider "{provider.name}" {{')
+        for type_name, defaults in provider.mock_resources.items():
+            lines.extend(_defaults_block("mock_resource", type_name, defaults))
+        for type_name, defaults in provider.mock_data.items():
+            lines.extend(_defaults_block("mock_data", type_name, defaults))
+        lines.extend(["}", ""])
+    if config.offline.variables:
+        lines.append("variables {")
+        for name, value in config.offline.variables.items():
+            lines.append(f"  {name} = {hcl_value(value)}")
+        lines.extend(["}", ""])
+    lines.extend([f'run "{OFFLINE_RUN}" {{', "  command = plan", "}", ""])
+    return "\n".join(lines)
+
+
 def generate_pytest_file(config: models.WsConfig) -> str:
     lines = [
         "# Generated by workspace - do not edit manually",
@@ -120,7 +179,80 @@ def generate_pytest_file(config: models.WsConfig) -> str:
     return "\n".join(lines)
 
 
-def process_workspace(ws_dir: Path, include_examples: str = "all") -> None:
+def generate_bundle_pytest_file(config: models.WsConfig) -> str:
+    """Like generate_pytest_file for `snapshot_layout: bundle`; reads both bundles directly."""
+    lines = [
+        "# Generated by workspace - do not edit manually",
+        "from pathlib import Path",
+        "",
+        "import pytest",
+        "",
+        f'ACTUAL_BUNDLE = Path(__file__).parent / "{snapshot_bundle.ACTUAL_BUNDLE}"',
+        f'EXPECTED_BUNDLE = Path(__file__).parent / "{snapshot_bundle.EXPECTED_BUNDLE}"',
+        f"HEADER = {snapshot_bundle.HEADER!r}",
+        f"INDEX_END = {snapshot_bundle.INDEX_END!r}",
+        f"SECTION_PREFIX = {snapshot_bundle.SECTION_PREFIX!r}",
+        "",
+        "# snapshot path inside the bundles",
+        "TEST_CASES = [",
+    ]
+    for ex in config.examples:
+        for reg in ex.plan_regressions:
+            lines.append(f"    {ex.snapshot_relpath(reg.address)!r},")
+    lines.extend(
+        [
+            "]",
+            "",
+            "",
+            "def read_bundle(path: Path) -> dict[str, str]:",
+            "    if not path.is_file():",
+            "        return {}",
+            "    index, _, body = path.read_bytes().partition(INDEX_END.encode())",
+            "    snapshots = {}",
+            "    for line in index.decode().splitlines()[1:]:",
+            '        offset, length, relpath = line.split(" ", 2)',
+            "        start = int(offset)",
+            "        snapshots[relpath] = body[start : start + int(length)].decode()",
+            "    return snapshots",
+            "",
+            "",
+            "def write_bundle(path: Path, snapshots: dict[str, str]) -> None:",
+            "    index, sections, offset = [], [], 0",
+            "    for relpath in sorted(snapshots):",
+            '        marker = f"{SECTION_PREFIX}{relpath}\\n"',
+            "        offset += len(marker.encode())",
+            "        length = len(snapshots[relpath].encode())",
+            '        index.append(f"{offset} {length} {relpath}\\n")',
+            "        sections.extend([marker, snapshots[relpath]])",
+            "        offset += length",
+            '    path.write_text("".join([HEADER, *index, INDEX_END, *sections]))',
+            "",
+            "",
+            '@pytest.fixture(scope="module")',
+            "def bundles() -> tuple[dict[str, str], dict[str, str]]:",
+            "    return read_bundle(EXPECTED_BUNDLE), read_bundle(ACTUAL_BUNDLE)",
+            "",
+            "",
+            '@pytest.mark.parametrize("relpath", TEST_CASES)',
+            "def test_plan_snapshot(relpath: str, bundles, request) -> None:",
+            "    expected, actual = bundles",
+            "    assert relpath in actual, f'Actual snapshot not found: {relpath}'",
+            "    if relpath in expected and (",
+            "        expected[relpath].splitlines() == actual[relpath].splitlines()",
+            "    ):",
+            "        return",
+            '    if relpath in expected and not request.config.getoption("force_regen", False):',
+            "        assert actual[relpath].splitlines() == expected[relpath].splitlines()",
+            "    expected[relpath] = actual[relpath]",
+            "    write_bundle(EXPECTED_BUNDLE, expected)",
+            "    pytest.fail(f'{relpath} was written to {EXPECTED_BUNDLE.name}; rerun to verify')",
+            "",
+        ]
+    )
+    return "\n".join(lines)
+
+
+def process_workspace(ws_dir: Path, include_examples: str = "all", offline: bool = False) -> None:
     ws_config = ws_dir / models.WORKSPACE_CONFIG_FILE
     if not ws_config.exists():
         typer.echo(f"Skipping {ws_dir.name}: no {models.WORKSPACE_CONFIG_FILE} found")
@@ -141,11 +273,17 @@ def process_workspace(ws_dir: Path, include_examples: str = "all") -> None:
     elif modules_tf.exists():
         modules_tf.unlink()
         typer.echo(f"  Removed {MODULES_GENERATED_TF} (no examples)")
-    (ws_dir / PLAN_SNAPSHOTS_DIR).mkdir(exist_ok=True)
-    (ws_dir / PLAN_SNAPSHOTS_ACTUAL_DIR).mkdir(exist_ok=True)
     pytest_file = ws_dir / TEST_PLAN_SNAPSHOT_PY
-    pytest_file.write_text(generate_pytest_file(config))
+    if config.snapshot_layout == models.SnapshotLayout.BUNDLE:
+        pytest_file.write_text(generate_bundle_pytest_file(config))
+    else:
+        (ws_dir / PLAN_SNAPSHOTS_DIR).mkdir(exist_ok=True)
+        (ws_dir / PLAN_SNAPSHOTS_ACTUAL_DIR).mkdir(exist_ok=True)
+        pytest_file.write_text(generate_pytest_file(config))
     typer.echo(f"  Generated {TEST_PLAN_SNAPSHOT_PY}")
+    if offline:
+        (ws_dir / OFFLINE_TFTEST).write_text(generate_offline_tftest(config))
+        typer.echo(f"  Generated {OFFLINE_TFTEST}")
 
 
 @app.command()
@@ -153,6 +291,9 @@ def main(
     ws: str = typer.Option("all", "--ws", help="Workspace name or 'all' for all ws_* directories"),
     tests_dir: Path = typer.Option(models.DEFAULT_TESTS_DIR, "--tests-dir"),
     include_examples: str = typer.Option("all", "--include-examples", "-e"),
+    offline: bool = typer.Option(
+        False, "--offline", help=f"Also generate {OFFLINE_TFTEST} with mock providers"
+    ),
 ) -> None:
     try:
         ws_dirs = models.resolve_workspaces(ws, tests_dir)
@@ -161,7 +302,7 @@ def main(
         raise typer.Exit(1)
     for ws_dir in ws_dirs:
         typer.echo(f"Processing {ws_dir.name}...")
-        process_workspace(ws_dir, include_examples)
+        process_workspace(ws_dir, include_examples, offline)
     typer.echo("Done.")
 
 
@@ -121,3 +121,70 @@ def test_generate_modules_tf_module_depends_on(fake_repo: Path, tmp_path: Path):
     assert "    time_sleep.x," in result
     assert "    null_resource.y," in result
     assert 'module "ex_with_dep" {' in result
+
+
+def test_generate_offline_tftest():
+    config = models.WsConfig(
+        examples=[],
+        var_groups={},
+        offline=models.OfflineConfig(
+            mock_providers=[
+                models.MockProvider(
+                    "mongodbatlas",
+                    mock_resources={"mongodbatlas_project": {"id": "000000000000000000000001"}},
+                    mock_data={"mongodbatlas_project": {"cluster_count": 2, "tags": {"a": "b"}}},
+                )
+            ],
+            variables={"org_id": "000000000000000000000000", "ids": ["x", None]},
+        ),
+    )
+    result = gen.generate_offline_tftest(config)
+    assert (
+        """mock_provider "mongodbatlas" {
+  mock_resource "mongodbatlas_project" {
+    defaults = {
+      id = "000000000000000000000001"
+    }
+  }
+  mock_data "mongodbatlas_project" {
+    defaults = {
+      cluster_count = 2
+      tags = { "a" = "b" }
+    }
+  }
+}
+
+variables {
+  org_id = "000000000000000000000000"
+  ids = ["x", null]
+}
+
+run "offline_plan" {
+  command = plan
+}
+"""
+        in result
+    )
+
+
+def test_generate_offline_tftest_defaults_to_empty_atlas_mock():
+    result = gen.generate_offline_tftest(models.WsConfig(examples=[], var_groups={}))
+    assert 'mock_provider "mongodbatlas" {\n}' in result
+    assert "variables" not in result
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [(True, "true"), (1.5, "1.5"), ("${var.x}", '"$${var.x}"'), ("%{ if }", '"%%{ if }"')],
+)
+def test_hcl_value(value: object, expected: str):
+    assert gen.hcl_value(value) == expected
+
+
+def test_example_targets_only_for_partial_selection():
+    config = models.WsConfig(
+        examples=[models.Example(name="a"), models.Example(number=2, source="x")], var_groups={}
+    )
+    assert gen.example_targets(config.examples, config) == []
+    assert gen.example_targets(config.examples[1:], config) == ["module.ex_02"]
+    assert gen.example_targets([], config) == []
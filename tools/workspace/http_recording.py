@@ -0,0 +1,297 @@
+# path-sync copy -n sdlc
+"""Record and replay the mongodbatlas provider's HTTP traffic for plan runs.
+
+A local reverse proxy is set as the provider base URL (`MONGODB_ATLAS_BASE_URL`) while a
+workspace runs. In `record` mode it forwards to the real base URL and stores every
+exchange in `<workspace>/.atlas_http/recording.json`; in `replay` mode it answers from
+that file without network access. Exchanges are matched on method, path, query, body and
+whether credentials were sent (so digest challenges replay too); repeated identical
+requests replay in recorded order. Recordings are per workspace, not per example: the
+provider's requests carry no example information, so one recording serves any subset
+of the workspace's recorded examples.
+
+Values of known secret JSON fields (`SENSITIVE_FIELDS`, e.g. `password`, `privateKey`)
+are replaced with `REDACTED` as responses are recorded, so the recording run and its
+replays see the same values. Other fields, including Atlas IDs that the provider sends
+back in later request paths, are kept.
+
+A replay falls back to recording when the file is missing or was recorded for another
+`MONGODB_ATLAS_PROVIDER_VERSION`. Unrecorded requests get a 501, which the provider does
+not retry, and are reported at the end.
+"""
+
+from __future__ import annotations
+
+import base64
+import contextlib
+import enum
+import hashlib
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from collections import Counter
+from collections.abc import Generator
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import typer
+
+RECORDING_DIR = ".atlas_http"
+RECORDING_FILE = "recording.json"
+BASE_URL_ENV = "MONGODB_ATLAS_BASE_URL"
+DEFAULT_UPSTREAM = "https://cloud.mongodb.com/"
+# Hop-by-hop and encoding headers are not forwarded; responses are stored uncompressed.
+SKIPPED_REQUEST_HEADERS = frozenset(
+    {"host", "connection", "accept-encoding", "content-length", "keep-alive"}
+)
+KEPT_RESPONSE_HEADERS = frozenset({"content-type", "www-authenticate", "retry-after"})
+NOT_RECORDED_STATUS = 501
+# Lowercased JSON field names of Atlas API secrets.
+SENSITIVE_FIELDS = frozenset(
+    {
+        "password",
+        "privatekey",
+        "secret",
+        "clientsecret",
+        "sharedsecret",
+        "webhooksecret",
+        "secretaccesskey",
+        "apitoken",
+        "servicekey",
+        "routingkey",
+        "licensekey",
+        "readtoken",
+        "writetoken",
+    }
+)
+REDACTED = "REDACTED"
+
+
+class HttpMode(enum.StrEnum):
+    RECORD = "record"
+    REPLAY = "replay"
+
+
+@dataclass
+class Exchange:
+    status: int
+    headers: dict[str, str] = field(default_factory=dict)
+    body: str = ""
+    body_base64: bool = False
+
+    @classmethod
+    def from_bytes(cls, status: int, headers: dict[str, str], data: bytes) -> Exchange:
+        try:
+            return cls(status, headers, data.decode())
+        except UnicodeDecodeError:
+            return cls(status, headers, base64.b64encode(data).decode(), body_base64=True)
+
+    def body_bytes(self) -> bytes:
+        return base64.b64decode(self.body) if self.body_base64 else self.body.encode()
+
+    def redacted(self) -> Exchange:
+        """This exchange with the string values of sensitive JSON fields replaced."""
+        if self.body_base64:
+            return self
+        try:
+            data = json.loads(self.body)
+        except json.JSONDecodeError:
+            return self
+        if not _redact(data):
+            return self
+        return Exchange(self.status, self.headers, json.dumps(data), self.body_base64)
+
+
+def _redact(data: Any, sensitive: bool = False) -> bool:
+    """Replace string leaves under sensitive keys in place; returns whether any changed."""
+    if isinstance(data, dict):
+        items = [(k, v, sensitive or k.lower() in SENSITIVE_FIELDS) for k, v in data.items()]
+    elif isinstance(data, list):
+        items = [(i, v, sensitive) for i, v in enumerate(data)]
+    else:
+        return False
+    changed = False
+    for key, value, below in items:
+        if isinstance(value, str) and below and value != REDACTED:
+            data[key] = REDACTED
+            changed = True
+        else:
+            changed = _redact(value, below) or changed
+    return changed
+
+
+@dataclass
+class Recording:
+    provider_version: str = ""
+    exchanges: dict[str, list[Exchange]] = field(default_factory=dict)
+
+
+def recording_path(ws_dir: Path) -> Path:
+    return ws_dir / RECORDING_DIR / RECORDING_FILE
+
+
+def load_recording(path: Path) -> Recording | None:
+    if not path.exists():
+        return None
+    try:
+        data = json.loads(path.read_text())
+    except json.JSONDecodeError:
+        return None
+    exchanges = {
+        key: [Exchange(**e) for e in entries] for key, entries in data.get("exchanges", {}).items()
+    }
+    return Recording(data.get("provider_version", ""), exchanges)
+
+
+def save_recording(path: Path, recording: Recording) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(asdict(recording), indent=1, sort_keys=True) + "\n")
+
+
+def request_key(method: str, target: str, body: bytes, authenticated: bool) -> str:
+    url = urlsplit(target)
+    query = urlencode(sorted(parse_qsl(url.query, keep_blank_values=True)))
+    digest = hashlib.sha256(body).hexdigest()[:16] if body else "-"
+    auth = "auth" if authenticated else "anon"
+    return f"{method} {url.path}?{query} {digest} {auth}"
+
+
+class Proxy:
+    """Answers requests from `recording`, forwarding to `upstream` first when recording."""
+
+    def __init__(self, mode: HttpMode, recording: Recording, upstream: str) -> None:
+        self.mode = mode
+        self.recording = recording
+        self.upstream = upstream.rstrip("/")
+        self.stats: Counter[str] = Counter()
+        self._replayed: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    def respond(self, method: str, target: str, headers: dict[str, str], body: bytes) -> Exchange:
+        key = request_key(method, target, body, "authorization" in headers)
+        if self.mode == HttpMode.RECORD:
+            exchange = self._forward(method, target, headers, body).redacted()
+            with self._lock:
+                self.recording.exchanges.setdefault(key, []).append(exchange)
+                self.stats["recorded"] += 1
+            return exchange
+        with self._lock:
+            entries = self.recording.exchanges.get(key)
+            if not entries:
+                self.stats["missed"] += 1
+                return Exchange(NOT_RECORDED_STATUS, {}, f"Not recorded: {key}")
+            index = min(self._replayed[key], len(entries) - 1)
+            self._replayed[key] += 1
+            self.stats["replayed"] += 1
+            return entries[index]
+
+    def _forward(self, method: str, target: str, headers: dict[str, str], body: bytes) -> Exchange:
+        forwarded = {k: v for k, v in headers.items() if k not in SKIPPED_REQUEST_HEADERS}
+        request = urllib.request.Request(
+            f"{self.upstream}{target}", data=body or None, headers=forwarded, method=method
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                status, response_headers, data = response.status, response.headers, response.read()
+        except urllib.error.HTTPError as e:
+            status, response_headers, data = e.code, e.headers, e.read()
+        kept = {
+            k.lower(): v for k, v in response_headers.items() if k.lower() in KEPT_RESPONSE_HEADERS
+        }
+        return Exchange.from_bytes(status, kept, data)
+
+    def summary(self) -> str:
+        parts = [f"{name} {self.stats[name]}" for name in ("recorded", "replayed", "missed")]
+        return f"Atlas HTTP {self.mode}: {', '.join(parts)}"
+
+
+def _handler(proxy: Proxy) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _respond(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            headers = {k.lower(): v for k, v in self.headers.items()}
+            exchange = proxy.respond(self.command, self.path, headers, body)
+            data = exchange.body_bytes()
+            self.send_response(exchange.status)
+            for name, value in exchange.headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = _respond
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    return Handler
+
+
+@contextlib.contextmanager
+def serve(proxy: Proxy, host: str = "127.0.0.1") -> Generator[str]:
+    """Run `proxy` in a background thread; yields its base URL."""
+    server = ThreadingHTTPServer((host, 0), _handler(proxy))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, args=(0.1,), daemon=True)
+    thread.start()
+    try:
+        yield f"http://{host}:{server.server_address[1]}/"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _effective_mode(mode: HttpMode, recording: Recording | None, provider_version: str) -> HttpMode:
+    if mode == HttpMode.REPLAY and recording is None:
+        typer.echo("  No Atlas HTTP recording yet; recording this run")
+        return HttpMode.RECORD
+    if mode == HttpMode.REPLAY and recording.provider_version != provider_version:
+        typer.echo(
+            f"  Atlas HTTP recording is for provider {recording.provider_version or 'default'!r}, "
+            f"not {provider_version or 'default'!r}; recording this run"
+        )
+        return HttpMode.RECORD
+    return mode
+
+
+@contextlib.contextmanager
+def session(ws_dir: Path, mode: HttpMode | None, provider_version: str | None) -> Generator[None]:
+    """Route the provider through a record/replay proxy for `ws_dir` while the block runs."""
+    if mode is None:
+        yield
+        return
+    version = provider_version or ""
+    path = recording_path(ws_dir)
+    stored = load_recording(path)
+    mode = _effective_mode(mode, stored, version)
+    recording = stored if mode == HttpMode.REPLAY else Recording(provider_version=version)
+    assert recording is not None
+    previous = os.environ.get(BASE_URL_ENV)
+    proxy = Proxy(mode, recording, previous or DEFAULT_UPSTREAM)
+    with serve(proxy) as base_url:
+        os.environ[BASE_URL_ENV] = base_url
+        try:
+            yield
+        finally:
+            if previous is None:
+                os.environ.pop(BASE_URL_ENV, None)
+            else:
+                os.environ[BASE_URL_ENV] = previous
+    # Only complete runs are saved, so a failed recording keeps the previous file.
+    typer.echo(f"  {proxy.summary()}")
+    if mode == HttpMode.RECORD:
+        save_recording(path, recording)
+    elif proxy.stats["missed"]:
+        typer.echo(
+            f"  {proxy.stats['missed']} requests were not recorded; rerun with "
+            f"--atlas-http {HttpMode.RECORD}",
+            err=True,
+        )
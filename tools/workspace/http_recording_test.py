@@ -0,0 +1,131 @@
+# path-sync copy -n sdlc
+from __future__ import annotations
+
+import json
+import os
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+from workspace import fake_atlas, http_recording
+from workspace.http_recording import HttpMode
+
+
+def _get(path: str, auth: bool = False) -> tuple[int, str]:
+    base_url = os.environ[http_recording.BASE_URL_ENV]
+    request = urllib.request.Request(f"{base_url}api/atlas/v2/{path}")
+    if auth:
+        request.add_header("Authorization", "Digest response=x")
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.read().decode()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode()
+
+
+@pytest.fixture()
+def upstream(monkeypatch: pytest.MonkeyPatch):
+    with fake_atlas.serve() as (fake, base_url):
+        monkeypatch.setenv(http_recording.BASE_URL_ENV, base_url)
+        fake.handle("POST", ("groups",), {}, {"name": "p1"})
+        yield fake
+
+
+def test_record_then_replay_without_upstream(
+    tmp_path: Path, upstream: fake_atlas.FakeAtlas, monkeypatch: pytest.MonkeyPatch
+):
+    with http_recording.session(tmp_path, HttpMode.RECORD, "2.15.0"):
+        recorded = _get("groups?pageNum=1&itemsPerPage=100")
+        assert _get("groups/missing")[0] == 404
+    assert recorded[0] == 200
+    assert json.loads(recorded[1])["totalCount"] == 1
+
+    monkeypatch.setenv(http_recording.BASE_URL_ENV, "http://127.0.0.1:9/")
+    with http_recording.session(tmp_path, HttpMode.REPLAY, "2.15.0"):
+        assert _get("groups?itemsPerPage=100&pageNum=1") == recorded
+        assert _get("groups/missing")[0] == 404
+        assert _get("groups/other")[0] == http_recording.NOT_RECORDED_STATUS
+    assert os.environ[http_recording.BASE_URL_ENV] == "http://127.0.0.1:9/"
+    assert upstream.requests["GET groups"] == 1
+
+
+def test_replay_records_when_provider_version_changes(
+    tmp_path: Path, upstream: fake_atlas.FakeAtlas, capsys: pytest.CaptureFixture[str]
+):
+    with http_recording.session(tmp_path, HttpMode.REPLAY, None):
+        _get("groups")
+    with http_recording.session(tmp_path, HttpMode.REPLAY, None):
+        _get("groups")
+    assert upstream.requests["GET groups"] == 1
+
+    with http_recording.session(tmp_path, HttpMode.REPLAY, "2.16.0"):
+        _get("groups")
+    assert upstream.requests["GET groups"] == 2
+    assert "recording this run" in capsys.readouterr().out
+    recording = http_recording.load_recording(http_recording.recording_path(tmp_path))
+    assert recording is not None
+    assert recording.provider_version == "2.16.0"
+
+
+def test_replay_distinguishes_credentials_and_repeats_in_order():
+    recording = http_recording.Recording()
+    anon = http_recording.request_key("GET", "/api/atlas/v2/groups", b"", authenticated=False)
+    auth = http_recording.request_key("GET", "/api/atlas/v2/groups", b"", authenticated=True)
+    recording.exchanges[anon] = [http_recording.Exchange(401, {"www-authenticate": "Digest"})]
+    recording.exchanges[auth] = [
+        http_recording.Exchange(200, {}, "first"),
+        http_recording.Exchange(200, {}, "second"),
+    ]
+    proxy = http_recording.Proxy(HttpMode.REPLAY, recording, "http://unused")
+    assert proxy.respond("GET", "/api/atlas/v2/groups", {}, b"").status == 401
+    bodies = [
+        proxy.respond("GET", "/api/atlas/v2/groups", {"authorization": "x"}, b"").body
+        for _ in range(3)
+    ]
+    assert bodies == ["first", "second", "second"]
+
+
+def test_exchange_keeps_binary_bodies():
+    exchange = http_recording.Exchange.from_bytes(200, {}, b"\xff\x00")
+    assert exchange.body_base64
+    assert exchange.body_bytes() == b"\xff\x00"
+
+
+def test_exchange_redacts_only_secret_fields():
+    values = {
+        "id": "5f1a",
+        "publicKey": "abcdef",
+        "apiKeyId": "k1",
+        "connectionStrings": {"standardSrv": "mongodb+srv://c1.x.mongodb.net"},
+        "users": [{"username": "u", "password": "hunter2"}],
+        "privateKey": {"pem": "-----BEGIN"},
+    }
+    exchange = http_recording.Exchange(200, {}, json.dumps(values)).redacted()
+
+    assert json.loads(exchange.body) == {
+        **values,
+        "users": [{"username": "u", "password": http_recording.REDACTED}],
+        "privateKey": {"pem": http_recording.REDACTED},
+    }
+    raw = http_recording.Exchange(200, {}, "privateKey: not json")
+    assert raw.redacted() is raw
+
+
+def test_recorded_run_and_replay_see_the_same_redacted_values(
+    tmp_path: Path, upstream: fake_atlas.FakeAtlas, monkeypatch: pytest.MonkeyPatch
+):
+    secret = {"name": "p2", "publicKey": "pk", "privateKey": "s3cret"}
+    upstream.handle("POST", ("groups",), {}, secret)
+    with http_recording.session(tmp_path, HttpMode.RECORD, None):
+        recorded = _get("groups", auth=True)
+    monkeypatch.setenv(http_recording.BASE_URL_ENV, "http://127.0.0.1:9/")
+    with http_recording.session(tmp_path, HttpMode.REPLAY, None):
+        replayed = _get("groups", auth=True)
+
+    assert replayed == recorded
+    groups = {g["name"]: g for g in json.loads(recorded[1])["results"]}
+    assert groups["p2"]["publicKey"] == "pk"
+    assert groups["p2"]["privateKey"] == http_recording.REDACTED
+    assert "s3cret" not in http_recording.recording_path(tmp_path).read_text()
@@ -5,22 +5,26 @@ from __future__ import annotations
 import contextlib
 import json
 import logging
+import os
 import shutil
-from collections.abc import Generator
+from collections.abc import Generator, Iterable
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
 
 import typer
 
-from workspace import gen, models, plan
+from workspace import gen, models, parallelism, plan, plan_index, plan_stream, shard, tracing
 
 logger = logging.getLogger(__name__)
 
 ATLAS_PREFIX = "mongodbatlas_"
 SKIP_SENTINEL = "SKIP"
 IMPORTS_GENERATED_TF = "imports.generated.tf"
-TFSTATE_FILE = "terraform.tfstate"
+TFSTATE_FILE = plan.TFSTATE_FILE
+EXAMPLE_COPIES_DIR = ".import_copies"
+STATE_ROOT_MODULE = ("values", "root_module")
 
 
 @dataclass
@@ -29,21 +33,24 @@ class StateResource:
     values: dict[str, Any]
 
 
+def _state_resources(resources: Iterable[dict[str, Any]]) -> dict[str, StateResource]:
+    return {
+        r["address"]: StateResource(resource_type=r["type"], values=r.get("values", {}))
+        for r in resources
+    }
+
+
 def extract_state_resources(state_json: dict[str, Any]) -> dict[str, StateResource]:
-    result: dict[str, StateResource] = {}
     root = state_json.get("values", {}).get("root_module", {})
-    _extract_from_module(root, result)
-    return result
+    return _state_resources(plan_stream.module_resources(root))
 
 
-def _extract_from_module(module: dict[str, Any], result: dict[str, StateResource]) -> None:
-    for resource in module.get("resources", []):
-        result[resource["address"]] = StateResource(
-            resource_type=resource["type"],
-            values=resource.get("values", {}),
+def read_state_resources(ws_dir: Path, prefixes: tuple[str, ...] = ()) -> dict[str, StateResource]:
+    """Stream state resources from `terraform show -json` without decoding the whole state."""
+    with plan.state_show_json_stream(ws_dir) as stream:
+        return _state_resources(
+            plan_stream.iter_module_resources(stream, STATE_ROOT_MODULE, prefixes)
         )
-    for child in module.get("child_modules", []):
-        _extract_from_module(child, result)
 
 
 def validate_atlas_types(atlas_types: set[str], mapping: dict[str, str]) -> None:
@@ -98,23 +105,20 @@ def backup_and_restore_state(ws_dir: Path) -> Generator[None]:
     try:
         yield
     finally:
-        shutil.copy2(backup, tfstate)
-        backup.unlink(missing_ok=True)
+        # Renaming over the state is atomic, so an interrupted restore never leaves it partial.
+        os.replace(backup, tfstate)
         imports_tf.unlink(missing_ok=True)
 
 
 def assert_import_plan(
-    plan_json: dict[str, Any],
+    plan_json: plan_index.PlanIndex | dict[str, Any],
     example: models.Example,
 ) -> list[str]:
     """Return list of assertion failure messages for a single example."""
     failures: list[str] = []
-    prefix = f"module.ex_{example.identifier}."
-    for rc in plan_json.get("resource_changes", []):
-        addr = rc.get("address", "")
-        if not addr.startswith(prefix):
-            continue
-        rel_addr = addr.removeprefix(prefix)
+    prefix = plan_index.example_prefix(example.identifier)
+    for rc in plan_index.PlanIndex.of(plan_json).example_changes(prefix):
+        rel_addr = rc.get("address", "").removeprefix(prefix)
         change = rc.get("change", {})
         actions = change.get("actions", [])
         # TF <=1.12: importing on resource_change; TF 1.13+: under change.importing
@@ -148,27 +152,25 @@ def assert_import_plan(
 
 
 def assert_no_actions_outside_prefixes(
-    plan_json: dict[str, Any], enabled_prefixes: list[str]
+    plan_json: plan_index.PlanIndex | dict[str, Any], enabled_prefixes: list[str]
 ) -> list[str]:
     """Reject non-noop/read actions outside enabled example prefixes before apply."""
     return [
         f"{addr}: unexpected actions {actions} outside enabled examples"
-        for rc in plan_json.get("resource_changes", [])
+        for rc in plan_index.PlanIndex.of(plan_json).changes_outside(enabled_prefixes)
         if (addr := rc.get("address", "?"))
-        and not any(addr.startswith(p) for p in enabled_prefixes)
         and (actions := rc.get("change", {}).get("actions", []))
         and actions not in (["no-op"], ["read"])
     ]
 
 
-def assert_clean_plan(plan_json: dict[str, Any], example: models.Example) -> list[str]:
+def assert_clean_plan(
+    plan_json: plan_index.PlanIndex | dict[str, Any], example: models.Example
+) -> list[str]:
     failures: list[str] = []
-    prefix = f"module.ex_{example.identifier}."
-    for rc in plan_json.get("resource_changes", []):
-        addr = rc.get("address", "")
-        if not addr.startswith(prefix):
-            continue
-        rel_addr = addr.removeprefix(prefix)
+    prefix = plan_index.example_prefix(example.identifier)
+    for rc in plan_index.PlanIndex.of(plan_json).example_changes(prefix):
+        rel_addr = rc.get("address", "").removeprefix(prefix)
         change = rc.get("change", {})
         actions = change.get("actions", [])
 
@@ -294,8 +296,141 @@ def resolve_import_entries(
     return import_entries
 
 
+def example_state(state: dict[str, Any], example: models.Example) -> dict[str, Any]:
+    """Copy of a raw state document without the resources and outputs of other examples."""
+    module = f"module.ex_{example.identifier}"
+
+    def keep(name: str) -> bool:
+        return not name.startswith("module.ex_") or name == module or name.startswith(f"{module}.")
+
+    return state | {
+        "resources": [r for r in state.get("resources", []) if keep(r.get("module", ""))],
+        "outputs": {
+            k: v
+            for k, v in state.get("outputs", {}).items()
+            if not k.startswith("ex_") or k == f"ex_{example.identifier}"
+        },
+    }
+
+
+def example_copy_dir(ws_dir: Path, example: models.Example) -> Path:
+    return ws_dir / EXAMPLE_COPIES_DIR / f"ex_{example.identifier}"
+
+
+def prepare_example_copy(ws_dir: Path, config: models.WsConfig, example: models.Example) -> Path:
+    """Working copy of the workspace holding only `example` in config and state."""
+    dest = shard.copy_workspace(ws_dir, config, [example], example_copy_dir(ws_dir, example))
+    (dest / IMPORTS_GENERATED_TF).unlink(missing_ok=True)
+    state = json.loads((ws_dir / TFSTATE_FILE).read_text())
+    (dest / TFSTATE_FILE).write_text(json.dumps(example_state(state, example)))
+    return dest
+
+
+def _validate_example_copy(
+    ws_dir: Path,
+    dest: Path,
+    example: models.Example,
+    entries: list[tuple[str, str]],
+    var_files: list[Path],
+    plan_parallelism: int | None,
+    apply_parallelism: int | None,
+) -> list[str]:
+    """rm -> import plan -> apply -> clean plan inside one example copy; returns failures."""
+    plan.run_terraform_init(dest)
+    plan.run_terraform_state_rm(dest, [addr for addr, _ in entries])
+    imports_tf = dest / IMPORTS_GENERATED_TF
+    imports_tf.write_text(generate_import_blocks_tf(entries))
+    plan_data = plan.run_terraform_plan(
+        dest,
+        var_files,
+        skip_init=True,
+        write_json=False,
+        parallelism=plan_parallelism,
+        record_dir=ws_dir,
+        write_cache=False,
+    )
+    index = plan_index.PlanIndex.of(plan_data)
+    failures = assert_import_plan(index, example)
+    failures.extend(
+        assert_no_actions_outside_prefixes(index, [plan_index.example_prefix(example.identifier)])
+    )
+    if failures:
+        return failures
+    plan.run_terraform_apply_plan(dest, apply_parallelism, record_dir=ws_dir)
+    imports_tf.unlink()
+    plan_data = plan.run_terraform_plan(
+        dest,
+        var_files,
+        skip_init=True,
+        write_json=False,
+        parallelism=plan_parallelism,
+        record_dir=ws_dir,
+        write_cache=False,
+    )
+    return [f"(post-apply) {f}" for f in assert_clean_plan(plan_data, example)]
+
+
+def validate_per_example(
+    ws_dir: Path,
+    config: models.WsConfig,
+    enabled: list[models.Example],
+    import_entries: list[tuple[str, str]],
+    var_files: list[Path],
+) -> list[str]:
+    """Run the import cycle for each example concurrently in its own state copy.
+
+    A failing example does not stop the others; the workspace state is only read.
+    """
+    by_example = {
+        ex.identifier: [e for e in import_entries if e[0].startswith(f"module.ex_{ex.identifier}.")]
+        for ex in enabled
+    }
+    examples = [ex for ex in enabled if by_example[ex.identifier]]
+    if not examples:
+        return []
+    abs_var_files = shard.absolute_var_files(ws_dir, var_files)
+    plan_parallelism = parallelism.resolve(ws_dir, config.parallelism, parallelism.TfMode.PLAN)
+    apply_parallelism = parallelism.resolve(ws_dir, config.parallelism, parallelism.TfMode.APPLY)
+    if plan_parallelism is not None:
+        plan_parallelism = max(1, plan_parallelism // len(examples))
+    if apply_parallelism is not None:
+        apply_parallelism = max(1, apply_parallelism // len(examples))
+
+    def run(ex: models.Example) -> list[str]:
+        with tracing.span("import example", workspace=ws_dir.name, example=ex.identifier):
+            tracing.annotate(resources=len(by_example[ex.identifier]))
+            dest = prepare_example_copy(ws_dir, config, ex)
+            try:
+                return _validate_example_copy(
+                    ws_dir,
+                    dest,
+                    ex,
+                    by_example[ex.identifier],
+                    abs_var_files,
+                    plan_parallelism,
+                    apply_parallelism,
+                )
+            except typer.Exit as e:
+                return [f"terraform failed in {dest.relative_to(ws_dir)} (exit code {e.exit_code})"]
+
+    logger.info(f"Import-validating {len(examples)} examples in isolated state copies")
+    all_failures: list[str] = []
+    with ThreadPoolExecutor(max_workers=len(examples)) as executor:
+        for ex, failures in zip(examples, executor.map(run, examples), strict=True):
+            for f in failures:
+                logger.error(f"FAIL: {ex.identifier}: {f}")
+            if not failures:
+                logger.info(f"PASS: {ex.identifier}")
+            all_failures.extend(failures)
+    return all_failures
+
+
 def process_workspace(
-    ws_dir: Path, include_examples: str = "all", var_files: list[Path] | None = None
+    ws_dir: Path,
+    include_examples: str = "all",
+    var_files: list[Path] | None = None,
+    write_plan_json: bool = False,
+    per_example: bool = False,
 ) -> None:
     ws_config_path = ws_dir / models.WORKSPACE_CONFIG_FILE
     if not ws_config_path.exists():
@@ -308,27 +443,49 @@ def process_workspace(
         logger.info(f"No examples with import_validation.enabled in {ws_dir.name}, skipping")
         return
 
-    state_json = plan.run_terraform_show_json(ws_dir)
-    state_resources = extract_state_resources(state_json)
+    prefixes = tuple(f"module.ex_{ex.identifier}." for ex in enabled)
+    with tracing.span("import read state", examples=len(enabled)):
+        state_resources = read_state_resources(ws_dir, prefixes)
     import_entries = resolve_import_entries(
         enabled, state_resources, config.resource_type_import_ids
     )
     rm_addresses = [addr for addr, _ in import_entries]
+    if not import_entries:
+        logger.info(f"Nothing to import in {ws_dir.name}, skipping")
+        return
 
     logger.info(f"Import-validating {len(import_entries)} resources across {len(enabled)} examples")
 
+    if per_example:
+        all_failures = validate_per_example(
+            ws_dir, config, enabled, import_entries, var_files or []
+        )
+        if all_failures:
+            logger.error(f"Import validation FAILED ({len(all_failures)} failures)")
+            raise typer.Exit(1)
+        logger.info("Import validation passed")
+        return
+
+    plan_parallelism = parallelism.resolve(ws_dir, config.parallelism, parallelism.TfMode.PLAN)
+    targets = gen.example_targets(enabled, config)
     with backup_and_restore_state(ws_dir):
         plan.run_terraform_state_rm(ws_dir, rm_addresses)
         imports_tf = ws_dir / IMPORTS_GENERATED_TF
         imports_tf.write_text(generate_import_blocks_tf(import_entries))
 
-        plan.run_terraform_plan(ws_dir, var_files=var_files or [], skip_init=True)
-        plan_json_path = ws_dir / plan.PLAN_JSON
-        plan_data = json.loads(plan_json_path.read_text())
+        plan_data = plan.run_terraform_plan(
+            ws_dir,
+            var_files=var_files or [],
+            skip_init=True,
+            write_json=write_plan_json,
+            parallelism=plan_parallelism,
+            targets=targets,
+        )
 
+        index = plan_index.PlanIndex.of(plan_data)
         all_failures: list[str] = []
         for ex in enabled:
-            failures = assert_import_plan(plan_data, ex)
+            failures = assert_import_plan(index, ex)
             if failures:
                 all_failures.extend(failures)
                 for f in failures:
@@ -336,8 +493,8 @@ def process_workspace(
             else:
                 logger.info(f"PASS: {ex.identifier}")
 
-        enabled_prefixes = [f"module.ex_{ex.identifier}." for ex in enabled]
-        outside = assert_no_actions_outside_prefixes(plan_data, enabled_prefixes)
+        enabled_prefixes = [plan_index.example_prefix(ex.identifier) for ex in enabled]
+        outside = assert_no_actions_outside_prefixes(index, enabled_prefixes)
         if outside:
             for msg in outside:
                 logger.error(f"OUTSIDE: {msg}")
@@ -350,14 +507,23 @@ def process_workspace(
             logger.error(f"Import validation FAILED ({len(all_failures)} failures)")
             raise typer.Exit(1)
 
-        plan.run_terraform_apply_plan(ws_dir)
+        plan.run_terraform_apply_plan(
+            ws_dir, parallelism.resolve(ws_dir, config.parallelism, parallelism.TfMode.APPLY)
+        )
         imports_tf.unlink(missing_ok=True)
 
-        plan.run_terraform_plan(ws_dir, var_files=var_files or [], skip_init=True)
-        plan_data = json.loads(plan_json_path.read_text())
+        plan_data = plan.run_terraform_plan(
+            ws_dir,
+            var_files=var_files or [],
+            skip_init=True,
+            write_json=write_plan_json,
+            parallelism=plan_parallelism,
+            targets=targets,
+        )
 
+        index = plan_index.PlanIndex.of(plan_data)
         for ex in enabled:
-            failures = assert_clean_plan(plan_data, ex)
+            failures = assert_clean_plan(index, ex)
             if failures:
                 all_failures.extend(failures)
                 for f in failures:
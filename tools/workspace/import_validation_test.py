@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import json
+
 import pytest
 
-from workspace import models
+from workspace import models, parallelism, plan
 from workspace.import_validation import (
     IMPORTS_GENERATED_TF,
     SKIP_SENTINEL,
@@ -13,11 +15,13 @@ from workspace.import_validation import (
     assert_import_plan,
     assert_no_actions_outside_prefixes,
     backup_and_restore_state,
+    example_state,
     extract_import_id,
     extract_state_resources,
     generate_import_blocks_tf,
     resolve_import_entries,
     validate_atlas_types,
+    validate_per_example,
 )
 
 MAPPING = {
@@ -541,3 +545,78 @@ def test_assert_clean_plan_known_change_actions_mismatch():
     failures = assert_clean_plan(plan_json, _make_example("enc", [kc]))
     assert len(failures) == 1
     assert "expected actions" in failures[0]
+
+
+def test_example_state_keeps_root_and_own_example():
+    state = {
+        "version": 4,
+        "outputs": {"ex_a": {}, "ex_b": {}, "shared": {}},
+        "resources": [
+            {"mode": "managed", "type": "random_string", "name": "suffix"},
+            {"module": "module.ex_a", "type": "t", "name": "x"},
+            {"module": "module.ex_a.module.atlas_project", "type": "t", "name": "y"},
+            {"module": "module.ex_ab", "type": "t", "name": "z"},
+            {"module": "module.ex_b", "type": "t", "name": "x"},
+        ],
+    }
+    filtered = example_state(state, models.Example(name="a"))
+    assert [r.get("module", "") for r in filtered["resources"]] == [
+        "",
+        "module.ex_a",
+        "module.ex_a.module.atlas_project",
+    ]
+    assert set(filtered["outputs"]) == {"ex_a", "shared"}
+    assert filtered["version"] == 4
+
+
+def _change(address: str, actions: list[str]) -> dict:
+    return {"address": address, "change": {"actions": actions, "importing": {"id": "x"}}}
+
+
+def test_validate_per_example_isolates_failing_example(tmp_path, monkeypatch):
+    monkeypatch.setattr(models, "REPO_ROOT", tmp_path)
+    for name in ("a", "b"):
+        (tmp_path / "examples" / name).mkdir(parents=True)
+    ws_dir = tmp_path / "tests" / "workspace_x"
+    ws_dir.mkdir(parents=True)
+    (ws_dir / "main.tf").write_text("# workspace\n")
+    state = {"resources": [{"module": f"module.ex_{n}", "name": "p"} for n in ("a", "b")]}
+    (ws_dir / TFSTATE_FILE).write_text(json.dumps(state))
+    examples = [models.Example(name="a"), models.Example(name="b")]
+    config = models.WsConfig(examples=examples, var_groups={})
+    entries = [(f"module.ex_{n}.mongodbatlas_project.this", f"id-{n}") for n in ("a", "b")]
+
+    applied: list[str] = []
+    copy_states: dict[str, list] = {}
+
+    def fake_plan(dest, *_, **__):
+        copy_states[dest.name] = json.loads((dest / TFSTATE_FILE).read_text())["resources"]
+        # Example b drifts on import; a imports cleanly and stays clean after apply.
+        actions = ["update"] if dest.name == "ex_b" else ["no-op"]
+        return {
+            "resource_changes": [_change(f"module.{dest.name}.mongodbatlas_project.this", actions)]
+        }
+
+    monkeypatch.setattr(plan, "run_terraform_init", lambda *_, **__: None)
+    monkeypatch.setattr(plan, "run_terraform_state_rm", lambda *_: None)
+    monkeypatch.setattr(plan, "run_terraform_plan", fake_plan)
+    monkeypatch.setattr(
+        plan, "run_terraform_apply_plan", lambda dest, *_, **__: applied.append(dest.name)
+    )
+
+    failures = validate_per_example(ws_dir, config, examples, entries, [])
+
+    assert applied == ["ex_a"]
+    assert len(failures) == 1
+    assert "import drift" in failures[0]
+    assert copy_states["ex_a"] == [state["resources"][0]]
+    assert copy_states["ex_b"] == [state["resources"][1]]
+    assert json.loads((ws_dir / TFSTATE_FILE).read_text()) == state
+
+
+def test_validate_per_example_without_import_entries(tmp_path):
+    examples = [models.Example(name="a")]
+    config = models.WsConfig(
+        examples=examples, var_groups={}, parallelism=parallelism.parse_settings({"plan": 4})
+    )
+    assert validate_per_example(tmp_path, config, examples, [], []) == []
@@ -1,6 +1,7 @@
 # path-sync copy -n sdlc
 from __future__ import annotations
 
+import enum
 import re
 from dataclasses import dataclass, field
 from pathlib import Path
@@ -8,6 +9,8 @@ from typing import Any
 
 import yaml
 
+from workspace import parallelism
+
 REPO_ROOT = Path(__file__).parent.parent.parent
 DEFAULT_TESTS_DIR = REPO_ROOT / "tests"
 
@@ -132,6 +135,13 @@ class Example:
         """
         return len(self.plan_regressions) > 1
 
+    def snapshot_relpath(self, address: str) -> str:
+        """Snapshot file path relative to plan_snapshots/ (and plan_snapshots_actual/)."""
+        sanitized = sanitize_address(address)
+        if self.should_use_nested_snapshots():
+            return f"{self.identifier}/{sanitized}.yaml"
+        return f"{self.identifier}_{sanitized}.yaml"
+
     @property
     def identifier(self) -> str:
         if self.name:
@@ -179,11 +189,41 @@ class Example:
         return dir_name.replace("_", " ").title()
 
 
+@dataclass
+class MockProvider:
+    """`mock_provider` block for offline plans; defaults map type -> attribute values."""
+
+    name: str
+    mock_resources: dict[str, dict[str, Any]] = field(default_factory=dict)
+    mock_data: dict[str, dict[str, Any]] = field(default_factory=dict)
+
+
+DEFAULT_MOCK_PROVIDERS = ["mongodbatlas"]
+
+
+@dataclass
+class OfflineConfig:
+    mock_providers: list[MockProvider] = field(
+        default_factory=lambda: [MockProvider(name) for name in DEFAULT_MOCK_PROVIDERS]
+    )
+    variables: dict[str, Any] = field(default_factory=dict)
+
+
+class SnapshotLayout(enum.StrEnum):
+    """Expected snapshots as one file per regression, or one bundle (see snapshot_bundle)."""
+
+    FILES = "files"
+    BUNDLE = "bundle"
+
+
 @dataclass
 class WsConfig:
     examples: list[Example]
     var_groups: dict[str, list[WsVar]]
     resource_type_import_ids: dict[str, str] = field(default_factory=dict)
+    parallelism: dict[parallelism.TfMode, parallelism.Setting] = field(default_factory=dict)
+    offline: OfflineConfig = field(default_factory=OfflineConfig)
+    snapshot_layout: SnapshotLayout = SnapshotLayout.FILES
 
     def redact_var_attributes_for_example(self, example: Example) -> list[str]:
         """Variable names to redact for a specific example's var_groups."""
@@ -264,9 +304,29 @@ def parse_ws_config(ws_yaml_path: Path) -> WsConfig:
         examples=examples,
         var_groups=var_groups,
         resource_type_import_ids=resource_type_import_ids,
+        parallelism=parallelism.parse_settings(data.get("parallelism")),
+        offline=_parse_offline(data.get("offline", {})),
+        snapshot_layout=SnapshotLayout(data.get("snapshot_layout", SnapshotLayout.FILES)),
     )
 
 
+def _parse_offline(data: dict[str, Any]) -> OfflineConfig:
+    if not data:
+        return OfflineConfig()
+    providers = data.get("mock_providers")
+    if providers is None:
+        return OfflineConfig(variables=data.get("variables", {}))
+    mock_providers = [
+        MockProvider(
+            name=name,
+            mock_resources=(mocks or {}).get("mock_resources", {}),
+            mock_data=(mocks or {}).get("mock_data", {}),
+        )
+        for name, mocks in providers.items()
+    ]
+    return OfflineConfig(mock_providers=mock_providers, variables=data.get("variables", {}))
+
+
 def _parse_import_validation(data: dict[str, Any]) -> ImportValidationConfig:
     if not data:
         return ImportValidationConfig()
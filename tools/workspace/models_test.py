@@ -339,6 +339,34 @@ var_groups:
     assert a1.not_empty
 
 
+def test_parse_ws_config_offline(tmp_path: Path):
+    ws_config = tmp_path / models.WORKSPACE_CONFIG_FILE
+    ws_config.write_text("""
+examples: []
+offline:
+  variables:
+    org_id: "000000000000000000000000"
+  mock_providers:
+    mongodbatlas:
+      mock_data:
+        mongodbatlas_project:
+          cluster_count: 2
+    random: {}
+""")
+    offline = models.parse_ws_config(ws_config).offline
+    assert offline.variables == {"org_id": "000000000000000000000000"}
+    assert [p.name for p in offline.mock_providers] == ["mongodbatlas", "random"]
+    assert offline.mock_providers[0].mock_data == {"mongodbatlas_project": {"cluster_count": 2}}
+    assert offline.mock_providers[1].mock_resources == {}
+
+
+def test_parse_ws_config_offline_defaults_to_mock_atlas(tmp_path: Path):
+    ws_config = tmp_path / models.WORKSPACE_CONFIG_FILE
+    ws_config.write_text("examples: []\n")
+    offline = models.parse_ws_config(ws_config).offline
+    assert [p.name for p in offline.mock_providers] == models.DEFAULT_MOCK_PROVIDERS
+
+
 def test_output_assertion_invalid_regex():
     with pytest.raises(ValueError, match="invalid regex pattern"):
         models.OutputAssertion(output="name", pattern=r"[invalid")
@@ -9,7 +9,7 @@ from typing import Any
 
 import typer
 
-from workspace import gen, models, plan
+from workspace import gen, models, plan, tracing
 
 app = typer.Typer()
 
@@ -80,7 +80,9 @@ def process_workspace(ws_dir: Path, include_examples: str = "all") -> None:
         return
     raw_outputs = plan.run_terraform_output_json(ws_dir)
     typer.echo("Running output assertions...")
-    if not run_output_assertions(filtered_config, raw_outputs):
+    with tracing.span("output assertions"):
+        passed = run_output_assertions(filtered_config, raw_outputs)
+    if not passed:
         typer.echo("Output assertions FAILED", err=True)
         raise typer.Exit(1)
     typer.echo("All output assertions passed")
@@ -0,0 +1,138 @@
+# path-sync copy -n sdlc
+"""Terraform `-parallelism` per workspace and mode.
+
+`parallelism:` in workspace_test_config.yaml maps `plan`, `apply` and `destroy` to a
+number or `auto` (unset modes keep Terraform's default of 10). `auto` scales plan
+parallelism with the resource count of the workspace's last plan, lowers apply/destroy
+parallelism for large change sets, and halves the result for each Atlas rate-limit error
+seen in the last hours.
+Both inputs are kept in `<TF data dir>/workspace_parallelism.json`; removing `.terraform`
+resets them.
+"""
+
+from __future__ import annotations
+
+import enum
+import json
+import math
+import re
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+import typer
+
+from shared import tf_retry
+
+AUTO = "auto"
+STATE_FILE = "workspace_parallelism.json"
+TERRAFORM_DEFAULT = 10
+# Plan mostly refreshes/reads, so large workspaces get more workers than apply.
+PLAN_MAX = 64
+RESOURCES_PER_PLAN_WORKER = 4
+# Applies with this many changes start at half the default to stay under rate limits.
+LARGE_APPLY_CHANGES = 100
+RATE_LIMIT_WINDOW_SECONDS = 6 * 3600
+RATE_LIMIT_MAX_RECORDED = 8
+RATE_LIMIT_PATTERN = re.compile(
+    r"\b429\b|RATE_LIMIT_EXCEEDED|TOO_MANY_REQUESTS|Too Many Requests", re.IGNORECASE
+)
+NOOP_ACTIONS = (["no-op"], ["read"])
+
+
+class TfMode(enum.StrEnum):
+    PLAN = "plan"
+    APPLY = "apply"
+    DESTROY = "destroy"
+
+
+Setting = int | str
+
+
+def parse_settings(data: dict[str, Any] | None) -> dict[TfMode, Setting]:
+    settings: dict[TfMode, Setting] = {}
+    for mode, value in (data or {}).items():
+        try:
+            tf_mode = TfMode(mode)
+        except ValueError:
+            raise ValueError(
+                f"parallelism: unknown mode {mode!r}, expected one of {[m.value for m in TfMode]}"
+            ) from None
+        if value != AUTO and (not isinstance(value, int) or isinstance(value, bool) or value < 1):
+            raise ValueError(f"parallelism.{mode}: expected a positive integer or {AUTO!r}")
+        settings[tf_mode] = value
+    return settings
+
+
+@dataclass
+class ParallelismState:
+    resource_count: int | None = None
+    change_count: int | None = None
+    rate_limited_at: list[float] = field(default_factory=list)
+
+    def recent_rate_limits(self, now: float) -> int:
+        return sum(1 for t in self.rate_limited_at if now - t < RATE_LIMIT_WINDOW_SECONDS)
+
+
+def _state_path(ws_dir: Path) -> Path:
+    return tf_retry.data_dir(ws_dir) / STATE_FILE
+
+
+def load_state(ws_dir: Path) -> ParallelismState:
+    path = _state_path(ws_dir)
+    if not path.exists():
+        return ParallelismState()
+    try:
+        data = json.loads(path.read_text())
+    except json.JSONDecodeError:
+        return ParallelismState()
+    if not isinstance(data, dict):
+        return ParallelismState()
+    return ParallelismState(
+        resource_count=data.get("resource_count"),
+        change_count=data.get("change_count"),
+        rate_limited_at=data.get("rate_limited_at", []),
+    )
+
+
+def save_state(ws_dir: Path, state: ParallelismState) -> None:
+    path = _state_path(ws_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(asdict(state)))
+
+
+def record_plan(ws_dir: Path, plan_data: dict[str, Any]) -> None:
+    changes = plan_data.get("resource_changes", [])
+    state = load_state(ws_dir)
+    state.resource_count = len(changes)
+    state.change_count = sum(
+        1 for rc in changes if rc.get("change", {}).get("actions", []) not in NOOP_ACTIONS
+    )
+    save_state(ws_dir, state)
+
+
+def record_rate_limit(ws_dir: Path, now: float | None = None) -> None:
+    state = load_state(ws_dir)
+    state.rate_limited_at = [*state.rate_limited_at, now or time.time()][-RATE_LIMIT_MAX_RECORDED:]
+    save_state(ws_dir, state)
+
+
+def auto_parallelism(state: ParallelismState, mode: TfMode, now: float | None = None) -> int:
+    base = TERRAFORM_DEFAULT
+    if mode == TfMode.PLAN and state.resource_count is not None:
+        wanted = math.ceil(state.resource_count / RESOURCES_PER_PLAN_WORKER)
+        base = min(max(wanted, TERRAFORM_DEFAULT), PLAN_MAX)
+    elif mode != TfMode.PLAN and (state.change_count or 0) >= LARGE_APPLY_CHANGES:
+        base //= 2
+    return max(1, base >> state.recent_rate_limits(now or time.time()))
+
+
+def resolve(ws_dir: Path, settings: dict[TfMode, Setting], mode: TfMode) -> int | None:
+    """`-parallelism` value for `mode`, or None to keep Terraform's default."""
+    setting = settings.get(mode)
+    if setting != AUTO:
+        return setting
+    value = auto_parallelism(load_state(ws_dir), mode)
+    typer.echo(f"  Auto parallelism for terraform {mode}: {value}")
+    return value
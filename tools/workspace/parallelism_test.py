@@ -0,0 +1,91 @@
+# path-sync copy -n sdlc
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+
+from workspace import parallelism, plan
+from workspace.parallelism import AUTO, ParallelismState, TfMode
+
+
+def test_parse_settings():
+    settings = parallelism.parse_settings({"plan": AUTO, "apply": 4})
+    assert settings == {TfMode.PLAN: AUTO, TfMode.APPLY: 4}
+    assert parallelism.parse_settings(None) == {}
+
+
+@pytest.mark.parametrize(
+    "data",
+    [{"refresh": 4}, {"plan": 0}, {"apply": "fast"}, {"destroy": True}],
+    ids=["unknown-mode", "zero", "string", "bool"],
+)
+def test_parse_settings_rejects_invalid(data: dict):
+    with pytest.raises(ValueError, match="parallelism"):
+        parallelism.parse_settings(data)
+
+
+@pytest.mark.parametrize(
+    ("state", "mode", "expected"),
+    [
+        (ParallelismState(), TfMode.PLAN, 10),
+        (ParallelismState(resource_count=20), TfMode.PLAN, 10),
+        (ParallelismState(resource_count=120), TfMode.PLAN, 30),
+        (ParallelismState(resource_count=1000), TfMode.PLAN, 64),
+        (ParallelismState(change_count=20), TfMode.APPLY, 10),
+        (ParallelismState(change_count=150), TfMode.DESTROY, 5),
+        (ParallelismState(resource_count=120, rate_limited_at=[990.0, 995.0]), TfMode.PLAN, 7),
+        (ParallelismState(rate_limited_at=[1000.0 - 7 * 3600]), TfMode.APPLY, 10),
+        (ParallelismState(rate_limited_at=[999.0] * 8), TfMode.APPLY, 1),
+    ],
+)
+def test_auto_parallelism(state: ParallelismState, mode: TfMode, expected: int):
+    assert parallelism.auto_parallelism(state, mode, now=1000.0) == expected
+
+
+def test_record_plan_and_rate_limits_round_trip(tmp_path: Path):
+    plan_data = {
+        "resource_changes": [
+            {"change": {"actions": ["no-op"]}},
+            {"change": {"actions": ["read"]}},
+            {"change": {"actions": ["create"]}},
+        ]
+    }
+    parallelism.record_plan(tmp_path, plan_data)
+    for now in range(10):
+        parallelism.record_rate_limit(tmp_path, now=float(now + 1))
+
+    state = parallelism.load_state(tmp_path)
+    assert (state.resource_count, state.change_count) == (3, 1)
+    assert state.rate_limited_at == [float(n) for n in range(3, 11)]
+
+
+def test_resolve(tmp_path: Path):
+    settings = {TfMode.PLAN: AUTO, TfMode.APPLY: 3}
+    parallelism.record_plan(tmp_path, {"resource_changes": [{}] * 200})
+    assert parallelism.resolve(tmp_path, settings, TfMode.PLAN) == 50
+    assert parallelism.resolve(tmp_path, settings, TfMode.APPLY) == 3
+    assert parallelism.resolve(tmp_path, settings, TfMode.DESTROY) is None
+
+
+def test_run_terraform_cmd_records_rate_limit(tmp_path: Path, capfd: pytest.CaptureFixture[str]):
+    script = (
+        "import sys; print('planning'); "
+        "print('Error: HTTP 429 (Error code: \"RATE_LIMIT_EXCEEDED\")', file=sys.stderr); "
+        "sys.exit(1)"
+    )
+    assert plan.run_terraform_cmd([sys.executable, "-c", script], tmp_path) == 1
+    captured = capfd.readouterr()
+    assert captured.out.startswith("planning\n")
+    assert "RATE_LIMIT_EXCEEDED" in captured.err
+    assert len(parallelism.load_state(tmp_path).rate_limited_at) == 1
+
+    assert plan.run_terraform_cmd([sys.executable, "-c", "print('ok')"], tmp_path) == 0
+    assert len(parallelism.load_state(tmp_path).rate_limited_at) == 1
+
+    copy_dir = tmp_path / "copy"
+    copy_dir.mkdir()
+    assert plan.run_terraform_cmd([sys.executable, "-c", script], copy_dir, tmp_path) == 1
+    assert len(parallelism.load_state(tmp_path).rate_limited_at) == 2
+    assert parallelism.load_state(copy_dir).rate_limited_at == []
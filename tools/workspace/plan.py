@@ -3,19 +3,24 @@
 
 from __future__ import annotations
 
+import codecs
 import contextlib
+import hashlib
 import json
 import logging
 import re
+import shutil
 import subprocess
+import sys
+import tempfile
 from collections.abc import Generator
 from pathlib import Path
-from typing import Any
+from typing import Any, TextIO
 
 import typer
 
 from shared import tf_retry
-from workspace import models
+from workspace import gen, models, parallelism, plan_cache, plan_stream, tracing
 
 logger = logging.getLogger(__name__)
 
@@ -28,19 +33,118 @@ OUTPUTS_ACTUAL_JSON = "outputs_actual.json"
 PROVIDER_VERSION_OVERRIDE_FILE = "provider_version_override.tf"
 MONGODB_ATLAS_PROVIDER_NAME = "mongodbatlas"
 MONGODB_ATLAS_PROVIDER_SOURCE = "mongodb/mongodbatlas"
-
-
-def run_cmd(cmd: list[str], cwd: Path) -> int:
-    result = subprocess.run(cmd, cwd=cwd)
-    return result.returncode
-
-
-def run_terraform_init(ws_dir: Path) -> None:
+LOCK_FILE = ".terraform.lock.hcl"
+# Sections of `terraform show -json plan.bin` used by the run stages; prior_state and
+# configuration are skipped while parsing.
+PLAN_SECTIONS = (
+    "format_version",
+    "terraform_version",
+    "variables",
+    "planned_values",
+    "resource_changes",
+    "output_changes",
+)
+# Stored inside the TF data dir so removing `.terraform` also forces a fresh init.
+INIT_FINGERPRINT_FILE = "workspace_init.sha256"
+TFSTATE_FILE = "terraform.tfstate"
+# `terraform show -json` of the state, reused while its serial, lineage and lock file match.
+STATE_JSON_CACHE_FILE = "workspace_state_show.json"
+STATE_JSON_KEY_FILE = "workspace_state_show.key"
+LOCAL_MODULE_SOURCE_PATTERN = re.compile(r'^\s*source\s*=\s*"(\.\.?/[^"]*)"', re.MULTILINE)
+
+
+def _parallelism_args(parallelism: int | None) -> list[str]:
+    return [] if parallelism is None else [f"-parallelism={parallelism}"]
+
+
+def _target_args(targets: list[str] | None) -> list[str]:
+    return [f"-target={target}" for target in targets or []]
+
+
+def run_terraform_cmd(cmd: list[str], ws_dir: Path, record_dir: Path | None = None) -> int:
+    """Run `cmd` in `ws_dir` and record Atlas rate-limit errors for `record_dir` (default
+    `ws_dir`; shard and import copies record against their workspace).
+
+    stdout is inherited; stderr, where terraform prints errors, is scanned and passed
+    through to stderr in chunks rather than lines so partial output still shows up.
+    """
+    rate_limited = False
+    tail = ""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    sys.stdout.flush()
+    with (
+        tracing.span(" ".join(cmd[:2]), dir=ws_dir.name),
+        subprocess.Popen(cmd, cwd=ws_dir, stderr=subprocess.PIPE) as proc,
+    ):
+        assert proc.stderr is not None
+        while chunk := proc.stderr.read1():
+            text = decoder.decode(chunk)
+            sys.stderr.write(text)
+            sys.stderr.flush()
+            rate_limited = rate_limited or bool(parallelism.RATE_LIMIT_PATTERN.search(tail + text))
+            tail = text[-200:]
+        tracing.annotate(exit_code=proc.wait())
+    if rate_limited:
+        record_dir = record_dir or ws_dir
+        typer.echo(f"  Rate limiting detected in {record_dir.name}; auto parallelism will back off")
+        parallelism.record_rate_limit(record_dir)
+    return proc.returncode
+
+
+def local_module_dirs(root_dir: Path) -> list[Path]:
+    """Directories of local (`./` or `../`) module sources reachable from `root_dir`."""
+    found: dict[Path, None] = {}
+    pending = [root_dir.resolve()]
+    while pending:
+        current = pending.pop()
+        for tf_file in sorted(current.glob("*.tf")):
+            for source in LOCAL_MODULE_SOURCE_PATTERN.findall(tf_file.read_text()):
+                module_dir = (current / source).resolve()
+                if module_dir not in found and module_dir.is_dir():
+                    found[module_dir] = None
+                    pending.append(module_dir)
+    return sorted(found)
+
+
+def init_fingerprint(ws_dir: Path) -> str:
+    """Hash of everything `terraform init` depends on.
+
+    Covers the lock file and every `*.tf` in the workspace (including modules.generated.tf
+    and the provider version override) and in the local module sources it reaches.
+    """
+    digest = hashlib.sha256()
+    lock_file = ws_dir / LOCK_FILE
+    digest.update(lock_file.read_bytes() if lock_file.exists() else b"<no lock file>")
+    for directory in [ws_dir.resolve(), *local_module_dirs(ws_dir)]:
+        for tf_file in sorted(directory.glob("*.tf")):
+            digest.update(str(tf_file).encode())
+            digest.update(tf_file.read_bytes())
+    return digest.hexdigest()
+
+
+def _init_fingerprint_path(ws_dir: Path) -> Path:
+    return tf_retry.data_dir(ws_dir) / INIT_FINGERPRINT_FILE
+
+
+def run_terraform_init(ws_dir: Path, force: bool = False) -> None:
+    fingerprint_path = _init_fingerprint_path(ws_dir)
+    if (
+        not force
+        and fingerprint_path.exists()
+        and fingerprint_path.read_text() == init_fingerprint(ws_dir)
+    ):
+        typer.echo(f"Skipping terraform init in {ws_dir.name}: unchanged since last init")
+        return
     logger.info(f"Running terraform init in {ws_dir.name}...")
+    retries = tf_retry.retry_count(ws_dir)
     try:
-        result = tf_retry.run_terraform_init(
-            ["terraform", "init", "-upgrade", "-input=false"], ws_dir
-        )
+        with tracing.span("terraform init", dir=ws_dir.name):
+            try:
+                result = tf_retry.run_terraform_init(
+                    ["terraform", "init", "-upgrade", "-input=false"], ws_dir
+                )
+            finally:
+                tracing.annotate(retries=tf_retry.retry_count(ws_dir) - retries)
     except tf_retry.TerraformInitError as e:
         logger.error(f"terraform init failed: {e.stderr[:200]}")
         raise typer.Exit(1) from e
@@ -48,49 +152,146 @@ def run_terraform_init(ws_dir: Path) -> None:
         typer.echo(result.stdout.rstrip())
     if result.stderr:
         typer.echo(result.stderr.rstrip(), err=True)
+    # Recompute after init: `-upgrade` may have rewritten the lock file.
+    fingerprint_path.parent.mkdir(parents=True, exist_ok=True)
+    fingerprint_path.write_text(init_fingerprint(ws_dir))
 
 
-def run_terraform_plan(ws_dir: Path, var_files: list[Path], skip_init: bool = False) -> None:
+def run_terraform_plan(
+    ws_dir: Path,
+    var_files: list[Path],
+    skip_init: bool = False,
+    write_json: bool = True,
+    parallelism: int | None = None,
+    targets: list[str] | None = None,
+    record_dir: Path | None = None,
+    write_cache: bool = True,
+) -> dict[str, Any]:
+    """Plan to plan.bin and return its parsed JSON; plan.json is only written if `write_json`.
+
+    `targets` limits planning and refresh to those addresses (and their dependencies).
+    `record_dir` is the workspace that rate limits count against (see run_terraform_cmd).
+    Throwaway copies whose plan_cache nothing reads pass `write_cache=False`.
+    """
     if not skip_init:
         run_terraform_init(ws_dir)
     plan_cmd = ["terraform", "plan", f"-out={PLAN_BIN}", "-input=false"]
+    plan_cmd.extend(_parallelism_args(parallelism))
+    plan_cmd.extend(_target_args(targets))
     for vf in var_files:
         plan_cmd.extend(["-var-file", str(vf)])
     typer.echo("Running terraform plan...")
-    if run_cmd(plan_cmd, ws_dir) != 0:
+    if run_terraform_cmd(plan_cmd, ws_dir, record_dir) != 0:
         raise typer.Exit(1)
-    typer.echo("Exporting plan to JSON...")
     plan_json_path = ws_dir / PLAN_JSON
-    with open(plan_json_path, "w") as f:
-        subprocess.run(["terraform", "show", "-json", PLAN_BIN], cwd=ws_dir, stdout=f, check=True)
-    typer.echo(f"Plan saved to {PLAN_JSON}")
-
-
-def run_terraform_apply_plan(ws_dir: Path) -> None:
+    if not write_json:
+        # A plan.json left from an earlier run would no longer match plan.bin.
+        plan_json_path.unlink(missing_ok=True)
+        with terraform_show_json_stream(ws_dir, PLAN_BIN) as stream:
+            plan_data = plan_stream.load_sections(stream, PLAN_SECTIONS)
+            tracing.annotate(resources=len(plan_data.get("resource_changes", [])))
+    else:
+        typer.echo("Exporting plan to JSON...")
+        with (
+            tracing.span("terraform show -json", dir=ws_dir.name),
+            open(plan_json_path, "w") as f,
+        ):
+            subprocess.run(
+                ["terraform", "show", "-json", PLAN_BIN], cwd=ws_dir, stdout=f, check=True
+            )
+        typer.echo(f"Plan saved to {PLAN_JSON}")
+        with tracing.span("parse plan.json", dir=ws_dir.name):
+            plan_data = plan_stream.load_sections(plan_json_path, PLAN_SECTIONS)
+            tracing.annotate(resources=len(plan_data.get("resource_changes", [])))
+    if write_cache:
+        with tracing.span("write plan cache", dir=ws_dir.name):
+            plan_cache.write(ws_dir, plan_data)
+    return plan_data
+
+
+def run_terraform_test_plan(
+    ws_dir: Path, var_files: list[Path], skip_init: bool = False, write_json: bool = True
+) -> dict[str, Any]:
+    """Plan offline via `terraform test` on gen.OFFLINE_TFTEST (mock providers, no API calls).
+
+    `-json -verbose` makes terraform print the plan of each `run` block as a `test_plan`
+    message; no plan.bin is written, so this only serves the plan modes.
+    """
+    if not skip_init:
+        run_terraform_init(ws_dir)
+    test_cmd = ["terraform", "test", "-json", "-verbose", f"-filter={gen.OFFLINE_TFTEST}"]
+    for vf in var_files:
+        test_cmd.extend(["-var-file", str(vf)])
+    typer.echo("Running terraform test (offline plan)...")
+    plan_data: dict[str, Any] | None = None
+    with (
+        tracing.span("terraform test", dir=ws_dir.name),
+        subprocess.Popen(test_cmd, cwd=ws_dir, stdout=subprocess.PIPE, text=True) as proc,
+    ):
+        assert proc.stdout is not None
+        for line in proc.stdout:
+            try:
+                message = json.loads(line)
+            except json.JSONDecodeError:
+                typer.echo(line.rstrip())
+                continue
+            if "test_plan" in message:
+                plan_data = {k: v for k, v in message["test_plan"].items() if k in PLAN_SECTIONS}
+            elif text := message.get("@message"):
+                typer.echo(f"  {text}")
+        if plan_data is not None:
+            tracing.annotate(resources=len(plan_data.get("resource_changes", [])))
+    if proc.returncode != 0 or plan_data is None:
+        typer.echo(f"terraform test did not produce an offline plan in {ws_dir.name}", err=True)
+        raise typer.Exit(1)
+    plan_json_path = ws_dir / PLAN_JSON
+    if write_json:
+        plan_json_path.write_text(json.dumps(plan_data))
+        typer.echo(f"Plan saved to {PLAN_JSON}")
+        plan_cache.write(ws_dir, plan_data)
+    else:
+        plan_json_path.unlink(missing_ok=True)
+        # No plan.bin either; a cache of an earlier plan.bin must not be used.
+        plan_cache.invalidate(ws_dir)
+    return plan_data
+
+
+def run_terraform_apply_plan(
+    ws_dir: Path, parallelism: int | None = None, record_dir: Path | None = None
+) -> None:
     typer.echo("Applying saved plan...")
-    if run_cmd(["terraform", "apply", "-input=false", PLAN_BIN], ws_dir) != 0:
+    apply_cmd = ["terraform", "apply", "-input=false", *_parallelism_args(parallelism)]
+    if run_terraform_cmd([*apply_cmd, PLAN_BIN], ws_dir, record_dir) != 0:
         raise typer.Exit(1)
 
 
-def run_terraform_apply(ws_dir: Path, var_files: list[Path], auto_approve: bool = False) -> None:
-    apply_cmd = ["terraform", "apply", "-input=false"]
+def run_terraform_apply(
+    ws_dir: Path,
+    var_files: list[Path],
+    auto_approve: bool = False,
+    parallelism: int | None = None,
+    targets: list[str] | None = None,
+) -> None:
+    apply_cmd = ["terraform", "apply", "-input=false", *_parallelism_args(parallelism)]
+    apply_cmd.extend(_target_args(targets))
     for vf in var_files:
         apply_cmd.extend(["-var-file", str(vf)])
     if auto_approve:
         apply_cmd.append("-auto-approve")
     typer.echo("Running terraform apply...")
-    if run_cmd(apply_cmd, ws_dir) != 0:
+    if run_terraform_cmd(apply_cmd, ws_dir) != 0:
         raise typer.Exit(1)
 
 
 def run_terraform_output_json(ws_dir: Path) -> dict[str, Any]:
     typer.echo("Capturing terraform output...")
-    result = subprocess.run(
-        ["terraform", "output", "-json"],
-        cwd=ws_dir,
-        capture_output=True,
-        text=True,
-    )
+    with tracing.span("terraform output", dir=ws_dir.name):
+        result = subprocess.run(
+            ["terraform", "output", "-json"],
+            cwd=ws_dir,
+            capture_output=True,
+            text=True,
+        )
     if result.returncode != 0:
         typer.echo(f"terraform output failed: {result.stderr}", err=True)
         raise typer.Exit(1)
@@ -101,18 +302,85 @@ def run_terraform_output_json(ws_dir: Path) -> dict[str, Any]:
     return outputs
 
 
+@contextlib.contextmanager
+def terraform_show_json_stream(ws_dir: Path, *args: str) -> Generator[TextIO]:
+    """Yield the stdout of `terraform show -json [args]` for incremental parsing (plan_stream).
+
+    The traced span includes the caller's parsing, which overlaps the subprocess.
+    """
+    logger.info(f"Running terraform show -json {' '.join(args)} in {ws_dir.name}...")
+    with (
+        tracing.span("terraform show -json", dir=ws_dir.name),
+        tempfile.TemporaryFile("w+") as stderr,
+        subprocess.Popen(
+            ["terraform", "show", "-json", *args],
+            cwd=ws_dir,
+            stdout=subprocess.PIPE,
+            stderr=stderr,
+            text=True,
+        ) as proc,
+    ):
+        assert proc.stdout is not None
+        yield proc.stdout
+        # Drain what the caller did not read so terraform exits cleanly.
+        while proc.stdout.read(plan_stream.CHUNK_SIZE):
+            pass
+        if proc.wait() != 0:
+            stderr.seek(0)
+            typer.echo(f"terraform show -json failed: {stderr.read()}", err=True)
+            raise typer.Exit(1)
+
+
+def state_cache_key(ws_dir: Path) -> str | None:
+    """`<lineage>:<serial>:<lock hash>` of the local state, None without a readable tfstate.
+
+    Terraform bumps `serial` on every state write; the lock file hash covers provider
+    upgrades, which change how the same state renders.
+    """
+    tfstate = ws_dir / TFSTATE_FILE
+    if not tfstate.exists():
+        return None
+    try:
+        header = plan_stream.load_sections(tfstate, ("serial", "lineage"))
+    except ValueError:
+        return None
+    if len(header) != 2:
+        return None
+    lock_file = ws_dir / LOCK_FILE
+    lock_hash = hashlib.sha256(lock_file.read_bytes()).hexdigest() if lock_file.exists() else "-"
+    return f"{header['lineage']}:{header['serial']}:{lock_hash}"
+
+
+@contextlib.contextmanager
+def state_show_json_stream(ws_dir: Path) -> Generator[TextIO]:
+    """Like `terraform_show_json_stream(ws_dir)`, served from the TF data dir cache when the
+    state is unchanged (see `state_cache_key`); a miss refreshes the cache first.
+    """
+    key = state_cache_key(ws_dir)
+    if key is None:
+        with terraform_show_json_stream(ws_dir) as stream:
+            yield stream
+        return
+    cache_dir = tf_retry.data_dir(ws_dir)
+    cache_path = cache_dir / STATE_JSON_CACHE_FILE
+    key_path = cache_dir / STATE_JSON_KEY_FILE
+    if cache_path.exists() and key_path.exists() and key_path.read_text() == key:
+        logger.info(f"Reusing cached state JSON in {ws_dir.name}")
+    else:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        key_path.unlink(missing_ok=True)
+        tmp_path = cache_path.with_suffix(".tmp")
+        with terraform_show_json_stream(ws_dir) as stream, open(tmp_path, "w") as f:
+            shutil.copyfileobj(stream, f, plan_stream.CHUNK_SIZE)
+        tmp_path.replace(cache_path)
+        key_path.write_text(key)
+    with cache_path.open() as stream:
+        yield stream
+
+
 def run_terraform_show_json(ws_dir: Path) -> dict[str, Any]:
-    logger.info(f"Running terraform show -json in {ws_dir.name}...")
-    result = subprocess.run(
-        ["terraform", "show", "-json"],
-        cwd=ws_dir,
-        capture_output=True,
-        text=True,
-    )
-    if result.returncode != 0:
-        typer.echo(f"terraform show -json failed: {result.stderr}", err=True)
-        raise typer.Exit(1)
-    return json.loads(result.stdout)
+    with state_show_json_stream(ws_dir) as stream:
+        return json.load(stream)
 
 
 def run_terraform_state_rm(ws_dir: Path, addresses: list[str]) -> None:
@@ -120,21 +388,29 @@ def run_terraform_state_rm(ws_dir: Path, addresses: list[str]) -> None:
         return
     cmd = ["terraform", "state", "rm", *addresses]
     logger.info(f"Removing {len(addresses)} resources from state...")
-    result = subprocess.run(cmd, cwd=ws_dir, capture_output=True, text=True)
+    with tracing.span("terraform state rm", dir=ws_dir.name):
+        result = subprocess.run(cmd, cwd=ws_dir, capture_output=True, text=True)
     if result.returncode != 0:
         typer.echo(f"terraform state rm failed: {result.stderr}", err=True)
         raise typer.Exit(1)
     logger.info(result.stdout.strip())
 
 
-def run_terraform_destroy(ws_dir: Path, var_files: list[Path], auto_approve: bool = False) -> None:
-    destroy_cmd = ["terraform", "destroy", "-input=false"]
+def run_terraform_destroy(
+    ws_dir: Path,
+    var_files: list[Path],
+    auto_approve: bool = False,
+    parallelism: int | None = None,
+    targets: list[str] | None = None,
+) -> None:
+    destroy_cmd = ["terraform", "destroy", "-input=false", *_parallelism_args(parallelism)]
+    destroy_cmd.extend(_target_args(targets))
     for vf in var_files:
         destroy_cmd.extend(["-var-file", str(vf)])
     if auto_approve:
         destroy_cmd.append("-auto-approve")
     typer.echo("Running terraform destroy...")
-    if run_cmd(destroy_cmd, ws_dir) != 0:
+    if run_terraform_cmd(destroy_cmd, ws_dir) != 0:
         raise typer.Exit(1)
 
 
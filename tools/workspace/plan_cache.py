@@ -0,0 +1,164 @@
+# path-sync copy -n sdlc
+"""SQLite index of the last plan, for address and example-prefix queries without plan.json.
+
+`plan.run_terraform_plan` writes `plan.cache.sqlite` next to plan.bin with one row per
+address: example prefix (see plan_index), module address, mode, type, name, planned
+values and resource change (JSON). Changes of deposed objects get a row of their own,
+keyed by address and deposed key. The cache records the size and mtime of its source
+(plan.json when written, otherwise plan.bin) and is ignored once that no longer matches,
+so a plan.json from another run is never shadowed by a stale cache.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import sqlite3
+from collections.abc import Generator, Iterable
+from pathlib import Path
+from typing import Any
+
+from workspace import plan_index, plan_stream
+
+PLAN_CACHE_FILE = "plan.cache.sqlite"
+# Bump when the schema changes; older caches are then ignored.
+SCHEMA_VERSION = "2"
+# Same names as plan.PLAN_BIN and plan.PLAN_JSON (plan imports this module).
+PLAN_BIN = "plan.bin"
+PLAN_JSON = "plan.json"
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE resources (
+    address TEXT NOT NULL,
+    deposed TEXT NOT NULL,
+    prefix TEXT NOT NULL,
+    module_address TEXT,
+    mode TEXT,
+    type TEXT,
+    name TEXT,
+    planned_values TEXT,
+    change TEXT,
+    PRIMARY KEY (address, deposed)
+);
+CREATE INDEX resources_prefix ON resources (prefix);
+"""
+
+
+def cache_path(ws_dir: Path) -> Path:
+    return ws_dir / PLAN_CACHE_FILE
+
+
+def _source_signature(ws_dir: Path) -> str | None:
+    for name in (PLAN_JSON, PLAN_BIN):
+        with contextlib.suppress(FileNotFoundError):
+            stat = (ws_dir / name).stat()
+            return f"{name}:{stat.st_size}:{stat.st_mtime_ns}"
+    return None
+
+
+def _rows(plan_data: dict[str, Any]) -> Iterable[tuple[Any, ...]]:
+    rows: dict[tuple[str, str], dict[str, Any]] = {}
+    root = plan_data.get("planned_values", {}).get("root_module", {})
+    for r in plan_stream.module_resources(root):
+        rows[r["address"], ""] = {"meta": r, "values": json.dumps(r.get("values", {}))}
+    for rc in plan_data.get("resource_changes", []):
+        row = rows.setdefault((rc.get("address", ""), rc.get("deposed", "")), {"meta": rc})
+        row["change"] = json.dumps(rc)
+        row["module_address"] = rc.get("module_address")
+    for (address, deposed), row in rows.items():
+        meta = row["meta"]
+        yield (
+            address,
+            deposed,
+            plan_index.address_prefix(address),
+            row.get("module_address"),
+            meta.get("mode"),
+            meta.get("type"),
+            meta.get("name"),
+            row.get("values"),
+            row.get("change"),
+        )
+
+
+def write(ws_dir: Path, plan_data: dict[str, Any]) -> None:
+    """Index `plan_data`, the plan just written to plan.bin (and plan.json, if any)."""
+    path = cache_path(ws_dir)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.unlink(missing_ok=True)
+    with contextlib.closing(sqlite3.connect(tmp_path)) as conn, conn:
+        conn.executescript(SCHEMA)
+        conn.executemany(
+            "INSERT INTO resources VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", _rows(plan_data)
+        )
+        meta = {"schema": SCHEMA_VERSION, "source": _source_signature(ws_dir) or ""}
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", meta.items())
+    os.replace(tmp_path, path)
+
+
+def invalidate(ws_dir: Path) -> None:
+    cache_path(ws_dir).unlink(missing_ok=True)
+
+
+class PlanCache:
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self._conn = conn
+
+    def _values(self, where: str, params: Iterable[Any]) -> dict[str, dict[str, Any]]:
+        cursor = self._conn.execute(
+            f"SELECT address, planned_values FROM resources "
+            f"WHERE planned_values IS NOT NULL{where} ORDER BY rowid",
+            tuple(params),
+        )
+        return {address: json.loads(values) for address, values in cursor}
+
+    def planned_values(self, address: str) -> dict[str, Any] | None:
+        return self._values(" AND address = ?", [address]).get(address)
+
+    def resource_change(self, address: str) -> dict[str, Any] | None:
+        row = self._conn.execute(
+            "SELECT change FROM resources WHERE address = ? AND deposed = ''", (address,)
+        ).fetchone()
+        return json.loads(row[0]) if row and row[0] is not None else None
+
+    def planned_resources(self, prefixes: tuple[str, ...] = ()) -> dict[str, dict[str, Any]]:
+        """Planned values by address, limited to `prefixes` (example prefixes) when given."""
+        if not prefixes:
+            return self._values("", [])
+        placeholders = ", ".join("?" * len(prefixes))
+        return self._values(f" AND prefix IN ({placeholders})", prefixes)
+
+    def example_changes(self, prefix: str) -> list[dict[str, Any]]:
+        cursor = self._conn.execute(
+            "SELECT change FROM resources WHERE prefix = ? AND change IS NOT NULL ORDER BY rowid",
+            (prefix,),
+        )
+        return [json.loads(change) for (change,) in cursor]
+
+
+@contextlib.contextmanager
+def open_cache(ws_dir: Path) -> Generator[PlanCache | None]:
+    """Yield the cache of the current plan, or None when it is missing or stale."""
+    path = cache_path(ws_dir)
+    if not path.is_file():
+        yield None
+        return
+    with contextlib.closing(
+        sqlite3.connect(f"{path.absolute().as_uri()}?mode=ro", uri=True)
+    ) as conn:
+        try:
+            meta = dict(conn.execute("SELECT key, value FROM meta"))
+        except sqlite3.DatabaseError:
+            meta = {}
+        fresh = meta.get("schema") == SCHEMA_VERSION and meta.get("source") == (
+            _source_signature(ws_dir) or ""
+        )
+        yield PlanCache(conn) if fresh else None
+
+
+def read_planned_resources(
+    ws_dir: Path, prefixes: tuple[str, ...] = ()
+) -> dict[str, dict[str, Any]] | None:
+    """Planned values from the cache (see `PlanCache.planned_resources`); None if unusable."""
+    with open_cache(ws_dir) as cache:
+        return None if cache is None else cache.planned_resources(prefixes)
@@ -0,0 +1,82 @@
+# path-sync copy -n sdlc
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from workspace import plan_cache
+
+PLAN = {
+    "planned_values": {
+        "root_module": {
+            "resources": [{"address": "data.x.root", "mode": "data", "type": "x", "values": {}}],
+            "child_modules": [
+                {
+                    "resources": [
+                        {"address": "module.ex_a.x.one", "type": "x", "values": {"n": 1}},
+                        {"address": "module.ex_b.x.two", "type": "x", "values": {"n": 2}},
+                    ]
+                }
+            ],
+        }
+    },
+    "resource_changes": [
+        {"address": "module.ex_a.x.one", "module_address": "module.ex_a", "change": {}},
+        {"address": "module.ex_a.x.gone", "change": {"actions": ["delete"]}},
+    ],
+}
+
+
+def test_queries_by_address_and_prefix(tmp_path: Path):
+    (tmp_path / plan_cache.PLAN_JSON).write_text(json.dumps(PLAN))
+    plan_cache.write(tmp_path, PLAN)
+    with plan_cache.open_cache(tmp_path) as cache:
+        assert cache is not None
+        assert cache.planned_values("module.ex_b.x.two") == {"n": 2}
+        assert cache.planned_values("module.ex_a.x.gone") is None
+        assert cache.resource_change("module.ex_a.x.gone") == PLAN["resource_changes"][1]
+        assert cache.planned_resources(("module.ex_a.",)) == {"module.ex_a.x.one": {"n": 1}}
+        assert list(cache.planned_resources()) == [
+            "data.x.root",
+            "module.ex_a.x.one",
+            "module.ex_b.x.two",
+        ]
+        assert [rc["address"] for rc in cache.example_changes("module.ex_a.")] == [
+            "module.ex_a.x.one",
+            "module.ex_a.x.gone",
+        ]
+
+
+def test_cache_is_stale_once_its_source_changes(tmp_path: Path):
+    assert plan_cache.read_planned_resources(tmp_path) is None
+    (tmp_path / plan_cache.PLAN_BIN).write_bytes(b"plan")
+    plan_cache.write(tmp_path, PLAN)
+    assert plan_cache.read_planned_resources(tmp_path, ("module.ex_b.",)) == {
+        "module.ex_b.x.two": {"n": 2}
+    }
+    # A plan.json written after the cache (e.g. by an offline plan) takes precedence.
+    (tmp_path / plan_cache.PLAN_JSON).write_text("{}")
+    assert plan_cache.read_planned_resources(tmp_path) is None
+
+
+def test_cache_opens_in_dirs_with_uri_characters(tmp_path: Path):
+    ws_dir = tmp_path / "ws ?#%41"
+    ws_dir.mkdir()
+    (ws_dir / plan_cache.PLAN_BIN).write_bytes(b"plan")
+    plan_cache.write(ws_dir, PLAN)
+    assert plan_cache.read_planned_resources(ws_dir, ("module.ex_b.",)) == {
+        "module.ex_b.x.two": {"n": 2}
+    }
+
+
+def test_deposed_changes_are_kept(tmp_path: Path):
+    deposed = {"address": "module.ex_a.x.one", "deposed": "00a1", "change": {"actions": ["delete"]}}
+    plan = {**PLAN, "resource_changes": [*PLAN["resource_changes"], deposed]}
+    (tmp_path / plan_cache.PLAN_JSON).write_text(json.dumps(plan))
+    plan_cache.write(tmp_path, plan)
+    with plan_cache.open_cache(tmp_path) as cache:
+        assert cache is not None
+        assert cache.resource_change("module.ex_a.x.one") == PLAN["resource_changes"][0]
+        assert cache.planned_values("module.ex_a.x.one") == {"n": 1}
+        assert deposed in cache.example_changes("module.ex_a.")
+        assert len(cache.example_changes("module.ex_a.")) == 3
@@ -0,0 +1,84 @@
+# path-sync copy -n sdlc
+"""One-pass index of a plan's resources by example module prefix (`module.ex_<id>.`).
+
+Per-example checks look up their own resources instead of scanning the whole plan for
+every example, so multi-example workspaces scale with the number of resources.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from typing import Any
+
+from workspace import plan_stream
+
+EXAMPLE_MODULE_PREFIX = "module.ex_"
+# Addresses outside any example module (root resources, data sources of the workspace).
+NO_EXAMPLE = ""
+
+
+def example_prefix(identifier: str) -> str:
+    return f"{EXAMPLE_MODULE_PREFIX}{identifier}."
+
+
+def address_prefix(address: str) -> str:
+    """The `module.ex_<id>.` prefix of `address`, NO_EXAMPLE outside example modules."""
+    if not address.startswith(EXAMPLE_MODULE_PREFIX):
+        return NO_EXAMPLE
+    end = address.find(".", len(EXAMPLE_MODULE_PREFIX))
+    return NO_EXAMPLE if end == -1 else address[: end + 1]
+
+
+@dataclass
+class PlanIndex:
+    """Planned values (address -> values) and resource changes grouped by example prefix.
+
+    Resource changes stay a list in plan order: an address has one more entry per deposed
+    object (`deposed` key), and those changes must not be dropped.
+    """
+
+    planned_values: dict[str, dict[str, Any]] = field(default_factory=dict)
+    resource_changes: list[dict[str, Any]] = field(default_factory=list)
+    values_by_prefix: dict[str, list[str]] = field(default_factory=lambda: defaultdict(list))
+    changes_by_prefix: dict[str, list[dict[str, Any]]] = field(
+        default_factory=lambda: defaultdict(list)
+    )
+
+    @classmethod
+    def from_resources(
+        cls,
+        planned_values: dict[str, dict[str, Any]],
+        resource_changes: Iterable[dict[str, Any]] = (),
+    ) -> PlanIndex:
+        index = cls(planned_values=planned_values)
+        for address in planned_values:
+            index.values_by_prefix[address_prefix(address)].append(address)
+        for rc in resource_changes:
+            index.resource_changes.append(rc)
+            index.changes_by_prefix[address_prefix(rc.get("address", ""))].append(rc)
+        return index
+
+    @classmethod
+    def from_plan(cls, plan_json: dict[str, Any]) -> PlanIndex:
+        root = plan_json.get("planned_values", {}).get("root_module", {})
+        planned = {r["address"]: r.get("values", {}) for r in plan_stream.module_resources(root)}
+        return cls.from_resources(planned, plan_json.get("resource_changes", []))
+
+    @classmethod
+    def of(cls, plan: PlanIndex | dict[str, Any]) -> PlanIndex:
+        return plan if isinstance(plan, PlanIndex) else cls.from_plan(plan)
+
+    def example_addresses(self, prefix: str) -> list[str]:
+        return self.values_by_prefix.get(prefix, [])
+
+    def example_changes(self, prefix: str) -> list[dict[str, Any]]:
+        return self.changes_by_prefix.get(prefix, [])
+
+    def changes_outside(self, prefixes: Iterable[str]) -> Iterator[dict[str, Any]]:
+        """Resource changes, in plan order, whose prefix is not one of `prefixes`."""
+        skipped = set(prefixes)
+        for rc in self.resource_changes:
+            if address_prefix(rc.get("address", "")) not in skipped:
+                yield rc
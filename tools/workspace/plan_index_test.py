@@ -0,0 +1,57 @@
+# path-sync copy -n sdlc
+from __future__ import annotations
+
+import pytest
+
+from workspace.plan_index import NO_EXAMPLE, PlanIndex, address_prefix, example_prefix
+
+
+@pytest.mark.parametrize(
+    ("address", "expected"),
+    [
+        ("module.ex_a.mongodbatlas_project.this", "module.ex_a."),
+        ("module.ex_ab.module.cluster.mongodbatlas_cluster.this", "module.ex_ab."),
+        ("module.other.mongodbatlas_project.this", NO_EXAMPLE),
+        ("data.mongodbatlas_roles_org_id.this", NO_EXAMPLE),
+        ("module.ex_a", NO_EXAMPLE),
+    ],
+)
+def test_address_prefix(address: str, expected: str):
+    assert address_prefix(address) == expected
+
+
+def test_plan_index_groups_by_example_prefix():
+    plan_json = {
+        "planned_values": {
+            "root_module": {
+                "resources": [{"address": "data.x.root", "values": {"id": "r"}}],
+                "child_modules": [
+                    {"resources": [{"address": "module.ex_a.x.one", "values": {"n": 1}}]},
+                    {"resources": [{"address": "module.ex_ab.x.two", "values": {"n": 2}}]},
+                ],
+            }
+        },
+        "resource_changes": [
+            {"address": "module.ex_ab.x.two"},
+            {"address": "data.x.root"},
+            {"address": "module.ex_a.x.one"},
+        ],
+    }
+    index = PlanIndex.of(plan_json)
+    assert PlanIndex.of(index) is index
+    assert index.planned_values["module.ex_a.x.one"] == {"n": 1}
+    assert index.example_addresses(example_prefix("a")) == ["module.ex_a.x.one"]
+    assert index.example_addresses(example_prefix("missing")) == []
+    assert [rc["address"] for rc in index.example_changes("module.ex_ab.")] == [
+        "module.ex_ab.x.two"
+    ]
+    outside = index.changes_outside([example_prefix("a")])
+    assert [rc["address"] for rc in outside] == ["module.ex_ab.x.two", "data.x.root"]
+
+
+def test_changes_outside_keeps_deposed_objects():
+    current = {"address": "x.shared", "change": {"actions": ["create"]}}
+    deposed = {"address": "x.shared", "deposed": "00a1", "change": {"actions": ["delete"]}}
+    index = PlanIndex.from_resources({}, [current, deposed])
+    assert list(index.changes_outside([example_prefix("a")])) == [current, deposed]
+    assert index.example_changes(NO_EXAMPLE) == [current, deposed]
@@ -0,0 +1,223 @@
+# path-sync copy -n sdlc
+"""Incremental reader for large terraform JSON documents (plan.json, `terraform show -json`).
+
+The document is scanned in chunks: values outside the requested sections are skipped
+without being decoded, and requested values are decoded one at a time (a top-level
+section, one array item or one module resource), so peak memory follows the largest
+decoded value instead of the whole file. `prior_state` and `configuration` are never
+materialized.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import re
+from collections.abc import Collection, Generator, Iterator, Sequence
+from pathlib import Path
+from typing import Any, TextIO
+
+CHUNK_SIZE = 1 << 20
+MODULE_RESOURCES = "resources"
+MODULE_CHILDREN = "child_modules"
+
+_WS = re.compile(r"[ \t\n\r]*")
+_STRING_TAIL = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+_STRUCTURAL = re.compile(r'["\[\]{}]')
+_SCALAR_END = re.compile(r"[,\]}\s]")
+
+JsonSource = Path | TextIO
+
+
+class JsonStreamError(ValueError):
+    pass
+
+
+class _Reader:
+    """Pull-based scanner; callers must consume each yielded key/item before advancing."""
+
+    def __init__(self, stream: TextIO) -> None:
+        self._stream = stream
+        self._chunk_size = CHUNK_SIZE
+        self._buf = ""
+        self._pos = 0
+        self._mark: int | None = None
+        self._captured: list[str] = []
+
+    def _more(self) -> bool:
+        """Append a chunk; text before `_pos` is dropped (or kept as captured text)."""
+        chunk = self._stream.read(self._chunk_size)
+        if not chunk:
+            return False
+        if self._mark is not None:
+            self._captured.append(self._buf[self._mark : self._pos])
+            self._mark = 0
+        self._buf = self._buf[self._pos :] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            self._pos = _WS.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._more():
+                raise JsonStreamError("unexpected end of JSON document")
+
+    def _expect(self, char: str) -> None:
+        if (found := self.peek()) != char:
+            raise JsonStreamError(f"expected {char!r}, found {found!r}")
+        self._pos += 1
+
+    def _read_string(self) -> str:
+        """Consume a string token and return its raw JSON text (quotes included)."""
+        while not (match := _STRING_TAIL.match(self._buf, self._pos + 1)):
+            if not self._more():
+                raise JsonStreamError("unterminated string")
+        raw = self._buf[self._pos : match.end()]
+        self._pos = match.end()
+        return raw
+
+    def _skip_scalar(self) -> None:
+        while not (match := _SCALAR_END.search(self._buf, self._pos)):
+            if not self._more():
+                self._pos = len(self._buf)
+                return
+        self._pos = match.start()
+
+    def skip_value(self) -> None:
+        char = self.peek()
+        if char == '"':
+            self._read_string()
+            return
+        if char not in "[{":
+            self._skip_scalar()
+            return
+        self._pos += 1
+        depth = 1
+        while depth:
+            match = _STRUCTURAL.search(self._buf, self._pos)
+            if not match:
+                self._pos = len(self._buf)
+                if not self._more():
+                    raise JsonStreamError("unexpected end of JSON document")
+                continue
+            if match.group() == '"':
+                self._pos = match.start()
+                self._read_string()
+                continue
+            depth += 1 if match.group() in "[{" else -1
+            self._pos = match.end()
+
+    def decode_value(self) -> Any:
+        self.peek()
+        self._mark, self._captured = self._pos, []
+        try:
+            self.skip_value()
+            text = "".join(self._captured) + self._buf[self._mark : self._pos]
+        finally:
+            self._mark, self._captured = None, []
+        return json.loads(text)
+
+    def iter_object(self) -> Iterator[str]:
+        """Yield each key with the reader positioned at its value."""
+        self._expect("{")
+        while (char := self.peek()) != "}":
+            if char == ",":
+                self._pos += 1
+                continue
+            if char != '"':
+                raise JsonStreamError(f"expected object key, found {char!r}")
+            key = json.loads(self._read_string())
+            self._expect(":")
+            yield key
+        self._pos += 1
+
+    def iter_array(self) -> Iterator[None]:
+        """Yield once per item with the reader positioned at the item."""
+        self._expect("[")
+        while (char := self.peek()) != "]":
+            if char == ",":
+                self._pos += 1
+                continue
+            yield None
+        self._pos += 1
+
+
+@contextlib.contextmanager
+def _reader(source: JsonSource) -> Generator[_Reader]:
+    if isinstance(source, Path):
+        with source.open() as stream:
+            yield _Reader(stream)
+    else:
+        yield _Reader(source)
+
+
+def load_sections(source: JsonSource, keys: Collection[str]) -> dict[str, Any]:
+    """Decode only the top-level `keys` of a JSON object; other sections are skipped."""
+    result: dict[str, Any] = {}
+    with _reader(source) as reader:
+        for key in reader.iter_object():
+            if key in keys:
+                result[key] = reader.decode_value()
+                if len(result) == len(keys):
+                    break
+            else:
+                reader.skip_value()
+    return result
+
+
+def _seek(reader: _Reader, path: Sequence[str]) -> bool:
+    """Advance to the value at `path`; False if some key along it is missing."""
+    for key in path:
+        if reader.peek() != "{":
+            return False
+        for found in reader.iter_object():
+            if found == key:
+                break
+            reader.skip_value()
+        else:
+            return False
+    return True
+
+
+def iter_array_items(source: JsonSource, path: Sequence[str]) -> Iterator[Any]:
+    """Yield the decoded items of the array at `path` one at a time (none if missing)."""
+    with _reader(source) as reader:
+        if not _seek(reader, path):
+            return
+        for _ in reader.iter_array():
+            yield reader.decode_value()
+
+
+def _iter_module(reader: _Reader, prefixes: tuple[str, ...]) -> Iterator[dict[str, Any]]:
+    for key in reader.iter_object():
+        if key == MODULE_RESOURCES:
+            for _ in reader.iter_array():
+                resource = reader.decode_value()
+                if not prefixes or resource.get("address", "").startswith(prefixes):
+                    yield resource
+        elif key == MODULE_CHILDREN:
+            for _ in reader.iter_array():
+                yield from _iter_module(reader, prefixes)
+        else:
+            reader.skip_value()
+
+
+def iter_module_resources(
+    source: JsonSource, path: Sequence[str], prefixes: tuple[str, ...] = ()
+) -> Iterator[dict[str, Any]]:
+    """Yield resources of the module tree at `path` (e.g. planned_values.root_module).
+
+    `prefixes` keeps only resources whose address starts with one of them.
+    """
+    with _reader(source) as reader:
+        if _seek(reader, path):
+            yield from _iter_module(reader, prefixes)
+
+
+def module_resources(module: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    """In-memory counterpart of `iter_module_resources` for an already decoded module."""
+    yield from module.get(MODULE_RESOURCES, [])
+    for child in module.get(MODULE_CHILDREN, []):
+        yield from module_resources(child)
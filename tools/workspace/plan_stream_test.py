@@ -0,0 +1,104 @@
+# path-sync copy -n sdlc
+from __future__ import annotations
+
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from workspace import plan_stream, reg
+
+PLAN = {
+    "format_version": "1.2",
+    "variables": {"org_id": {"value": 'quoted "} ] { [ \\\\ value'}},
+    "planned_values": {
+        "root_module": {
+            "resources": [{"address": "random_string.suffix", "values": {"length": 6}}],
+            "child_modules": [
+                {
+                    "resources": [
+                        {
+                            "address": "module.ex_a.mongodbatlas_project.this",
+                            "values": {"name": "a", "tags": {"k": "v}"}, "limits": [1, 2.5]},
+                        }
+                    ],
+                    "address": "module.ex_a",
+                    "child_modules": [
+                        {
+                            "resources": [
+                                {
+                                    "address": "module.ex_a.module.nested.null_resource.x",
+                                    "values": {"triggers": None, "flag": True},
+                                }
+                            ],
+                            "address": "module.ex_a.module.nested",
+                        }
+                    ],
+                },
+                {
+                    "resources": [
+                        {"address": "module.ex_b.mongodbatlas_project.this", "values": {}}
+                    ],
+                    "address": "module.ex_b",
+                },
+            ],
+        }
+    },
+    "resource_changes": [
+        {"address": "random_string.suffix", "change": {"actions": ["create"]}},
+        {"address": "module.ex_b.mongodbatlas_project.this", "change": {"actions": ["no-op"]}},
+    ],
+    "prior_state": {"values": {"root_module": {"resources": [{"address": "ignored"}]}}},
+    "configuration": {"root_module": {"module_calls": {"ex_a": {"source": "../a"}}}},
+}
+
+
+@pytest.fixture(params=[1 << 20, 3], ids=["one-chunk", "tiny-chunks"])
+def plan_path(request: pytest.FixtureRequest, tmp_path: Path, monkeypatch) -> Path:
+    monkeypatch.setattr(plan_stream, "CHUNK_SIZE", request.param)
+    path = tmp_path / "plan.json"
+    path.write_text(json.dumps(PLAN, indent=2))
+    return path
+
+
+def test_load_sections_decodes_only_requested_keys(plan_path: Path):
+    sections = plan_stream.load_sections(plan_path, ("variables", "resource_changes"))
+    assert sections == {
+        "variables": PLAN["variables"],
+        "resource_changes": PLAN["resource_changes"],
+    }
+
+
+def test_read_planned_resources_matches_full_parse(plan_path: Path):
+    expected = reg.extract_planned_resources(json.loads(plan_path.read_text()))
+    assert reg.read_planned_resources(plan_path) == expected
+    assert list(expected)[1:] == [
+        "module.ex_a.mongodbatlas_project.this",
+        "module.ex_a.module.nested.null_resource.x",
+        "module.ex_b.mongodbatlas_project.this",
+    ]
+
+
+def test_iter_module_resources_filters_by_prefix(plan_path: Path):
+    resources = plan_stream.iter_module_resources(
+        plan_path, reg.PLANNED_ROOT_MODULE, ("module.ex_a.",)
+    )
+    assert [r["address"] for r in resources] == [
+        "module.ex_a.mongodbatlas_project.this",
+        "module.ex_a.module.nested.null_resource.x",
+    ]
+
+
+def test_iter_array_items_and_missing_paths(plan_path: Path):
+    items = list(plan_stream.iter_array_items(plan_path, ("resource_changes",)))
+    assert items == PLAN["resource_changes"]
+    assert list(plan_stream.iter_array_items(plan_path, ("output_changes",))) == []
+    stream = io.StringIO('{"values": null}')
+    assert list(plan_stream.iter_module_resources(stream, ("values", "root_module"))) == []
+
+
+def test_truncated_document_raises():
+    stream = io.StringIO(json.dumps(PLAN)[:200])
+    with pytest.raises(plan_stream.JsonStreamError):
+        plan_stream.load_sections(stream, ("resource_changes",))
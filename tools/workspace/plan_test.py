@@ -1,16 +1,25 @@
 # path-sync copy -n sdlc
 from __future__ import annotations
 
+import json
+import os
 import subprocess
+import sys
 from pathlib import Path
 
 import pytest
+import typer
 
 from shared import tf_retry
 from workspace.plan import (
+    LOCK_FILE,
     PROVIDER_VERSION_OVERRIDE_FILE,
+    init_fingerprint,
+    local_module_dirs,
     provider_version_override,
     run_terraform_init,
+    run_terraform_show_json,
+    run_terraform_test_plan,
     strip_provider_blocks,
 )
 
@@ -93,6 +102,74 @@ def test_run_terraform_init_prints_success_output(tmp_path: Path, monkeypatch, c
     assert (captured.out, captured.err) == (stdout, stderr)
 
 
+@pytest.fixture()
+def init_ws(tmp_path: Path, monkeypatch) -> Path:
+    monkeypatch.delenv(tf_retry.TF_DATA_DIR_ENV, raising=False)
+    root = tmp_path / "repo"
+    (root / "modules" / "sub").mkdir(parents=True)
+    (root / "main.tf").write_text('module "sub" {\n  source = "./modules/sub"\n}\n')
+    (root / "modules" / "sub" / "main.tf").write_text("# sub\n")
+    (root / "examples" / "basic").mkdir(parents=True)
+    (root / "examples" / "basic" / "main.tf").write_text('module "p" {\n  source = "../.."\n}\n')
+    ws_dir = root / "tests" / "workspace_x"
+    ws_dir.mkdir(parents=True)
+    (ws_dir / "modules.generated.tf").write_text(
+        'module "ex_basic" {\n  source = "../../examples/basic"\n}\n'
+    )
+    return ws_dir
+
+
+def test_local_module_dirs_follows_nested_sources(init_ws: Path):
+    root = init_ws.parent.parent
+    assert local_module_dirs(init_ws) == sorted(
+        [
+            root.resolve(),
+            (root / "examples" / "basic").resolve(),
+            (root / "modules" / "sub").resolve(),
+        ]
+    )
+
+
+@pytest.mark.parametrize(
+    "changed",
+    [
+        "modules.generated.tf",
+        PROVIDER_VERSION_OVERRIDE_FILE,
+        LOCK_FILE,
+        "../../examples/basic/main.tf",
+        "../../modules/sub/main.tf",
+    ],
+)
+def test_init_fingerprint_changes_with_inputs(init_ws: Path, changed: str):
+    before = init_fingerprint(init_ws)
+    target = init_ws / changed
+    target.write_text((target.read_text() if target.exists() else "") + "# changed\n")
+    assert init_fingerprint(init_ws) != before
+
+
+def test_run_terraform_init_skips_when_fingerprint_matches(init_ws: Path, monkeypatch, capsys):
+    calls: list[Path] = []
+
+    def fake_init(cmd: list[str], work_dir: Path) -> subprocess.CompletedProcess:
+        calls.append(work_dir)
+        (work_dir / LOCK_FILE).write_text("# lock written by init\n")
+        return subprocess.CompletedProcess(args=cmd, returncode=0, stdout="", stderr="")
+
+    monkeypatch.setattr(tf_retry, "run_terraform_init", fake_init)
+
+    run_terraform_init(init_ws)
+    run_terraform_init(init_ws)
+    assert len(calls) == 1
+    assert "unchanged since last init" in capsys.readouterr().out
+
+    run_terraform_init(init_ws, force=True)
+    assert len(calls) == 2
+
+    (init_ws / "modules.generated.tf").write_text("# no examples\n")
+    run_terraform_init(init_ws)
+    assert len(calls) == 3
+
+
 @pytest.mark.parametrize(
     "original",
     [VERSIONS_TF_WITH_PROVIDER, VERSIONS_TF_WITH_MULTILINE_PROVIDER],
@@ -182,3 +259,69 @@ def test_provider_version_override_rejects_non_exact_version(tmp_path: Path):
     with pytest.raises(ValueError, match="Invalid exact provider version"):
         with provider_version_override(tmp_path, "~> 2.12"):
             pass
+
+
+def _fake_terraform(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, lines: list[str]) -> None:
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    script = bin_dir / "terraform"
+    script.write_text(f"#!{sys.executable}\nimport sys\nsys.stdout.write({''.join(lines)!r})\n")
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}:{os.environ['PATH']}")
+
+
+def test_run_terraform_test_plan_returns_verbose_plan(tmp_path: Path, monkeypatch, capsys):
+    test_plan = {"format_version": "1.2", "planned_values": {}, "prior_state": {"big": True}}
+    _fake_terraform(
+        tmp_path,
+        monkeypatch,
+        [
+            json.dumps({"@message": "Found 1 file and 1 run block", "type": "test_abstract"})
+            + "\n",
+            json.dumps({"@message": "-verbose flag enabled", "test_plan": test_plan}) + "\n",
+        ],
+    )
+    plan_data = run_terraform_test_plan(tmp_path, [], skip_init=True, write_json=True)
+    assert plan_data == {"format_version": "1.2", "planned_values": {}}
+    assert json.loads((tmp_path / "plan.json").read_text()) == plan_data
+    assert "Found 1 file and 1 run block" in capsys.readouterr().out
+
+
+def test_run_terraform_test_plan_fails_without_plan(tmp_path: Path, monkeypatch):
+    _fake_terraform(tmp_path, monkeypatch, [json.dumps({"@message": "Error: no mock"}) + "\n"])
+    with pytest.raises(typer.Exit):
+        run_terraform_test_plan(tmp_path, [], skip_init=True, write_json=False)
+
+
+def test_run_terraform_show_json_cached_by_state_serial_and_lineage(tmp_path: Path, monkeypatch):
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    calls = tmp_path / "calls"
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    script = bin_dir / "terraform"
+    script.write_text(
+        f"#!{sys.executable}\nimport json\n"
+        f"with open({str(calls)!r}, 'a') as f: f.write('show\\n')\n"
+        "state = json.load(open('terraform.tfstate'))\n"
+        "print(json.dumps({'values': {'serial': state['serial']}}))\n"
+    )
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}:{os.environ['PATH']}")
+
+    def write_state(serial: int, lineage: str = "l1") -> None:
+        state = {"version": 4, "serial": serial, "lineage": lineage, "resources": []}
+        (ws / "terraform.tfstate").write_text(json.dumps(state))
+
+    write_state(1)
+    assert run_terraform_show_json(ws) == {"values": {"serial": 1}}
+    assert run_terraform_show_json(ws) == {"values": {"serial": 1}}
+    assert calls.read_text().count("show") == 1
+
+    write_state(2)
+    assert run_terraform_show_json(ws) == {"values": {"serial": 2}}
+    write_state(2, lineage="l2")
+    run_terraform_show_json(ws)
+    (ws / LOCK_FILE).write_text("# upgraded provider\n")
+    run_terraform_show_json(ws)
+    assert calls.read_text().count("show") == 4
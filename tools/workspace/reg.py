@@ -3,21 +3,38 @@
 
 from __future__ import annotations
 
+import contextlib
 import json
+import re
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
 
 import typer
-import yaml
 
-from workspace import models
+from workspace import (
+    models,
+    plan_cache,
+    plan_index,
+    plan_stream,
+    snapshot_bundle,
+    snapshot_compare,
+    snapshot_manifest,
+    snapshot_yaml,
+    tracing,
+)
 
 app = typer.Typer()
 
 PLAN_JSON = "plan.json"
 PLAN_SNAPSHOTS_ACTUAL_DIR = "plan_snapshots_actual"
 TEST_PLAN_SNAPSHOT_PY = "test_plan_snapshot.py"
+PLANNED_ROOT_MODULE = ("planned_values", "root_module")
+# Below this many regressions the thread pool costs more than it saves.
+PARALLEL_DUMP_MIN_REGRESSIONS = 16
+DUMP_WORKERS = 8
 
 
 def parse_plan_json(plan_path: Path) -> dict[str, Any]:
@@ -25,16 +42,71 @@ def parse_plan_json(plan_path: Path) -> dict[str, Any]:
 
 
 def extract_planned_resources(plan: dict[str, Any]) -> dict[str, dict[str, Any]]:
-    result: dict[str, dict[str, Any]] = {}
-    _extract_from_module(plan.get("planned_values", {}).get("root_module", {}), result)
-    return result
-
-
-def _extract_from_module(module: dict[str, Any], result: dict[str, dict[str, Any]]) -> None:
-    for resource in module.get("resources", []):
-        result[resource["address"]] = resource.get("values", {})
-    for child in module.get("child_modules", []):
-        _extract_from_module(child, result)
+    root = plan.get("planned_values", {}).get("root_module", {})
+    return {r["address"]: r.get("values", {}) for r in plan_stream.module_resources(root)}
+
+
+def read_planned_resources(
+    plan_path: Path, prefixes: tuple[str, ...] = ()
+) -> dict[str, dict[str, Any]]:
+    """Stream planned_values.root_module from plan.json without loading the rest of the plan."""
+    resources = plan_stream.iter_module_resources(plan_path, PLANNED_ROOT_MODULE, prefixes)
+    return {r["address"]: r.get("values", {}) for r in resources}
+
+
+@dataclass(frozen=True)
+class FilterPolicy:
+    """Compiled skip/redact rules of one example and DumpConfig (see `filter_values`)."""
+
+    skip_attrs: frozenset[str]
+    redact_attrs: frozenset[str]
+    skip_null: bool
+    # One alternation over all substring_values; None when there are none.
+    skip_pattern: re.Pattern[str] | None
+
+    @classmethod
+    def compile(
+        cls, skip_attrs: list[str], skip_values: list[str], redact_attrs: list[str]
+    ) -> FilterPolicy:
+        pattern = None
+        if skip_values:
+            pattern = re.compile("|".join(re.escape(sv) for sv in sorted(set(skip_values))))
+        return cls(frozenset(skip_attrs), frozenset(redact_attrs), "null" in skip_values, pattern)
+
+    def apply(self, values: dict[str, Any]) -> dict[str, Any]:
+        root: dict[str, Any] = {}
+        # Walk with an explicit stack; filtered dicts are inserted before being filled so key
+        # order matches the input.
+        stack = [(values, root)]
+        while stack:
+            source, filtered = stack.pop()
+            for key, val in source.items():
+                if key in self.skip_attrs:
+                    continue
+                # Redact sensitive attribute names only when a value is present; keep nulls
+                # consistent with skip_values (typically omitted) instead of "<secret>".
+                if key in self.redact_attrs and val is not None:
+                    filtered[key] = f"<{key}>"
+                    continue
+                if val is None and self.skip_null:
+                    continue
+                if isinstance(val, str) and self.skip_pattern and self.skip_pattern.search(val):
+                    continue
+                if isinstance(val, dict):
+                    child: dict[str, Any] = {}
+                    stack.append((val, child))
+                    val = child
+                elif isinstance(val, list):
+                    items = []
+                    for v in val:
+                        if isinstance(v, dict):
+                            child = {}
+                            stack.append((v, child))
+                            v = child
+                        items.append(v)
+                    val = items
+                filtered[key] = val
+        return root
 
 
 def filter_values(
@@ -43,38 +115,12 @@ def filter_values(
     skip_values: list[str],
     redact_attrs: list[str],
 ) -> dict[str, Any]:
-    filtered: dict[str, Any] = {}
-    for key, val in values.items():
-        if key in skip_attrs:
-            continue
-        # Redact sensitive attribute names only when a value is present; keep nulls
-        # consistent with skip_values (typically omitted) instead of "<secret>".
-        if key in redact_attrs and val is not None:
-            filtered[key] = f"<{key}>"
-            continue
-        if val is None and "null" in skip_values:
-            continue
-        if isinstance(val, str) and any(sv in val for sv in skip_values):
-            continue
-        if isinstance(val, dict):
-            val = filter_values(val, skip_attrs, skip_values, redact_attrs)
-        elif isinstance(val, list):
-            val = [
-                filter_values(v, skip_attrs, skip_values, redact_attrs)
-                if isinstance(v, dict)
-                else v
-                for v in val
-            ]
-        filtered[key] = val
-    return filtered
+    return FilterPolicy.compile(skip_attrs, skip_values, redact_attrs).apply(values)
 
 
-def dump_resource_yaml(
-    values: dict[str, Any],
-    config: models.WsConfig,
-    example: models.Example,
-    dump_config: models.DumpConfig,
-) -> str:
+def filter_policy(
+    config: models.WsConfig, example: models.Example, dump_config: models.DumpConfig
+) -> FilterPolicy:
     skip_attrs = dump_config.skip_lines.substring_attributes
     skip_values = dump_config.skip_lines.substring_values
     if "null" not in skip_values:
@@ -84,8 +130,19 @@ def dump_resource_yaml(
     )
     if dump_config.skip_lines.use_default_redact:
         redact_attrs = redact_attrs + models.DEFAULT_REDACT_ATTRIBUTES
-    filtered = filter_values(values, skip_attrs, skip_values, redact_attrs)
-    return yaml.dump(filtered, default_flow_style=False, sort_keys=True, allow_unicode=True)
+    return FilterPolicy.compile(skip_attrs, skip_values, redact_attrs)
+
+
+def dump_resource_yaml(
+    values: dict[str, Any],
+    config: models.WsConfig,
+    example: models.Example,
+    dump_config: models.DumpConfig,
+    policy: FilterPolicy | None = None,
+) -> str:
+    """`policy` is `filter_policy(config, example, dump_config)`, compiled here if omitted."""
+    policy = policy or filter_policy(config, example, dump_config)
+    return snapshot_yaml.dump(policy.apply(values))
 
 
 def find_matching_address(
@@ -119,10 +176,11 @@ def find_uncovered_resources(
     config: models.WsConfig,
 ) -> dict[str, list[str]]:
     """Find resources in plan that don't have plan_regressions entries."""
+    index = plan_index.PlanIndex.from_resources(resources)
     uncovered: dict[str, list[str]] = {}
     for ex in config.examples:
-        example_prefix = f"module.ex_{ex.identifier}."
-        example_resources = {addr for addr in resources if addr.startswith(example_prefix)}
+        example_prefix = plan_index.example_prefix(ex.identifier)
+        example_resources = set(index.example_addresses(example_prefix))
         covered = set()
         for reg in ex.plan_regressions:
             full_addr = find_matching_address(resources, reg.address, ex.identifier)
@@ -162,51 +220,205 @@ def report_uncovered(uncovered: dict[str, list[str]]) -> None:
             typer.echo(f"      # [{category}] - address: {addr}")
 
 
-def process_workspace(ws_dir: Path, force_regen: bool, show_uncovered: bool) -> None:
+@dataclass
+class _SnapshotJob:
+    example: models.Example
+    dump_config: models.DumpConfig
+    policy: FilterPolicy
+    relpath: str
+    values: dict[str, Any]
+
+
+def write_if_changed(path: Path, content: str) -> bool:
+    """Write `content` unless `path` already holds it, keeping mtimes of unchanged files."""
+    data = content.encode()
+    with contextlib.suppress(FileNotFoundError):
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    path.write_bytes(data)
+    return True
+
+
+def write_actual_snapshots(
+    ws_dir: Path,
+    config: models.WsConfig,
+    resources: dict[str, dict[str, Any]],
+    examples: list[models.Example],
+    reuse: dict[str, str] | None = None,
+    manifest: snapshot_manifest.Manifest | None = None,
+    force_regen: bool = False,
+) -> dict[str, dict[str, str]]:
+    """Dump regressions of `examples` into plan_snapshots_actual/ (or its bundle).
+
+    `reuse` maps snapshot paths (relative to plan_snapshots_actual/) to previously dumped
+    content that is written as-is. Files already holding their content are not rewritten.
+    With a `manifest`, snapshots whose filtered values still hash to the recorded ones take
+    the expected content without emitting YAML (unless `force_regen`).
+    Returns the dumped content per example identifier.
+    """
+    bundle = config.snapshot_layout == models.SnapshotLayout.BUNDLE
+    actual_dir = ws_dir / PLAN_SNAPSHOTS_ACTUAL_DIR
+    if not bundle:
+        actual_dir.mkdir(exist_ok=True)
+    for relpath, content in (reuse or {}).items():
+        if not bundle:
+            filepath = actual_dir / relpath
+            filepath.parent.mkdir(exist_ok=True)
+            write_if_changed(filepath, content)
+        typer.echo(f"  Reused {relpath}")
+    jobs = [job for ex in examples for job in _snapshot_jobs(config, resources, ex)]
+
+    read_expected = snapshot_manifest.expected_reader(ws_dir, config) if manifest else None
+
+    def write(job: _SnapshotJob) -> tuple[str, bool]:
+        # Dump threads do not inherit the workspace attribute of the caller's span.
+        with tracing.span("reg dump", workspace=ws_dir.name, example=job.example.identifier):
+            tracing.annotate(resources=1)
+            filtered = job.policy.apply(job.values)
+            content = None
+            if manifest is not None and read_expected is not None:
+                filtered_hash = snapshot_manifest.values_hash(filtered)
+                manifest.current[job.relpath] = filtered_hash
+                if not force_regen:
+                    content = snapshot_manifest.reusable_snapshot(
+                        manifest, job.relpath, filtered_hash, read_expected
+                    )
+                if content is not None:
+                    manifest.reused.add(job.relpath)
+            if content is None:
+                content = snapshot_yaml.dump(filtered)
+            if bundle:
+                return content, True
+            filepath = actual_dir / job.relpath
+            filepath.parent.mkdir(exist_ok=True)
+            return content, write_if_changed(filepath, content)
+
+    if len(jobs) >= PARALLEL_DUMP_MIN_REGRESSIONS:
+        with ThreadPoolExecutor(max_workers=DUMP_WORKERS) as executor:
+            results = list(executor.map(write, jobs))
+    else:
+        results = [write(job) for job in jobs]
+
+    dumped: dict[str, dict[str, str]] = {ex.identifier: {} for ex in examples}
+    unchanged = 0
+    for job, (content, written) in zip(jobs, results, strict=True):
+        dumped[job.example.identifier][job.relpath] = content
+        if bundle:
+            continue
+        if written:
+            typer.echo(f"  Generated {job.relpath}")
+        else:
+            unchanged += 1
+    if unchanged:
+        typer.echo(f"  {unchanged} snapshots unchanged")
+    if manifest is not None and manifest.reused:
+        typer.echo(f"  {len(manifest.reused)} snapshots matched the manifest hashes")
+    if bundle:
+        snapshots = {**(reuse or {}), **flatten_snapshots(dumped)}
+        path = ws_dir / snapshot_bundle.ACTUAL_BUNDLE
+        state = "Generated" if snapshot_bundle.write_bundle(path, snapshots) else "Unchanged"
+        typer.echo(f"  {state} {path.name} ({len(snapshots)} snapshots)")
+    return dumped
+
+
+def _snapshot_jobs(
+    config: models.WsConfig,
+    resources: dict[str, dict[str, Any]],
+    ex: models.Example,
+) -> list[_SnapshotJob]:
+    jobs: list[_SnapshotJob] = []
+    # Regressions usually repeat the same skip_lines; compile each distinct one once.
+    policies: dict[tuple, FilterPolicy] = {}
+    for reg in ex.plan_regressions:
+        full_addr = find_matching_address(resources, reg.address, ex.identifier)
+        if not full_addr:
+            typer.echo(f"  Warning: {reg.address} not found in plan", err=True)
+            continue
+        skip_lines = reg.dump.skip_lines
+        key = (
+            tuple(skip_lines.substring_attributes),
+            tuple(skip_lines.substring_values),
+            tuple(skip_lines.redact_attributes),
+            skip_lines.use_default_redact,
+        )
+        if (policy := policies.get(key)) is None:
+            policy = policies[key] = filter_policy(config, ex, reg.dump)
+        relpath = ex.snapshot_relpath(reg.address)
+        jobs.append(_SnapshotJob(ex, reg.dump, policy, relpath, resources[full_addr]))
+    return jobs
+
+
+def flatten_snapshots(dumped: dict[str, dict[str, str]]) -> dict[str, str]:
+    return {path: content for files in dumped.values() for path, content in files.items()}
+
+
+def run_snapshot_tests(ws_dir: Path, force_regen: bool) -> None:
+    typer.echo(f"Running pytest for {ws_dir.name}...")
+    pytest_args = ["pytest", TEST_PLAN_SNAPSHOT_PY, "-v"]
+    if force_regen:
+        pytest_args.append("--force-regen")
+    with tracing.span("pytest snapshots"):
+        result = subprocess.run(pytest_args, cwd=ws_dir)
+    if result.returncode != 0:
+        raise typer.Exit(result.returncode)
+
+
+def check_snapshots(
+    ws_dir: Path,
+    config: models.WsConfig,
+    snapshots: dict[str, str],
+    force_regen: bool,
+    use_pytest: bool = False,
+    manifest: snapshot_manifest.Manifest | None = None,
+) -> None:
+    """Compare `snapshots` (relpath -> content) in process, or run the generated pytest file.
+
+    The in-process comparison also refreshes `manifest` for the snapshots now expected.
+    """
+    if use_pytest:
+        run_snapshot_tests(ws_dir, force_regen)
+        return
+    typer.echo(f"Comparing plan snapshots for {ws_dir.name}...")
+    with tracing.span("snapshot compare"):
+        results = snapshot_compare.compare_workspace(ws_dir, config, snapshots, force_regen)
+        if manifest is not None:
+            snapshot_manifest.update(ws_dir, config, manifest, results)
+    if not snapshot_compare.report(results):
+        raise typer.Exit(1)
+
+
+def process_workspace(
+    ws_dir: Path,
+    force_regen: bool,
+    show_uncovered: bool,
+    plan_data: dict[str, Any] | None = None,
+    use_pytest: bool = False,
+) -> None:
+    """Dump and test plan snapshots; `plan_data` (parsed by the caller) avoids reading plan.json."""
     ws_config = ws_dir / models.WORKSPACE_CONFIG_FILE
     plan_path = ws_dir / PLAN_JSON
     if not ws_config.exists():
         typer.echo(f"Skipping {ws_dir.name}: no {models.WORKSPACE_CONFIG_FILE} found")
         return
-    if not plan_path.exists():
-        typer.echo(f"Skipping {ws_dir.name}: no {PLAN_JSON} found (run plan first)")
-        return
+    if plan_data is not None:
+        resources = extract_planned_resources(plan_data)
+    elif (resources := plan_cache.read_planned_resources(ws_dir)) is None:
+        # plan.json is only needed when the plan cache is missing or stale.
+        if not plan_path.exists():
+            typer.echo(f"Skipping {ws_dir.name}: no {PLAN_JSON} found (run plan first)")
+            return
+        with tracing.span("parse plan.json"):
+            resources = read_planned_resources(plan_path)
     config = models.parse_ws_config(ws_config)
-    plan = parse_plan_json(plan_path)
-    resources = extract_planned_resources(plan)
     if show_uncovered:
         uncovered = find_uncovered_resources(resources, config)
         report_uncovered(uncovered)
         return
-    actual_dir = ws_dir / PLAN_SNAPSHOTS_ACTUAL_DIR
-    actual_dir.mkdir(exist_ok=True)
-    for ex in config.examples:
-        nested = ex.should_use_nested_snapshots()
-        if nested:
-            example_dir = actual_dir / ex.identifier
-            example_dir.mkdir(exist_ok=True)
-        for reg in ex.plan_regressions:
-            full_addr = find_matching_address(resources, reg.address, ex.identifier)
-            if not full_addr:
-                typer.echo(f"  Warning: {reg.address} not found in plan", err=True)
-                continue
-            sanitized = models.sanitize_address(reg.address)
-            content = dump_resource_yaml(resources[full_addr], config, ex, reg.dump)
-            if nested:
-                filepath = actual_dir / ex.identifier / f"{sanitized}.yaml"
-                display_path = f"{ex.identifier}/{sanitized}.yaml"
-            else:
-                filepath = actual_dir / f"{ex.identifier}_{sanitized}.yaml"
-                display_path = f"{ex.identifier}_{sanitized}.yaml"
-            filepath.write_text(content)
-            typer.echo(f"  Generated {display_path}")
-    typer.echo(f"Running pytest for {ws_dir.name}...")
-    pytest_args = ["pytest", TEST_PLAN_SNAPSHOT_PY, "-v"]
-    if force_regen:
-        pytest_args.append("--force-regen")
-    result = subprocess.run(pytest_args, cwd=ws_dir)
-    if result.returncode != 0:
-        raise typer.Exit(result.returncode)
+    manifest = snapshot_manifest.load(ws_dir, config)
+    dumped = write_actual_snapshots(
+        ws_dir, config, resources, config.examples, manifest=manifest, force_regen=force_regen
+    )
+    check_snapshots(ws_dir, config, flatten_snapshots(dumped), force_regen, use_pytest, manifest)
 
 
 @app.command()
@@ -220,6 +432,11 @@ def main(
         "-u",
         help="Show resources not covered by plan_regressions",
     ),
+    use_pytest: bool = typer.Option(
+        False,
+        "--pytest",
+        help=f"Run the generated {TEST_PLAN_SNAPSHOT_PY} instead of the in-process comparison",
+    ),
 ) -> None:
     try:
         ws_dirs = models.resolve_workspaces(ws, tests_dir)
@@ -227,7 +444,7 @@ def main(
         typer.echo(f"Error: {e}", err=True)
         raise typer.Exit(1)
     for ws_dir in ws_dirs:
-        process_workspace(ws_dir, force_regen, show_uncovered)
+        process_workspace(ws_dir, force_regen, show_uncovered, use_pytest=use_pytest)
     typer.echo("Done.")
 
 
@@ -1,7 +1,9 @@
 # path-sync copy -n sdlc
 from __future__ import annotations
 
-from workspace import models, reg
+import pytest
+
+from workspace import models, plan_cache, reg, snapshot_bundle
 
 
 def test_filter_values_omits_null_for_redact_attr():
@@ -51,3 +53,108 @@ def test_dump_resource_yaml_omits_null_default_redact_password():
     assert "password" not in yaml_out
     assert "visible" in yaml_out
     assert "ok" in yaml_out
+
+
+def _filter_values_recursive(values, skip_attrs, skip_values, redact_attrs):
+    filtered = {}
+    for key, val in values.items():
+        if key in skip_attrs:
+            continue
+        if key in redact_attrs and val is not None:
+            filtered[key] = f"<{key}>"
+            continue
+        if val is None and "null" in skip_values:
+            continue
+        if isinstance(val, str) and any(sv in val for sv in skip_values):
+            continue
+        if isinstance(val, dict):
+            val = _filter_values_recursive(val, skip_attrs, skip_values, redact_attrs)
+        elif isinstance(val, list):
+            val = [
+                _filter_values_recursive(v, skip_attrs, skip_values, redact_attrs)
+                if isinstance(v, dict)
+                else v
+                for v in val
+            ]
+        filtered[key] = val
+    return filtered
+
+
+@pytest.mark.parametrize("skip_values", [[], ["null"], ["null", "(known after apply)", "a.b"]])
+def test_filter_policy_matches_recursive_filter(skip_values):
+    values = {
+        "name": "cluster",
+        "password": "p",
+        "region": "nullable-region",
+        "host": "a.b.example",
+        "hostx": "axb",
+        "skipped_attr": {"x": 1},
+        "nested": {"password": None, "tags": [{"key": "k", "value": None}, "null", 3, [{"a": 1}]]},
+        "empty": {},
+        "z": None,
+    }
+    args = (["skipped_attr"], skip_values, ["password"])
+    assert reg.filter_values(values, *args) == _filter_values_recursive(values, *args)
+    assert list(reg.filter_values(values, *args)) == list(_filter_values_recursive(values, *args))
+
+
+@pytest.mark.parametrize("regressions", [1, reg.PARALLEL_DUMP_MIN_REGRESSIONS])
+def test_write_actual_snapshots_skips_unchanged_files(tmp_path, capsys, regressions):
+    example = models.Example(
+        number=1,
+        plan_regressions=[models.PlanRegression(address=f"x.r{i}") for i in range(regressions)],
+    )
+    config = models.WsConfig(examples=[example], var_groups={})
+    resources = {f"module.ex_01.x.r{i}": {"name": f"r{i}"} for i in range(regressions)}
+
+    dumped = reg.write_actual_snapshots(tmp_path, config, resources, [example])
+    relpaths = sorted(dumped["01"])
+    assert len(relpaths) == regressions
+    actual_dir = tmp_path / reg.PLAN_SNAPSHOTS_ACTUAL_DIR
+    first = actual_dir / relpaths[0]
+    assert first.read_text() == "name: r0\n"
+    mtimes = {relpath: (actual_dir / relpath).stat().st_mtime_ns for relpath in relpaths}
+    capsys.readouterr()
+
+    resources["module.ex_01.x.r0"] = {"name": "changed"}
+    assert reg.write_actual_snapshots(tmp_path, config, resources, [example]) == {
+        "01": {**dumped["01"], relpaths[0]: "name: changed\n"}
+    }
+    out = capsys.readouterr().out
+    assert f"Generated {relpaths[0]}" in out
+    if regressions > 1:
+        assert f"{regressions - 1} snapshots unchanged" in out
+        assert (actual_dir / relpaths[1]).stat().st_mtime_ns == mtimes[relpaths[1]]
+    assert first.read_text() == "name: changed\n"
+
+
+def test_write_actual_snapshots_bundle_layout(tmp_path):
+    example = models.Example(number=1, plan_regressions=[models.PlanRegression(address="x.r")])
+    config = models.WsConfig(
+        examples=[example], var_groups={}, snapshot_layout=models.SnapshotLayout.BUNDLE
+    )
+    resources = {"module.ex_01.x.r": {"name": "r"}}
+    reuse = {"02_y_r.yaml": "name: reused\n"}
+    reg.write_actual_snapshots(tmp_path, config, resources, [example], reuse)
+    assert not (tmp_path / reg.PLAN_SNAPSHOTS_ACTUAL_DIR).exists()
+    assert snapshot_bundle.read_bundle(tmp_path / snapshot_bundle.ACTUAL_BUNDLE) == {
+        "01_x_r.yaml": "name: r\n",
+        **reuse,
+    }
+
+
+def test_process_workspace_uses_plan_cache_without_plan_json(tmp_path, monkeypatch):
+    example = models.Example(number=1, plan_regressions=[models.PlanRegression(address="x.r")])
+    config = models.WsConfig(examples=[example], var_groups={})
+    (tmp_path / models.WORKSPACE_CONFIG_FILE).write_text("")
+    monkeypatch.setattr(models, "parse_ws_config", lambda _: config)
+    (tmp_path / plan_cache.PLAN_BIN).write_bytes(b"plan")
+    root = {"resources": [{"address": a, "values": {}} for a in ("module.ex_01.x.r", "x.other")]}
+    plan_cache.write(tmp_path, {"planned_values": {"root_module": root}})
+    reported = []
+    monkeypatch.setattr(reg, "report_uncovered", reported.append)
+
+    reg.process_workspace(tmp_path, force_regen=False, show_uncovered=True)
+
+    assert not (tmp_path / reg.PLAN_JSON).exists()
+    assert len(reported) == 1
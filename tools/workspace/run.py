@@ -3,18 +3,42 @@
 
 from __future__ import annotations
 
+import contextlib
 import enum
 import os
+import sys
+import time
+from collections.abc import Generator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import TextIO
 
 import typer
 
-from workspace import gen, import_validation, models, output_assertions, plan, reg
+from shared import tf_plugin_cache
+from workspace import (
+    fake_atlas,
+    gen,
+    http_recording,
+    import_validation,
+    models,
+    output_assertions,
+    parallelism,
+    plan,
+    reg,
+    run_history,
+    shard,
+    snapshot_cache,
+    tracing,
+)
 
 app = typer.Typer()
 
 EXAMPLES_DIR = models.REPO_ROOT / "examples"
 PROVIDER_VERSION_ENV = "MONGODB_ATLAS_PROVIDER_VERSION"
+TF_DATA_DIR_ENV = "TF_DATA_DIR"
+RUN_LOG = "run.log"
 
 
 def _resolve_example_dirs(ws_dir: Path, include_examples: str) -> list[Path]:
@@ -34,6 +58,344 @@ class RunMode(enum.StrEnum):
     DESTROY = "destroy"
     CHECK_OUTPUTS = "check-outputs"
     IMPORT = "import"
+    PIPELINE = "pipeline"
+
+
+class PipelineStage(enum.StrEnum):
+    PLAN = "plan"
+    SNAPSHOT = "snapshot"
+    APPLY = "apply"
+    CHECK_OUTPUTS = "check-outputs"
+    IMPORT = "import"
+
+
+PLAN_MODES = (RunMode.PLAN_ONLY, RunMode.PLAN_SNAPSHOT_TEST)
+
+
+@dataclass
+class RunOptions:
+    mode: RunMode
+    include_examples: str
+    auto_approve: bool
+    skip_init: bool
+    force_init: bool = False
+    var_file: list[Path] = field(default_factory=list)
+    force_regen: bool = False
+    show_uncovered: bool = False
+    provider_version: str | None = None
+    shards: int = 1
+    incremental: bool = False
+    skip_stages: list[PipelineStage] = field(default_factory=list)
+    write_plan_json: bool = False
+    pytest_snapshots: bool = False
+    trace: bool = False
+    offline: bool = False
+    atlas_http: http_recording.HttpMode | None = None
+    import_per_example: bool = False
+
+
+@dataclass
+class WsResult:
+    name: str
+    passed: bool
+    duration: float
+    log_path: Path | None = None
+    error: str = ""
+    spans: list[tracing.Span] = field(default_factory=list)
+
+
+def _is_incremental(opts: RunOptions) -> bool:
+    return opts.incremental and opts.mode == RunMode.PLAN_SNAPSHOT_TEST and not opts.show_uncovered
+
+
+def _partition_examples(
+    ws_dir: Path, opts: RunOptions
+) -> tuple[models.WsConfig, list[models.Example], dict[str, snapshot_cache.CacheEntry]]:
+    config = models.parse_ws_config(ws_dir / models.WORKSPACE_CONFIG_FILE)
+    examples = gen.parse_include_examples(opts.include_examples, config)
+    changed, unchanged = snapshot_cache.partition(
+        ws_dir, config, examples, opts.var_file, opts.provider_version
+    )
+    return config, changed, unchanged
+
+
+def _examples_selector(examples: list[models.Example]) -> str:
+    return ",".join(ex.identifier for ex in examples) or "none"
+
+
+def _plan_include(ws_dir: Path, opts: RunOptions) -> str:
+    """Examples to generate and plan; incremental runs leave out cache hits."""
+    if not _is_incremental(opts) or not (ws_dir / models.WORKSPACE_CONFIG_FILE).exists():
+        return opts.include_examples
+    _, changed, _ = _partition_examples(ws_dir, opts)
+    return _examples_selector(changed)
+
+
+def _pipeline_stages(opts: RunOptions) -> list[PipelineStage]:
+    return [stage for stage in PipelineStage if stage not in opts.skip_stages]
+
+
+def _tf_parallelism(ws_dir: Path, mode: parallelism.TfMode) -> int | None:
+    ws_config_path = ws_dir / models.WORKSPACE_CONFIG_FILE
+    if not ws_config_path.exists():
+        return None
+    config = models.parse_ws_config(ws_config_path)
+    return parallelism.resolve(ws_dir, config.parallelism, mode)
+
+
+def _targets(ws_dir: Path, include_examples: str) -> list[str]:
+    """`-target`s for the selected examples so refresh skips the rest of the state."""
+    ws_config_path = ws_dir / models.WORKSPACE_CONFIG_FILE
+    if include_examples == "all" or not ws_config_path.exists():
+        return []
+    config = models.parse_ws_config(ws_config_path)
+    return gen.example_targets(gen.parse_include_examples(include_examples, config), config)
+
+
+def _run_pipeline(ws_dir: Path, opts: RunOptions) -> None:
+    """Init and plan once, then apply the saved plan.bin and validate the resulting state."""
+    stages = _pipeline_stages(opts)
+    typer.echo(f"  Pipeline stages: {', '.join(stages) or 'none'}")
+    if not opts.skip_init:
+        plan.run_terraform_init(ws_dir, force=opts.force_init)
+    plan_data = None
+    targets = _targets(ws_dir, opts.include_examples)
+    if PipelineStage.PLAN in stages:
+        plan_data = plan.run_terraform_plan(
+            ws_dir,
+            opts.var_file,
+            skip_init=True,
+            write_json=opts.write_plan_json,
+            parallelism=_tf_parallelism(ws_dir, parallelism.TfMode.PLAN),
+            targets=targets,
+        )
+        if not targets:
+            parallelism.record_plan(ws_dir, plan_data)
+    if PipelineStage.SNAPSHOT in stages:
+        reg.process_workspace(
+            ws_dir,
+            force_regen=opts.force_regen,
+            show_uncovered=opts.show_uncovered,
+            plan_data=plan_data,
+            use_pytest=opts.pytest_snapshots,
+        )
+    if PipelineStage.APPLY in stages:
+        plan.run_terraform_apply_plan(ws_dir, _tf_parallelism(ws_dir, parallelism.TfMode.APPLY))
+    if PipelineStage.CHECK_OUTPUTS in stages:
+        output_assertions.process_workspace(ws_dir, opts.include_examples)
+    if PipelineStage.IMPORT in stages:
+        import_validation.process_workspace(
+            ws_dir,
+            opts.include_examples,
+            opts.var_file,
+            opts.write_plan_json,
+            opts.import_per_example,
+        )
+
+
+def _writes_plan_json(opts: RunOptions) -> bool:
+    # plan-only has no later stage to hand the plan to; plan.json is its output.
+    return opts.write_plan_json or opts.mode == RunMode.PLAN_ONLY
+
+
+def _run_workspace(ws_dir: Path, opts: RunOptions) -> None:
+    """Run the terraform stages for one workspace (gen and provider stripping done by caller)."""
+    with (
+        tracing.span("workspace", workspace=ws_dir.name, mode=opts.mode),
+        plan.provider_version_override(ws_dir, opts.provider_version),
+        http_recording.session(ws_dir, opts.atlas_http, opts.provider_version),
+    ):
+        mode = opts.mode
+        if mode == RunMode.PIPELINE:
+            _run_pipeline(ws_dir, opts)
+            return
+        include_examples = opts.include_examples
+        if incremental := _is_incremental(opts):
+            config, changed, unchanged = _partition_examples(ws_dir, opts)
+            include_examples = _examples_selector(changed)
+        plan_data = None
+        targets = _targets(ws_dir, include_examples)
+        if incremental and not changed:
+            typer.echo(f"  All {len(unchanged)} examples unchanged, skipping init and plan")
+        elif opts.shards > 1:
+            plan_data = shard.run_sharded_plan(
+                ws_dir,
+                include_examples,
+                opts.var_file,
+                opts.shards,
+                skip_init=opts.skip_init,
+                force_init=opts.force_init,
+                write_json=_writes_plan_json(opts),
+                parallelism=_tf_parallelism(ws_dir, parallelism.TfMode.PLAN),
+                offline=opts.offline,
+            )
+        else:
+            if not opts.skip_init:
+                plan.run_terraform_init(ws_dir, force=opts.force_init)
+            if mode in PLAN_MODES and opts.offline:
+                plan_data = plan.run_terraform_test_plan(
+                    ws_dir, opts.var_file, skip_init=True, write_json=_writes_plan_json(opts)
+                )
+            elif mode in PLAN_MODES:
+                plan_data = plan.run_terraform_plan(
+                    ws_dir,
+                    opts.var_file,
+                    skip_init=True,
+                    write_json=_writes_plan_json(opts),
+                    parallelism=_tf_parallelism(ws_dir, parallelism.TfMode.PLAN),
+                    targets=targets,
+                )
+        # Partial plans cover only some examples and would understate the workspace size.
+        if plan_data is not None and not incremental and not targets:
+            parallelism.record_plan(ws_dir, plan_data)
+
+        if incremental:
+            snapshot_cache.process_workspace(
+                ws_dir,
+                config,
+                changed,
+                unchanged,
+                opts.var_file,
+                opts.provider_version,
+                opts.force_regen,
+                plan_data,
+                opts.pytest_snapshots,
+            )
+        elif mode == RunMode.PLAN_SNAPSHOT_TEST:
+            reg.process_workspace(
+                ws_dir,
+                force_regen=opts.force_regen,
+                show_uncovered=opts.show_uncovered,
+                plan_data=plan_data,
+                use_pytest=opts.pytest_snapshots,
+            )
+
+        if mode in (RunMode.SETUP_ONLY, RunMode.APPLY):
+            plan.run_terraform_apply(
+                ws_dir,
+                opts.var_file,
+                opts.auto_approve,
+                _tf_parallelism(ws_dir, parallelism.TfMode.APPLY),
+                targets,
+            )
+
+        if mode == RunMode.CHECK_OUTPUTS:
+            output_assertions.process_workspace(ws_dir, opts.include_examples)
+
+        if mode == RunMode.IMPORT:
+            import_validation.process_workspace(
+                ws_dir,
+                opts.include_examples,
+                opts.var_file,
+                opts.write_plan_json,
+                opts.import_per_example,
+            )
+
+        if mode == RunMode.DESTROY:
+            plan.run_terraform_destroy(
+                ws_dir,
+                opts.var_file,
+                opts.auto_approve,
+                _tf_parallelism(ws_dir, parallelism.TfMode.DESTROY),
+                targets,
+            )
+
+
+@contextlib.contextmanager
+def _redirect_output(log: TextIO) -> Generator[None]:
+    """Point fd 1/2 at `log` so terraform subprocesses inherit the worker's log stream."""
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = os.dup(1), os.dup(2)
+    os.dup2(log.fileno(), 1)
+    os.dup2(log.fileno(), 2)
+    try:
+        with contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+            yield
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(saved[0], 1)
+        os.dup2(saved[1], 2)
+        os.close(saved[0])
+        os.close(saved[1])
+
+
+def _generate(ws_dir: Path, include_examples: str, offline: bool) -> None:
+    with tracing.span("gen", workspace=ws_dir.name):
+        gen.process_workspace(ws_dir, include_examples=include_examples, offline=offline)
+
+
+def _run_workspace_worker(ws_dir: Path, opts: RunOptions) -> WsResult:
+    # A TF_DATA_DIR from the caller's environment would make workers, and the shard and
+    # import copies they run terraform in, share one data dir; the default is per cwd.
+    os.environ.pop(TF_DATA_DIR_ENV, None)
+    if opts.trace:
+        tracing.enable()
+    log_path = ws_dir / RUN_LOG
+    start = time.monotonic()
+    passed, error = True, ""
+    with log_path.open("w") as log, _redirect_output(log):
+        typer.echo(f"=== {ws_dir.name} ({opts.mode}) ===")
+        try:
+            _run_workspace(ws_dir, opts)
+        except typer.Exit as e:
+            passed, error = e.exit_code == 0, f"exit code {e.exit_code}"
+        except Exception as e:
+            passed, error = False, f"{type(e).__name__}: {e}"
+        if error:
+            typer.echo(f"Error: {error}", err=True)
+    duration = time.monotonic() - start
+    return WsResult(ws_dir.name, passed, duration, log_path, error, tracing.collect())
+
+
+def _run_parallel(ws_dirs: list[Path], opts: RunOptions, jobs: int) -> list[WsResult]:
+    example_dirs: list[Path] = []
+    for ws_dir in ws_dirs:
+        include_examples = _plan_include(ws_dir, opts)
+        _generate(ws_dir, include_examples, opts.offline)
+        example_dirs.extend(
+            d for d in _resolve_example_dirs(ws_dir, include_examples) if d not in example_dirs
+        )
+    workers = min(jobs, len(ws_dirs))
+    typer.echo(f"Running {len(ws_dirs)} workspaces with {workers} jobs...")
+    results: list[WsResult] = []
+    # Examples can be shared between workspaces, so strip provider blocks once for all workers.
+    with (
+        plan.strip_provider_blocks(example_dirs),
+        ProcessPoolExecutor(max_workers=workers) as executor,
+    ):
+        futures = [executor.submit(_run_workspace_worker, d, opts) for d in ws_dirs]
+        for future in futures:
+            result = future.result()
+            tracing.add(result.spans)
+            status = "ok" if result.passed else "FAIL"
+            typer.echo(f"  {result.name}: {status} ({result.duration:.1f}s)")
+            results.append(result)
+    return results
+
+
+def _warm_up_plugin_cache(ws_dirs: list[Path], opts: RunOptions) -> None:
+    tf_plugin_cache.enable()
+    if opts.skip_init:
+        return
+    source_dirs = list(ws_dirs)
+    for ws_dir in ws_dirs:
+        source_dirs.extend(_resolve_example_dirs(ws_dir, opts.include_examples))
+    pinned = {}
+    if opts.provider_version:
+        pinned[plan.MONGODB_ATLAS_PROVIDER_SOURCE] = opts.provider_version
+    tf_plugin_cache.warm_up(dict.fromkeys(source_dirs), pinned=pinned)
+
+
+def report_results(results: list[WsResult]) -> int:
+    failed = [r for r in results if not r.passed]
+    typer.echo(f"=== Summary: {len(results) - len(failed)}/{len(results)} workspaces passed ===")
+    for r in results:
+        status = "PASS" if r.passed else "FAIL"
+        suffix = f" - {r.error}" if r.error else ""
+        typer.echo(f"  {status} {r.name} ({r.duration:.1f}s, log: {r.log_path}){suffix}")
+    return 1 if failed else 0
 
 
 @app.command()
@@ -42,6 +404,9 @@ def main(
     include_examples: str = typer.Option("all", "--include-examples", "-e"),
     auto_approve: bool = typer.Option(False, "--auto-approve"),
     skip_init: bool = typer.Option(False, "--skip-init"),
+    force_init: bool = typer.Option(
+        False, "--force-init", help="Run terraform init even when its inputs are unchanged"
+    ),
     ws: str = typer.Option("all", "--ws"),
     tests_dir: Path = typer.Option(models.DEFAULT_TESTS_DIR, "--tests-dir"),
     var_file: list[Path] = typer.Option([], "--var-file", "-v"),
@@ -52,53 +417,185 @@ def main(
         "-u",
         help="Show resources not covered by plan_regressions",
     ),
+    jobs: int = typer.Option(
+        1,
+        "--jobs",
+        "-j",
+        min=1,
+        help=f"Run up to N workspaces concurrently, each logging to <workspace>/{RUN_LOG}",
+    ),
+    shards: int = typer.Option(
+        1,
+        "--shards",
+        min=1,
+        help="Split each workspace's examples into N concurrently planned shards (plan modes)",
+    ),
+    incremental: bool = typer.Option(
+        False,
+        "--incremental",
+        help=f"plan-snapshot-test: only plan examples whose inputs changed (cache in "
+        f"<workspace>/{snapshot_cache.CACHE_DIR})",
+    ),
+    skip_stage: list[PipelineStage] = typer.Option(
+        [],
+        "--skip-stage",
+        help="pipeline: skip a stage (repeatable); apply uses the plan.bin of the plan stage",
+    ),
+    write_plan_json: bool = typer.Option(
+        False,
+        "--write-plan-json",
+        help=f"Also write <workspace>/{plan.PLAN_JSON} for debugging (always written by "
+        "plan-only); stages share the parsed plan in memory",
+    ),
+    pytest_snapshots: bool = typer.Option(
+        False,
+        "--pytest-snapshots",
+        help=f"Check snapshots with the generated {reg.TEST_PLAN_SNAPSHOT_PY} instead of "
+        "the in-process comparison",
+    ),
+    trace: Path | None = typer.Option(
+        None,
+        "--trace",
+        help="Write a Chrome trace-event JSON of the run phases to this path and print a "
+        "per-phase summary",
+    ),
+    use_fake_atlas: bool = typer.Option(
+        False,
+        "--fake-atlas",
+        help="Point the provider at an in-memory Atlas Admin API stand-in for this run "
+        "(see workspace.fake_atlas); no credentials or API time needed",
+    ),
+    atlas_http: http_recording.HttpMode | None = typer.Option(
+        None,
+        "--atlas-http",
+        help=f"Plan modes: record the provider's Atlas HTTP traffic to "
+        f"<workspace>/{http_recording.RECORDING_DIR}/ or replay it without network access",
+    ),
+    import_per_example: bool = typer.Option(
+        False,
+        "--import-per-example",
+        help=f"import: validate each example concurrently in its own state copy under "
+        f"<workspace>/{import_validation.EXAMPLE_COPIES_DIR}/",
+    ),
+    offline: bool = typer.Option(
+        False,
+        "--offline",
+        help=f"Plan modes: plan with mock providers via `terraform test` ({gen.OFFLINE_TFTEST}); "
+        "no Atlas credentials or API calls",
+    ),
+    history: bool = typer.Option(
+        False,
+        "--history",
+        help=f"Record wall time, resource and retry counts and outcome per workspace, example "
+        f"and phase in <tests-dir>/{run_history.RUN_HISTORY_FILE} (report: just ws-history)",
+    ),
 ) -> None:
     try:
         ws_dirs = models.resolve_workspaces(ws, tests_dir)
     except ValueError as e:
         typer.echo(f"Error: {e}", err=True)
         raise typer.Exit(1)
+    if shards > 1 and mode not in PLAN_MODES:
+        typer.echo(f"Error: --shards is only supported with {', '.join(PLAN_MODES)}", err=True)
+        raise typer.Exit(1)
+    if offline and mode not in PLAN_MODES:
+        typer.echo(f"Error: --offline is only supported with {', '.join(PLAN_MODES)}", err=True)
+        raise typer.Exit(1)
+    if atlas_http and mode not in PLAN_MODES:
+        typer.echo(f"Error: --atlas-http is only supported with {', '.join(PLAN_MODES)}", err=True)
+        raise typer.Exit(1)
+    if import_per_example and mode not in (RunMode.IMPORT, RunMode.PIPELINE):
+        typer.echo(
+            f"Error: --import-per-example is only supported with {RunMode.IMPORT}, "
+            f"{RunMode.PIPELINE}",
+            err=True,
+        )
+        raise typer.Exit(1)
+    if incremental and mode != RunMode.PLAN_SNAPSHOT_TEST:
+        typer.echo(
+            f"Error: --incremental is only supported with {RunMode.PLAN_SNAPSHOT_TEST}", err=True
+        )
+        raise typer.Exit(1)
+    if skip_stage and mode != RunMode.PIPELINE:
+        typer.echo(f"Error: --skip-stage is only supported with {RunMode.PIPELINE}", err=True)
+        raise typer.Exit(1)
+    if PipelineStage.PLAN in skip_stage and PipelineStage.APPLY not in skip_stage:
+        typer.echo(
+            "Error: the apply stage applies the plan.bin of this run's plan stage; "
+            "skip apply too or keep the plan stage",
+            err=True,
+        )
+        raise typer.Exit(1)
+    if mode == RunMode.PIPELINE and PipelineStage.APPLY not in skip_stage and not auto_approve:
+        typer.echo(
+            "Error: pipeline applies the saved plan without prompting; "
+            "pass --auto-approve or --skip-stage apply",
+            err=True,
+        )
+        raise typer.Exit(1)
 
-    examples = "none" if mode == RunMode.SETUP_ONLY else include_examples
-    provider_version = os.getenv(PROVIDER_VERSION_ENV)
+    opts = RunOptions(
+        mode=mode,
+        include_examples="none" if mode == RunMode.SETUP_ONLY else include_examples,
+        auto_approve=auto_approve,
+        skip_init=skip_init,
+        force_init=force_init,
+        var_file=var_file,
+        force_regen=force_regen,
+        show_uncovered=show_uncovered,
+        provider_version=os.getenv(PROVIDER_VERSION_ENV),
+        shards=shards,
+        incremental=incremental,
+        skip_stages=skip_stage,
+        write_plan_json=write_plan_json,
+        pytest_snapshots=pytest_snapshots,
+        # Run history is built from the spans, so workers trace for it too.
+        trace=trace is not None or history,
+        offline=offline,
+        atlas_http=atlas_http,
+        import_per_example=import_per_example,
+    )
+    history_path = run_history.history_path(tests_dir) if history else None
+    with (
+        tracing.session(trace),
+        run_history.session(history_path, opts.mode, opts.include_examples),
+        fake_atlas.session(use_fake_atlas),
+    ):
+        _run_all(ws_dirs, opts, jobs)
 
-    for ws_dir in ws_dirs:
-        typer.echo(f"=== {ws_dir.name} ({mode}) ===")
-        gen.process_workspace(ws_dir, include_examples=examples)
-        example_dirs = _resolve_example_dirs(ws_dir, examples)
 
-        try:
-            with (
-                plan.strip_provider_blocks(example_dirs),
-                plan.provider_version_override(ws_dir, provider_version),
-            ):
-                if not skip_init:
-                    plan.run_terraform_init(ws_dir)
-
-                if mode in (RunMode.PLAN_ONLY, RunMode.PLAN_SNAPSHOT_TEST):
-                    plan.run_terraform_plan(ws_dir, var_file, skip_init=True)
-
-                if mode == RunMode.PLAN_SNAPSHOT_TEST:
-                    reg.process_workspace(
-                        ws_dir,
-                        force_regen=force_regen,
-                        show_uncovered=show_uncovered,
-                    )
-
-                if mode in (RunMode.SETUP_ONLY, RunMode.APPLY):
-                    plan.run_terraform_apply(ws_dir, var_file, auto_approve)
-
-                if mode == RunMode.CHECK_OUTPUTS:
-                    output_assertions.process_workspace(ws_dir, include_examples)
-
-                if mode == RunMode.IMPORT:
-                    import_validation.process_workspace(ws_dir, include_examples, var_file)
-
-                if mode == RunMode.DESTROY:
-                    plan.run_terraform_destroy(ws_dir, var_file, auto_approve)
-        except (FileExistsError, ValueError) as e:
-            typer.echo(f"Error: {e}", err=True)
-            raise typer.Exit(1) from e
+@contextlib.contextmanager
+def _setup_errors_exit() -> Generator[None]:
+    """Report gen and provider-stripping errors (bad config, leftover backups) without a
+    traceback; workspace errors inside parallel workers are reported per workspace instead.
+    """
+    try:
+        yield
+    except (FileExistsError, ValueError) as e:
+        typer.echo(f"Error: {e}", err=True)
+        raise typer.Exit(1) from e
+
+
+def _run_all(ws_dirs: list[Path], opts: RunOptions, jobs: int) -> None:
+    with tracing.span("plugin cache warm-up"):
+        _warm_up_plugin_cache(ws_dirs, opts)
+
+    if jobs > 1 and len(ws_dirs) > 1:
+        with _setup_errors_exit():
+            results = _run_parallel(ws_dirs, opts, jobs)
+        if exit_code := report_results(results):
+            raise typer.Exit(exit_code)
+        typer.echo("Done.")
+        return
+
+    for ws_dir in ws_dirs:
+        typer.echo(f"=== {ws_dir.name} ({opts.mode}) ===")
+        with _setup_errors_exit():
+            include_examples = _plan_include(ws_dir, opts)
+            _generate(ws_dir, include_examples, opts.offline)
+            example_dirs = _resolve_example_dirs(ws_dir, include_examples)
+            with plan.strip_provider_blocks(example_dirs):
+                _run_workspace(ws_dir, opts)
 
     typer.echo("Done.")
 
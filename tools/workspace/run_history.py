@@ -0,0 +1,341 @@
+# path-sync copy -n sdlc
+"""Local SQLite history of workspace runs (`workspace.run --history`).
+
+Each run adds a `runs` row and one `items` row per workspace, example and phase with
+the wall time, resource count, `terraform init` retries and outcome, all taken from the
+run's trace spans (see tracing). Items of the whole workspace have example "".
+`python -m workspace.run_history` (`just ws-history`) reports the slowest items, the
+ones slowing down compared to earlier runs and the ones failing intermittently.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import enum
+import sqlite3
+import statistics
+import time
+from collections.abc import Generator
+from dataclasses import astuple, dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+
+import typer
+
+from workspace import models, tracing
+
+app = typer.Typer()
+
+RUN_HISTORY_FILE = ".run_history.sqlite"
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    include_examples TEXT NOT NULL,
+    duration_s REAL NOT NULL,
+    passed INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    workspace TEXT NOT NULL,
+    example TEXT NOT NULL,
+    phase TEXT NOT NULL,
+    wall_s REAL NOT NULL,
+    resources INTEGER,
+    retries INTEGER NOT NULL,
+    passed INTEGER NOT NULL,
+    PRIMARY KEY (run_id, workspace, example, phase)
+);
+"""
+# Concurrent runs on the same tests dir wait for each other's writes.
+CONNECT_TIMEOUT_S = 30
+
+
+class Phase(enum.StrEnum):
+    WORKSPACE = "workspace"
+    INIT = "init"
+    PLAN = "plan"
+    SHOW = "show"
+    REG = "reg"
+    APPLY = "apply"
+    IMPORT = "import"
+    DESTROY = "destroy"
+
+
+SPAN_PHASES = {
+    "workspace": Phase.WORKSPACE,
+    "terraform init": Phase.INIT,
+    "terraform plan": Phase.PLAN,
+    "terraform test": Phase.PLAN,
+    "terraform show -json": Phase.SHOW,
+    "parse plan.json": Phase.SHOW,
+    "reg dump": Phase.REG,
+    "snapshot compare": Phase.REG,
+    "pytest snapshots": Phase.REG,
+    "terraform apply": Phase.APPLY,
+    "import read state": Phase.IMPORT,
+    "import example": Phase.IMPORT,
+    "terraform destroy": Phase.DESTROY,
+}
+
+
+@dataclass
+class Item:
+    workspace: str
+    example: str
+    phase: Phase
+    wall_s: float = 0.0
+    resources: int | None = None
+    retries: int = 0
+    passed: bool = True
+
+
+@dataclass
+class ItemStats:
+    """An item over the reported runs, oldest first."""
+
+    workspace: str
+    example: str
+    phase: str
+    wall_s: list[float] = field(default_factory=list)
+    passed: list[bool] = field(default_factory=list)
+    retries: int = 0
+    resources: int | None = None
+
+    @property
+    def label(self) -> str:
+        return "/".join(part for part in (self.workspace, self.example, self.phase) if part)
+
+    @property
+    def failures(self) -> int:
+        return self.passed.count(False)
+
+    @property
+    def slowdown(self) -> float | None:
+        """Last wall time relative to the mean of the earlier ones (0.5 = 50% slower)."""
+        if len(self.wall_s) < 2 or (earlier := statistics.fmean(self.wall_s[:-1])) <= 0:
+            return None
+        return self.wall_s[-1] / earlier - 1
+
+
+def history_path(tests_dir: Path) -> Path:
+    return tests_dir / RUN_HISTORY_FILE
+
+
+def _passed(span: tracing.Span) -> bool:
+    return not span.failed and span.attrs.get("exit_code", "0") == "0"
+
+
+def items(spans: list[tracing.Span]) -> list[Item]:
+    """Sum the spans of each workspace, example and phase; spans of other names are skipped."""
+    by_key: dict[tuple[str, str, Phase], Item] = {}
+    for span in spans:
+        phase = SPAN_PHASES.get(span.name)
+        workspace = span.attrs.get("workspace") or span.attrs.get("dir")
+        if phase is None or workspace is None:
+            continue
+        example = span.attrs.get("example", "")
+        item = by_key.setdefault((workspace, example, phase), Item(workspace, example, phase))
+        item.wall_s += span.duration_us / 1e6
+        if "resources" in span.attrs:
+            item.resources = (item.resources or 0) + int(span.attrs["resources"])
+        item.retries += int(span.attrs.get("retries", "0"))
+        item.passed = item.passed and _passed(span)
+    return sorted(
+        by_key.values(), key=lambda i: (i.workspace, i.example, list(Phase).index(i.phase))
+    )
+
+
+@contextlib.contextmanager
+def connect(db_path: Path) -> Generator[sqlite3.Connection]:
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    with contextlib.closing(sqlite3.connect(db_path, timeout=CONNECT_TIMEOUT_S)) as conn, conn:
+        conn.executescript(SCHEMA)
+        yield conn
+
+
+def record(
+    db_path: Path,
+    started_at: str,
+    mode: str,
+    include_examples: str,
+    duration_s: float,
+    passed: bool,
+    spans: list[tracing.Span],
+) -> int:
+    """Add a run and the items of its spans; returns the run id."""
+    with connect(db_path) as conn:
+        cursor = conn.execute(
+            "INSERT INTO runs (started_at, mode, include_examples, duration_s, passed) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (started_at, mode, include_examples, duration_s, passed),
+        )
+        run_id = cursor.lastrowid
+        assert run_id is not None
+        conn.executemany(
+            "INSERT INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(run_id, *astuple(i)) for i in items(spans)],
+        )
+    return run_id
+
+
+@contextlib.contextmanager
+def session(db_path: Path | None, mode: str, include_examples: str) -> Generator[None]:
+    """Record the block as a run in `db_path` when set, tracing it if nothing else does.
+
+    Workers of parallel runs must trace too (`RunOptions.trace`) and return their spans.
+    """
+    if db_path is None:
+        yield
+        return
+    owns_tracing = not tracing.enabled()
+    tracing.enable()
+    started_at = datetime.now(UTC).isoformat(timespec="seconds")
+    start = time.monotonic()
+    passed = False
+    try:
+        yield
+        passed = True
+    except typer.Exit as e:
+        passed = e.exit_code == 0
+        raise
+    finally:
+        duration_s = time.monotonic() - start
+        spans = tracing.collect() if owns_tracing else tracing.recorded()
+        if owns_tracing:
+            tracing.disable()
+        run_id = record(db_path, started_at, mode, include_examples, duration_s, passed, spans)
+        typer.echo(f"Recorded run {run_id} in {db_path}")
+
+
+def recent_runs(conn: sqlite3.Connection, runs: int) -> list[tuple[int, str, str, float, bool]]:
+    """(id, started_at, mode, duration_s, passed) of the last `runs` runs, oldest first."""
+    rows = conn.execute(
+        "SELECT id, started_at, mode, duration_s, passed FROM runs ORDER BY id DESC LIMIT ?",
+        (runs,),
+    ).fetchall()
+    return [
+        (run_id, started, mode, duration, bool(ok))
+        for run_id, started, mode, duration, ok in rows[::-1]
+    ]
+
+
+def item_stats(conn: sqlite3.Connection, run_ids: list[int]) -> list[ItemStats]:
+    placeholders = ", ".join("?" * len(run_ids))
+    cursor = conn.execute(
+        f"SELECT workspace, example, phase, wall_s, resources, retries, passed FROM items "
+        f"WHERE run_id IN ({placeholders}) ORDER BY run_id",
+        run_ids,
+    )
+    stats: dict[tuple[str, str, str], ItemStats] = {}
+    for workspace, example, phase, wall_s, resources, retries, passed in cursor:
+        item = stats.setdefault((workspace, example, phase), ItemStats(workspace, example, phase))
+        item.wall_s.append(wall_s)
+        item.passed.append(bool(passed))
+        item.retries += retries
+        if resources is not None:
+            item.resources = resources
+    return list(stats.values())
+
+
+def _table(header: list[str], rows: list[list[str]]) -> str:
+    widths = [max([len(h), *(len(r[i]) for r in rows)]) for i, h in enumerate(header)]
+    lines = [header, *rows]
+    return "\n".join(
+        "  ".join(
+            cell.ljust(width) if i == 0 else cell.rjust(width)
+            for i, (cell, width) in enumerate(zip(line, widths, strict=True))
+        ).rstrip()
+        for line in lines
+    )
+
+
+def format_report(
+    runs: list[tuple[int, str, str, float, bool]], stats: list[ItemStats], top: int
+) -> str:
+    sections = [
+        f"=== Last {len(runs)} runs ===",
+        _table(
+            ["run", "started_at", "mode", "wall_s", "result"],
+            [
+                [str(run_id), started, mode, f"{duration:.1f}", "PASS" if ok else "FAIL"]
+                for run_id, started, mode, duration, ok in runs
+            ],
+        ),
+    ]
+    slowest = sorted(stats, key=lambda s: statistics.fmean(s.wall_s), reverse=True)[:top]
+    sections += [
+        f"=== Slowest items (mean over the last {len(runs)} runs) ===",
+        _table(
+            ["item", "runs", "mean_s", "max_s", "last_s", "resources", "retries", "failures"],
+            [
+                [
+                    s.label,
+                    str(len(s.wall_s)),
+                    f"{statistics.fmean(s.wall_s):.2f}",
+                    f"{max(s.wall_s):.2f}",
+                    f"{s.wall_s[-1]:.2f}",
+                    "-" if s.resources is None else str(s.resources),
+                    str(s.retries),
+                    str(s.failures),
+                ]
+                for s in slowest
+            ],
+        ),
+    ]
+    trending = [s for s in stats if (s.slowdown or 0) > 0]
+    trending.sort(key=lambda s: s.slowdown or 0, reverse=True)
+    sections += [
+        "=== Slowing down (last run vs. mean of the earlier ones) ===",
+        _table(
+            ["item", "earlier_s", "last_s", "change"],
+            [
+                [
+                    s.label,
+                    f"{statistics.fmean(s.wall_s[:-1]):.2f}",
+                    f"{s.wall_s[-1]:.2f}",
+                    f"+{s.slowdown:.0%}",
+                ]
+                for s in trending[:top]
+            ],
+        ),
+    ]
+    flaky = [s for s in stats if 0 < s.failures < len(s.passed)]
+    flaky.sort(key=lambda s: s.failures / len(s.passed), reverse=True)
+    sections += [
+        "=== Intermittent failures ===",
+        _table(
+            ["item", "runs", "failures", "outcomes (oldest first)"],
+            [
+                [
+                    s.label,
+                    str(len(s.passed)),
+                    str(s.failures),
+                    "".join("." if ok else "F" for ok in s.passed),
+                ]
+                for s in flaky[:top]
+            ],
+        ),
+    ]
+    return "\n".join(sections)
+
+
+@app.command()
+def main(
+    tests_dir: Path = typer.Option(models.DEFAULT_TESTS_DIR, "--tests-dir"),
+    runs: int = typer.Option(20, "--runs", min=1, help="Report on the last N runs"),
+    top: int = typer.Option(10, "--top", min=1, help="Rows per section"),
+) -> None:
+    db_path = history_path(tests_dir)
+    if not db_path.is_file():
+        typer.echo(f"Error: no run history at {db_path}; run workspace.run --history", err=True)
+        raise typer.Exit(1)
+    with connect(db_path) as conn:
+        recent = recent_runs(conn, runs)
+        stats = item_stats(conn, [run_id for run_id, *_ in recent])
+    typer.echo(format_report(recent, stats, top))
+
+
+if __name__ == "__main__":
+    app()
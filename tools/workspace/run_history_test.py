@@ -0,0 +1,108 @@
+# path-sync copy -n sdlc
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+import typer
+
+from workspace import run_history, tracing
+from workspace.run_history import Phase
+
+
+@pytest.fixture(autouse=True)
+def reset_tracing():
+    yield
+    tracing.disable()
+
+
+def _span(name: str, seconds: float, failed: bool = False, **attrs: str) -> tracing.Span:
+    return tracing.Span(name, 0, int(seconds * 1e6), 0.0, 0.0, 1, 1, attrs, failed)
+
+
+def test_items_group_spans_by_workspace_example_and_phase():
+    spans = [
+        _span("workspace", 10.0, workspace="ws_a"),
+        _span("terraform init", 1.0, workspace="ws_a", dir="ws_a", retries="2"),
+        _span("terraform plan", 4.0, workspace="ws_a", dir="ws_a", exit_code="1"),
+        _span("terraform show -json", 1.5, dir="ws_a", resources="7"),
+        _span("reg dump", 0.25, workspace="ws_a", example="ex1", resources="1"),
+        _span("reg dump", 0.5, workspace="ws_a", example="ex1", resources="1"),
+        _span("reg dump", 0.5, True, workspace="ws_a", example="ex2", resources="1"),
+        _span("gen", 2.0, workspace="ws_a"),
+        _span("run", 20.0),
+    ]
+
+    items = run_history.items(spans)
+
+    assert [(i.example, i.phase) for i in items] == [
+        ("", Phase.WORKSPACE),
+        ("", Phase.INIT),
+        ("", Phase.PLAN),
+        ("", Phase.SHOW),
+        ("ex1", Phase.REG),
+        ("ex2", Phase.REG),
+    ]
+    by_key = {(i.example, i.phase): i for i in items}
+    assert by_key["", Phase.INIT].retries == 2
+    assert by_key["", Phase.INIT].resources is None
+    assert not by_key["", Phase.PLAN].passed
+    assert by_key["", Phase.SHOW].resources == 7
+    assert by_key["ex1", Phase.REG].wall_s == 0.75
+    assert by_key["ex1", Phase.REG].resources == 2
+    assert by_key["ex1", Phase.REG].passed
+    assert not by_key["ex2", Phase.REG].passed
+
+
+def _record(db_path: Path, plan_s: float, passed: bool = True) -> int:
+    spans = [_span("terraform plan", plan_s, not passed, workspace="ws_a", example="ex1")]
+    return run_history.record(
+        db_path, "2026-01-01T00:00:00+00:00", "plan-only", "all", 1.0, passed, spans
+    )
+
+
+def test_report_lists_slowest_slowing_down_and_intermittent_items(tmp_path: Path):
+    db_path = tmp_path / run_history.RUN_HISTORY_FILE
+    for plan_s, passed in [(2.0, True), (2.0, False), (3.0, True)]:
+        _record(db_path, plan_s, passed)
+    with run_history.connect(db_path) as conn:
+        runs = run_history.recent_runs(conn, 2)
+        stats = run_history.item_stats(conn, [run_id for run_id, *_ in runs])
+
+    assert [run_id for run_id, *_ in runs] == [2, 3]
+    (plan_stats,) = stats
+    assert plan_stats.label == "ws_a/ex1/plan"
+    assert plan_stats.wall_s == [2.0, 3.0]
+    assert plan_stats.slowdown == 0.5
+    report = run_history.format_report(runs, stats, top=5)
+    assert "=== Last 2 runs ===" in report
+    lines = report.splitlines()
+    trend = lines[lines.index("=== Slowing down (last run vs. mean of the earlier ones) ===") + 2]
+    assert trend.split() == ["ws_a/ex1/plan", "2.00", "3.00", "+50%"]
+    assert lines[-1].split() == ["ws_a/ex1/plan", "2", "1", "F."]
+
+
+def test_session_records_failed_run_and_keeps_caller_trace(tmp_path: Path):
+    db_path = tmp_path / "history.sqlite"
+    tracing.enable()
+
+    with pytest.raises(typer.Exit):
+        with run_history.session(db_path, "plan-only", "all"):
+            with tracing.span("workspace", workspace="ws_a"):
+                raise typer.Exit(1)
+
+    assert [s.name for s in tracing.collect()] == ["workspace"]
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT mode, passed FROM runs").fetchall() == [("plan-only", 0)]
+        assert conn.execute("SELECT workspace, phase, passed FROM items").fetchall() == [
+            ("ws_a", "workspace", 0)
+        ]
+
+
+def test_session_traces_only_when_enabled(tmp_path: Path):
+    with run_history.session(None, "plan-only", "all"):
+        assert not tracing.enabled()
+    with run_history.session(tmp_path / "history.sqlite", "plan-only", "all"):
+        assert tracing.enabled()
+    assert not tracing.enabled()
@@ -1,12 +1,51 @@
 # path-sync copy -n sdlc
+import json
 from pathlib import Path
 
 import pytest
 import typer
 
+from shared import tf_plugin_cache, tf_retry
 from workspace import gen, models, plan, run
 
 
+@pytest.fixture(autouse=True)
+def plugin_cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    cache_dir = tmp_path / "plugin-cache"
+    monkeypatch.setenv(tf_retry.PLUGIN_CACHE_ENV, str(cache_dir))
+    monkeypatch.setenv(tf_plugin_cache.MAY_BREAK_LOCK_FILE_ENV, "true")
+    return cache_dir
+
+
+def _run_main(tests_dir: Path, **overrides) -> None:
+    """Call run.main directly; typer.Option defaults only apply through the CLI."""
+    kwargs = {
+        "mode": run.RunMode.PLAN_ONLY,
+        "include_examples": "all",
+        "auto_approve": False,
+        "skip_init": True,
+        "force_init": False,
+        "ws": "all",
+        "tests_dir": tests_dir,
+        "var_file": [],
+        "force_regen": False,
+        "show_uncovered": False,
+        "jobs": 1,
+        "shards": 1,
+        "incremental": False,
+        "skip_stage": [],
+        "write_plan_json": False,
+        "pytest_snapshots": False,
+        "trace": None,
+        "offline": False,
+        "use_fake_atlas": False,
+        "atlas_http": None,
+        "import_per_example": False,
+        "history": False,
+    }
+    run.main(**(kwargs | overrides))
+
+
 def test_provider_version_environment_controls_override_during_run(
     tmp_path: Path,
     monkeypatch: pytest.MonkeyPatch,
@@ -19,22 +58,12 @@ def test_provider_version_environment_controls_override_during_run(
     monkeypatch.setattr(run, "_resolve_example_dirs", lambda *_: [])
     monkeypatch.setattr(plan, "run_terraform_plan", lambda *_, **__: None)
 
-    def assert_override_state(_: Path):
+    def assert_override_state(_: Path, **__):
         assert f'version = "= {provider_version}"' in override_path.read_text()
 
     monkeypatch.setattr(plan, "run_terraform_init", assert_override_state)
 
-    run.main(
-        mode=run.RunMode.PLAN_ONLY,
-        include_examples="all",
-        auto_approve=False,
-        skip_init=False,
-        ws="all",
-        tests_dir=tmp_path,
-        var_file=[],
-        force_regen=False,
-        show_uncovered=False,
-    )
+    _run_main(tmp_path, skip_init=False)
 
     assert not override_path.exists()
 
@@ -52,17 +81,191 @@ def test_provider_version_error_is_reported(
     monkeypatch.setattr(run, "_resolve_example_dirs", lambda *_: [])
 
     with pytest.raises(typer.Exit) as exc_info:
-        run.main(
-            mode=run.RunMode.PLAN_ONLY,
-            include_examples="all",
-            auto_approve=False,
-            skip_init=True,
-            ws="all",
-            tests_dir=tmp_path,
-            var_file=[],
-            force_regen=False,
-            show_uncovered=False,
-        )
+        _run_main(tmp_path, skip_init=True)
 
     assert exc_info.value.exit_code == 1
     assert f"Error: Invalid exact provider version {provider_version!r}" in capsys.readouterr().err
+
+
+def _opts(mode: run.RunMode = run.RunMode.PLAN_ONLY) -> run.RunOptions:
+    return run.RunOptions(mode=mode, include_examples="all", auto_approve=False, skip_init=True)
+
+
+def test_workspace_worker_logs_to_workspace_and_reports_failure(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setenv(run.TF_DATA_DIR_ENV, "restored-after-test")
+    seen_data_dirs: list[str | None] = []
+
+    def fake_run_workspace(ws_dir: Path, opts: run.RunOptions):
+        seen_data_dirs.append(run.os.environ.get(run.TF_DATA_DIR_ENV))
+        typer.echo("planning...")
+        raise typer.Exit(1)
+
+    monkeypatch.setattr(run, "_run_workspace", fake_run_workspace)
+
+    result = run._run_workspace_worker(tmp_path, _opts())
+
+    assert not result.passed
+    assert result.error == "exit code 1"
+    assert seen_data_dirs == [None]
+    log = (tmp_path / run.RUN_LOG).read_text()
+    assert "planning..." in log
+    assert "Error: exit code 1" in log
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_gen_errors_exit_cleanly_in_serial_and_parallel_runs(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+    jobs: int,
+):
+    monkeypatch.setattr(models, "resolve_workspaces", lambda *_: [tmp_path / "a", tmp_path / "b"])
+
+    def fail_gen(ws_dir: Path, **_):
+        raise ValueError(f"bad config in {ws_dir.name}")
+
+    monkeypatch.setattr(gen, "process_workspace", fail_gen)
+
+    with pytest.raises(typer.Exit) as exc_info:
+        _run_main(tmp_path, jobs=jobs)
+
+    assert exc_info.value.exit_code == 1
+    assert "Error: bad config in a" in capsys.readouterr().err
+
+
+def test_report_results_exit_code(capsys: pytest.CaptureFixture[str]):
+    ok = run.WsResult(name="workspace_a", passed=True, duration=1.0)
+    failed = run.WsResult(name="workspace_b", passed=False, duration=2.0, error="exit code 1")
+
+    assert run.report_results([ok]) == 0
+    assert run.report_results([ok, failed]) == 1
+    out = capsys.readouterr().out
+    assert "1/2 workspaces passed" in out
+    assert "FAIL workspace_b" in out
+
+
+@pytest.fixture()
+def pipeline_calls(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> list[str]:
+    calls: list[str] = []
+    monkeypatch.setattr(models, "resolve_workspaces", lambda *_: [tmp_path])
+    monkeypatch.setattr(gen, "process_workspace", lambda *_, **__: None)
+    monkeypatch.setattr(run, "_resolve_example_dirs", lambda *_: [])
+    monkeypatch.setattr(run.parallelism, "record_plan", lambda *_: None)
+    stubs = {
+        (plan, "run_terraform_init"): "init",
+        (plan, "run_terraform_plan"): "plan",
+        (plan, "run_terraform_apply_plan"): "apply-plan",
+        (plan, "run_terraform_apply"): "apply",
+        (run.reg, "process_workspace"): "snapshot",
+        (run.output_assertions, "process_workspace"): "check-outputs",
+        (run.import_validation, "process_workspace"): "import",
+    }
+    for (module, name), call in stubs.items():
+        monkeypatch.setattr(module, name, lambda *_, call=call, **__: calls.append(call))
+    return calls
+
+
+def test_pipeline_runs_stages_once_and_applies_saved_plan(
+    tmp_path: Path, pipeline_calls: list[str]
+):
+    _run_main(tmp_path, mode=run.RunMode.PIPELINE, skip_init=False, auto_approve=True)
+
+    assert pipeline_calls == ["init", "plan", "snapshot", "apply-plan", "check-outputs", "import"]
+
+
+def test_pipeline_skip_stages(tmp_path: Path, pipeline_calls: list[str]):
+    skip = [run.PipelineStage.SNAPSHOT, run.PipelineStage.APPLY]
+    _run_main(tmp_path, mode=run.RunMode.PIPELINE, skip_stage=skip)
+
+    assert pipeline_calls == ["plan", "check-outputs", "import"]
+
+
+@pytest.mark.parametrize(
+    ("overrides", "message"),
+    [
+        ({"mode": run.RunMode.PIPELINE}, "pass --auto-approve or --skip-stage apply"),
+        ({"skip_stage": [run.PipelineStage.APPLY]}, "--skip-stage is only supported"),
+        (
+            {"mode": run.RunMode.PIPELINE, "auto_approve": True, "incremental": True},
+            "--incremental is only supported",
+        ),
+        (
+            {"mode": run.RunMode.PIPELINE, "skip_stage": [run.PipelineStage.PLAN]},
+            "skip apply too or keep the plan stage",
+        ),
+    ],
+)
+def test_pipeline_option_errors(
+    tmp_path: Path,
+    pipeline_calls: list[str],
+    capsys: pytest.CaptureFixture[str],
+    overrides: dict,
+    message: str,
+):
+    with pytest.raises(typer.Exit):
+        _run_main(tmp_path, **overrides)
+
+    assert message in capsys.readouterr().err
+    assert pipeline_calls == []
+
+
+@pytest.mark.parametrize(
+    ("mode", "write_plan_json", "expected_write"),
+    [
+        (run.RunMode.PLAN_SNAPSHOT_TEST, False, False),
+        (run.RunMode.PLAN_SNAPSHOT_TEST, True, True),
+        (run.RunMode.PLAN_ONLY, False, True),
+    ],
+)
+def test_plan_is_handed_to_snapshot_stage_in_memory(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    mode: run.RunMode,
+    write_plan_json: bool,
+    expected_write: bool,
+):
+    plan_data = {"planned_values": {"root_module": {}}}
+    writes: list[bool] = []
+    received: list[dict | None] = []
+    monkeypatch.setattr(models, "resolve_workspaces", lambda *_: [tmp_path])
+    monkeypatch.setattr(gen, "process_workspace", lambda *_, **__: None)
+    monkeypatch.setattr(run, "_resolve_example_dirs", lambda *_: [])
+
+    def fake_plan(*_, write_json: bool, **__):
+        writes.append(write_json)
+        return plan_data
+
+    monkeypatch.setattr(plan, "run_terraform_plan", fake_plan)
+    monkeypatch.setattr(
+        run.reg, "process_workspace", lambda *_, plan_data, **__: received.append(plan_data)
+    )
+
+    _run_main(tmp_path, mode=mode, write_plan_json=write_plan_json)
+
+    assert writes == [expected_write]
+    assert received == ([plan_data] if mode == run.RunMode.PLAN_SNAPSHOT_TEST else [])
+
+
+def test_trace_records_workspace_phases(tmp_path: Path, pipeline_calls: list[str]):
+    trace_path = tmp_path / "trace.json"
+
+    _run_main(tmp_path, mode=run.RunMode.PLAN_SNAPSHOT_TEST, trace=trace_path)
+
+    events = json.loads(trace_path.read_text())["traceEvents"]
+    by_name = {e["name"]: e for e in events}
+    assert {"run", "gen", "workspace"} <= by_name.keys()
+    assert by_name["workspace"]["args"]["workspace"] == tmp_path.name
+    assert pipeline_calls == ["plan", "snapshot"]
+
+
+@pytest.mark.parametrize(
+    ("include_examples", "expected"),
+    [("a", ["module.ex_a"]), ("a,b", []), ("all", []), ("none", [])],
+)
+def test_targets_follow_include_examples(tmp_path: Path, include_examples: str, expected: list):
+    (tmp_path / models.WORKSPACE_CONFIG_FILE).write_text(
+        "examples:\n  - name: a\n  - name: b\nvar_groups: {}\n"
+    )
+    assert run._targets(tmp_path, include_examples) == expected
@@ -0,0 +1,192 @@
+# path-sync copy -n sdlc
+"""Plan a workspace as N example shards and merge the shard plans into one plan.json.
+
+Each shard is a copy of the workspace root (all `*.tf` and auto-loaded tfvars) under
+`<workspace>/.shards/shard_NN/` with a `modules.generated.tf` holding only its subset of
+examples (plus the offline `terraform test` file, see gen.OFFLINE_TFTEST). Shards are
+initialized and planned concurrently without state, so sharding is limited to the plan
+modes.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import typer
+
+from workspace import gen, models, plan, plan_cache, tracing
+
+SHARDS_DIR = ".shards"
+AUTO_TFVARS_GLOBS = (
+    "terraform.tfvars",
+    "*.auto.tfvars",
+    "terraform.tfvars.json",
+    "*.auto.tfvars.json",
+)
+
+
+def split_examples(examples: list[models.Example], shards: int) -> list[list[models.Example]]:
+    """Round-robin examples into at most `shards` non-empty groups, keeping config order."""
+    return [group for i in range(shards) if (group := examples[i::shards])]
+
+
+def shard_dir(ws_dir: Path, index: int) -> Path:
+    return ws_dir / SHARDS_DIR / f"shard_{index:02d}"
+
+
+def prepare_shard(
+    ws_dir: Path, config: models.WsConfig, examples: list[models.Example], index: int
+) -> Path:
+    return copy_workspace(ws_dir, config, examples, shard_dir(ws_dir, index))
+
+
+def copy_workspace(
+    ws_dir: Path, config: models.WsConfig, examples: list[models.Example], dest: Path
+) -> Path:
+    """Copy the workspace root into `dest` with a `modules.generated.tf` for `examples` only.
+
+    Files a reused `dest` kept from an earlier copy are removed first, except `.terraform/`
+    and the lock file, so terraform does not load ones since removed from the workspace.
+    """
+    dest.mkdir(parents=True, exist_ok=True)
+    patterns = ("*.tf", gen.OFFLINE_TFTEST, *AUTO_TFVARS_GLOBS)
+    for pattern in patterns:
+        for stale in dest.glob(pattern):
+            stale.unlink()
+    for pattern in patterns:
+        for src in ws_dir.glob(pattern):
+            if src.name != gen.MODULES_GENERATED_TF:
+                shutil.copy2(src, dest / src.name)
+    rel_examples = Path(os.path.relpath(models.REPO_ROOT / gen.EXAMPLES_DIR_NAME, dest))
+    content = gen.generate_modules_tf(config, examples, dest, rel_examples.as_posix())
+    if content:
+        (dest / gen.MODULES_GENERATED_TF).write_text(content)
+    return dest
+
+
+def absolute_var_files(ws_dir: Path, var_files: list[Path]) -> list[Path]:
+    # terraform resolves relative -var-file paths against its cwd, which is the workspace.
+    return [vf if vf.is_absolute() else (ws_dir / vf).resolve() for vf in var_files]
+
+
+def _plan_shard(
+    ws_dir: Path,
+    dest: Path,
+    var_files: list[Path],
+    skip_init: bool,
+    force_init: bool,
+    parallelism: int | None,
+    offline: bool,
+) -> dict[str, Any]:
+    # Shard threads do not inherit the workspace attribute of the caller's span.
+    with tracing.span("plan shard", workspace=ws_dir.name, shard=dest.name):
+        if not skip_init:
+            plan.run_terraform_init(dest, force=force_init)
+        if offline:
+            return plan.run_terraform_test_plan(dest, var_files, skip_init=True, write_json=False)
+        # Rate limits count against the workspace, whose next run resolves parallelism.
+        return plan.run_terraform_plan(
+            dest,
+            var_files,
+            skip_init=True,
+            write_json=False,
+            parallelism=parallelism,
+            record_dir=ws_dir,
+            write_cache=False,
+        )
+
+
+def _merge_module(target: dict[str, Any], module: dict[str, Any], seen: set[str]) -> None:
+    for resource in module.get("resources", []):
+        if resource["address"] not in seen:
+            seen.add(resource["address"])
+            target.setdefault("resources", []).append(resource)
+    children = {c.get("address"): c for c in target.get("child_modules", [])}
+    for child in module.get("child_modules", []):
+        if existing := children.get(child.get("address")):
+            _merge_module(existing, child, seen)
+            continue
+        merged_child = {k: v for k, v in child.items() if k not in ("resources", "child_modules")}
+        _merge_module(merged_child, child, seen)
+        target.setdefault("child_modules", []).append(merged_child)
+        children[child.get("address")] = merged_child
+
+
+def merge_plans(plans: list[dict[str, Any]]) -> dict[str, Any]:
+    """Combine shard plans; resources shared by every shard (e.g. workspace root) are kept once."""
+    if not plans:
+        return {}
+    first = plans[0]
+    merged: dict[str, Any] = {
+        k: first[k] for k in ("format_version", "terraform_version", "variables") if k in first
+    }
+    root: dict[str, Any] = {}
+    outputs: dict[str, Any] = {}
+    seen_resources: set[str] = set()
+    # Keyed by address and deposed object, so deposed changes are kept next to the current one.
+    changes: dict[tuple[str, str], dict[str, Any]] = {}
+    output_changes: dict[str, Any] = {}
+    for p in plans:
+        planned = p.get("planned_values", {})
+        _merge_module(root, planned.get("root_module", {}), seen_resources)
+        outputs.update(planned.get("outputs", {}))
+        for rc in p.get("resource_changes", []):
+            changes.setdefault((rc["address"], rc.get("deposed", "")), rc)
+        output_changes.update(p.get("output_changes", {}))
+    merged["planned_values"] = {"outputs": outputs, "root_module": root}
+    merged["resource_changes"] = list(changes.values())
+    merged["output_changes"] = output_changes
+    return merged
+
+
+def run_sharded_plan(
+    ws_dir: Path,
+    include_examples: str,
+    var_files: list[Path],
+    shards: int,
+    skip_init: bool = False,
+    force_init: bool = False,
+    write_json: bool = True,
+    parallelism: int | None = None,
+    offline: bool = False,
+) -> dict[str, Any]:
+    """Plan `include_examples` in `shards` concurrent shards and return the merged plan.
+
+    The merged plan is written to plan.json only if `write_json`. `parallelism` is split
+    across the shards so the total stays the same as for a single plan.
+    """
+    config = models.parse_ws_config(ws_dir / models.WORKSPACE_CONFIG_FILE)
+    examples = gen.parse_include_examples(include_examples, config)
+    groups = split_examples(examples, shards)
+    if not groups:
+        raise ValueError(f"No examples selected in {ws_dir.name}; nothing to shard")
+    typer.echo(f"Planning {len(examples)} examples in {len(groups)} shards...")
+    shard_dirs = [prepare_shard(ws_dir, config, group, i) for i, group in enumerate(groups)]
+    abs_var_files = absolute_var_files(ws_dir, var_files)
+    if parallelism is not None:
+        parallelism = max(1, parallelism // len(shard_dirs))
+    with ThreadPoolExecutor(max_workers=len(shard_dirs)) as executor:
+        plans = list(
+            executor.map(
+                lambda d: _plan_shard(
+                    ws_dir, d, abs_var_files, skip_init, force_init, parallelism, offline
+                ),
+                shard_dirs,
+            )
+        )
+    merged = merge_plans(plans)
+    plan_json_path = ws_dir / plan.PLAN_JSON
+    if write_json:
+        plan_json_path.write_text(json.dumps(merged))
+        typer.echo(f"Merged {len(plans)} shard plans into {plan.PLAN_JSON}")
+        plan_cache.write(ws_dir, merged)
+    else:
+        plan_json_path.unlink(missing_ok=True)
+        plan_cache.invalidate(ws_dir)
+        typer.echo(f"Merged {len(plans)} shard plans")
+    return merged
@@ -0,0 +1,130 @@
+# path-sync copy -n sdlc
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from workspace import gen, models, reg, shard
+
+
+def _examples(*names: str) -> list[models.Example]:
+    return [models.Example(name=n) for n in names]
+
+
+def test_split_examples_round_robin():
+    groups = shard.split_examples(_examples("a", "b", "c", "d", "e"), 2)
+    assert [[ex.identifier for ex in g] for g in groups] == [["a", "c", "e"], ["b", "d"]]
+
+
+def test_split_examples_drops_empty_shards():
+    groups = shard.split_examples(_examples("a", "b"), 4)
+    assert [[ex.identifier for ex in g] for g in groups] == [["a"], ["b"]]
+
+
+def test_prepare_shard_copies_workspace_and_subsets_modules(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(models, "REPO_ROOT", tmp_path)
+    for name in ("a", "b"):
+        (tmp_path / gen.EXAMPLES_DIR_NAME / name).mkdir(parents=True)
+    ws_dir = tmp_path / "tests" / "workspace_x"
+    ws_dir.mkdir(parents=True)
+    (ws_dir / "main.tf").write_text("# main\n")
+    (ws_dir / gen.MODULES_GENERATED_TF).write_text("# all examples\n")
+    (ws_dir / "dev.auto.tfvars").write_text('org_id = "o"\n')
+    config = models.WsConfig(examples=_examples("a", "b"), var_groups={})
+
+    dest = shard.prepare_shard(ws_dir, config, config.examples[1:], 1)
+
+    assert dest == ws_dir / shard.SHARDS_DIR / "shard_01"
+    assert (dest / "main.tf").read_text() == "# main\n"
+    assert (dest / "dev.auto.tfvars").exists()
+    modules_tf = (dest / gen.MODULES_GENERATED_TF).read_text()
+    assert 'module "ex_b"' in modules_tf
+    assert 'module "ex_a"' not in modules_tf
+    assert 'source = "../../../../examples/b"' in modules_tf
+
+
+def test_copy_workspace_removes_files_gone_from_workspace(tmp_path: Path):
+    ws_dir = tmp_path / "workspace_x"
+    ws_dir.mkdir()
+    (ws_dir / "main.tf").write_text("# main\n")
+    dest = ws_dir / shard.SHARDS_DIR / "shard_00"
+    dest.mkdir(parents=True)
+    for name in ("old.tf", "dev.auto.tfvars", "terraform.tfvars.json", gen.OFFLINE_TFTEST):
+        (dest / name).write_text("# stale\n")
+    (dest / ".terraform.lock.hcl").write_text("# lock\n")
+    (dest / ".terraform").mkdir()
+    config = models.WsConfig(examples=[], var_groups={})
+
+    shard.copy_workspace(ws_dir, config, [], dest)
+
+    assert sorted(p.name for p in dest.iterdir()) == [
+        ".terraform",
+        ".terraform.lock.hcl",
+        "main.tf",
+    ]
+
+
+def _plan(example_id: str) -> dict:
+    return {
+        "format_version": "1.2",
+        "planned_values": {
+            "outputs": {f"ex_{example_id}": {"sensitive": False}},
+            "root_module": {
+                "resources": [{"address": "random_string.suffix", "values": {"length": 6}}],
+                "child_modules": [
+                    {
+                        "address": f"module.ex_{example_id}",
+                        "resources": [
+                            {
+                                "address": f"module.ex_{example_id}.mongodbatlas_project.this",
+                                "values": {"name": example_id},
+                            }
+                        ],
+                    }
+                ],
+            },
+        },
+        "resource_changes": [
+            {"address": "random_string.suffix", "change": {"actions": ["create"]}},
+            {
+                "address": f"module.ex_{example_id}.mongodbatlas_project.this",
+                "change": {"actions": ["create"]},
+            },
+        ],
+    }
+
+
+def test_merge_plans_behaves_like_single_plan():
+    merged = shard.merge_plans([_plan("a"), _plan("b")])
+
+    resources = reg.extract_planned_resources(merged)
+    assert resources == {
+        "random_string.suffix": {"length": 6},
+        "module.ex_a.mongodbatlas_project.this": {"name": "a"},
+        "module.ex_b.mongodbatlas_project.this": {"name": "b"},
+    }
+    assert [rc["address"] for rc in merged["resource_changes"]] == [
+        "random_string.suffix",
+        "module.ex_a.mongodbatlas_project.this",
+        "module.ex_b.mongodbatlas_project.this",
+    ]
+    assert set(merged["planned_values"]["outputs"]) == {"ex_a", "ex_b"}
+    assert merged["format_version"] == "1.2"
+
+
+def test_merge_plans_keeps_deposed_changes():
+    deposed = {
+        "address": "random_string.suffix",
+        "deposed": "00a1",
+        "change": {"actions": ["delete"]},
+    }
+    plan_a = _plan("a")
+    plan_a["resource_changes"].append(deposed)
+    merged = shard.merge_plans([plan_a, _plan("b")])
+    suffix_changes = [
+        rc for rc in merged["resource_changes"] if rc["address"] == "random_string.suffix"
+    ]
+    assert suffix_changes == [_plan("a")["resource_changes"][0], deposed]
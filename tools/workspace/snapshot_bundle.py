@@ -0,0 +1,197 @@
+# path-sync copy -n sdlc
+"""Single-file plan snapshot bundles (`snapshot_layout: bundle` in the workspace config).
+
+A bundle holds every snapshot of a workspace, sorted by relpath (the path the snapshot
+has in the per-file layout). It starts with an index of `<offset> <length> <relpath>`
+lines, in bytes counted from the end of the index, so one snapshot can be read with a
+seek. The snapshots follow as-is, each after a `### <relpath>` line for readable diffs:
+
+    # plan snapshot bundle v1 - generated by workspace, do not edit manually
+    0 29 01_mongodbatlas_project_this.yaml
+    # end index
+    ### 01_mongodbatlas_project_this.yaml
+    name: project
+    ...
+
+`python -m workspace.snapshot_bundle --to bundle|files` converts plan_snapshots/.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import typer
+
+from workspace import gen, models
+
+app = typer.Typer()
+
+# Next to gen.PLAN_SNAPSHOTS_DIR and gen.PLAN_SNAPSHOTS_ACTUAL_DIR in the workspace.
+EXPECTED_BUNDLE = "plan_snapshots.bundle"
+ACTUAL_BUNDLE = "plan_snapshots_actual.bundle"
+# snapshot_manifest's file in each layout (inside plan_snapshots/ or next to the bundle);
+# the manifest does not depend on the layout, so `convert` moves it along.
+FILES_MANIFEST = "manifest.json"
+BUNDLE_MANIFEST = "plan_snapshots.manifest.json"
+HEADER = "# plan snapshot bundle v1 - generated by workspace, do not edit manually\n"
+INDEX_END = "# end index\n"
+SECTION_PREFIX = "### "
+
+
+class BundleError(ValueError):
+    pass
+
+
+def render(snapshots: dict[str, str]) -> str:
+    index: list[str] = []
+    sections: list[str] = []
+    offset = 0
+    for relpath in sorted(snapshots):
+        if "\n" in relpath:
+            raise BundleError(f"snapshot path with a newline: {relpath!r}")
+        marker = f"{SECTION_PREFIX}{relpath}\n"
+        content = snapshots[relpath]
+        offset += len(marker.encode())
+        length = len(content.encode())
+        index.append(f"{offset} {length} {relpath}\n")
+        sections.extend([marker, content])
+        offset += length
+    return "".join([HEADER, *index, INDEX_END, *sections])
+
+
+def _read_index(f) -> dict[str, tuple[int, int]]:
+    """Absolute (offset, length) per relpath; leaves `f` (binary) after the index."""
+    if f.readline().decode() != HEADER:
+        raise BundleError(f"{f.name} is not a plan snapshot bundle")
+    entries: dict[str, tuple[int, int]] = {}
+    for raw in f:
+        line = raw.decode()
+        if line == INDEX_END:
+            body_start = f.tell()
+            return {path: (body_start + off, length) for path, (off, length) in entries.items()}
+        offset, length, relpath = line.rstrip("\n").split(" ", 2)
+        entries[relpath] = (int(offset), int(length))
+    raise BundleError(f"{f.name} has no index end")
+
+
+def read_index(path: Path) -> dict[str, tuple[int, int]]:
+    with path.open("rb") as f:
+        return _read_index(f)
+
+
+def read_snapshot(path: Path, relpath: str) -> str | None:
+    """One snapshot of the bundle at `path`; None when the bundle or snapshot is missing."""
+    if not path.is_file():
+        return None
+    with path.open("rb") as f:
+        location = _read_index(f).get(relpath)
+        if location is None:
+            return None
+        f.seek(location[0])
+        return f.read(location[1]).decode()
+
+
+def read_bundle(path: Path) -> dict[str, str]:
+    """All snapshots of the bundle at `path` ({} when it does not exist)."""
+    if not path.is_file():
+        return {}
+    with path.open("rb") as f:
+        index = _read_index(f)
+        body_start = f.tell()
+        body = f.read()
+    return {
+        relpath: body[offset - body_start : offset - body_start + length].decode()
+        for relpath, (offset, length) in sorted(index.items())
+    }
+
+
+def write_bundle(path: Path, snapshots: dict[str, str]) -> bool:
+    """Write the bundle unless `path` already holds it; returns whether it was written."""
+    data = render(snapshots).encode()
+    if path.is_file() and path.stat().st_size == len(data) and path.read_bytes() == data:
+        return False
+    path.write_bytes(data)
+    return True
+
+
+def read_snapshot_dir(snapshot_dir: Path) -> dict[str, str]:
+    """Snapshots of a per-file layout directory, keyed by their path relative to it."""
+    return {
+        path.relative_to(snapshot_dir).as_posix(): path.read_text()
+        for path in sorted(snapshot_dir.rglob("*.yaml"))
+    }
+
+
+def write_snapshot_dir(snapshot_dir: Path, snapshots: dict[str, str]) -> None:
+    for relpath, content in snapshots.items():
+        path = snapshot_dir / relpath
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+
+def convert(ws_dir: Path, to: models.SnapshotLayout) -> int:
+    """Move the expected snapshots of `ws_dir` into the `to` layout; returns the count.
+
+    The source is removed afterwards so only one layout holds expected snapshots. Nothing
+    is written when the source layout holds no snapshots (e.g. already converted), and
+    BundleError is raised when both layouts hold some.
+    """
+    snapshot_dir = ws_dir / gen.PLAN_SNAPSHOTS_DIR
+    bundle = ws_dir / EXPECTED_BUNDLE
+    files_manifest = snapshot_dir / FILES_MANIFEST
+    bundle_manifest = ws_dir / BUNDLE_MANIFEST
+    files = read_snapshot_dir(snapshot_dir) if snapshot_dir.is_dir() else {}
+    bundled = read_bundle(bundle)
+    snapshots, existing = (
+        (files, bundled) if to == models.SnapshotLayout.BUNDLE else (bundled, files)
+    )
+    if not snapshots:
+        return 0
+    if existing:
+        raise BundleError(
+            f"{ws_dir.name} has expected snapshots in both {gen.PLAN_SNAPSHOTS_DIR}/ and "
+            f"{EXPECTED_BUNDLE}; remove one of them first"
+        )
+    if to == models.SnapshotLayout.BUNDLE:
+        write_bundle(bundle, snapshots)
+        if files_manifest.is_file():
+            files_manifest.replace(bundle_manifest)
+        for relpath in snapshots:
+            (snapshot_dir / relpath).unlink()
+        for directory in [*sorted(snapshot_dir.rglob("*"), reverse=True), snapshot_dir]:
+            if directory.is_dir() and not any(directory.iterdir()):
+                directory.rmdir()
+    else:
+        write_snapshot_dir(snapshot_dir, snapshots)
+        bundle.unlink()
+        if bundle_manifest.is_file():
+            bundle_manifest.replace(files_manifest)
+    return len(snapshots)
+
+
+@app.command()
+def main(
+    to: models.SnapshotLayout = typer.Option(..., "--to", help="Target snapshot layout"),
+    ws: str = typer.Option("all", "--ws"),
+    tests_dir: Path = typer.Option(models.DEFAULT_TESTS_DIR, "--tests-dir"),
+) -> None:
+    try:
+        ws_dirs = models.resolve_workspaces(ws, tests_dir)
+    except ValueError as e:
+        typer.echo(f"Error: {e}", err=True)
+        raise typer.Exit(1)
+    for ws_dir in ws_dirs:
+        try:
+            count = convert(ws_dir, to)
+        except BundleError as e:
+            typer.echo(f"Error: {e}", err=True)
+            raise typer.Exit(1)
+        if count:
+            typer.echo(f"  Converted {count} snapshots of {ws_dir.name} to {to}")
+        else:
+            typer.echo(f"  Skipped {ws_dir.name}: no expected snapshots to convert to {to}")
+    typer.echo(f"Set `snapshot_layout: {to}` in each {models.WORKSPACE_CONFIG_FILE} to match.")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,104 @@
+# path-sync copy -n sdlc
+from __future__ import annotations
+
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from workspace import gen, models, snapshot_bundle
+
+SNAPSHOTS = {
+    "b/y_this.yaml": "name: ünï\n",
+    'a_x_this["k 1"].yaml': "name: a\ntags:\n- x\n",
+    "b/x_this.yaml": "",
+}
+
+
+def test_render_is_sorted_and_indexed(tmp_path: Path):
+    path = tmp_path / snapshot_bundle.EXPECTED_BUNDLE
+    assert snapshot_bundle.write_bundle(path, SNAPSHOTS)
+    assert not snapshot_bundle.write_bundle(path, dict(reversed(SNAPSHOTS.items())))
+    lines = path.read_text().splitlines()
+    assert lines[0] == snapshot_bundle.HEADER.rstrip("\n")
+    assert [line.split(" ", 2)[2] for line in lines[1:4]] == sorted(SNAPSHOTS)
+    assert snapshot_bundle.read_bundle(path) == SNAPSHOTS
+    for relpath, content in SNAPSHOTS.items():
+        assert snapshot_bundle.read_snapshot(path, relpath) == content
+    assert snapshot_bundle.read_snapshot(path, "missing.yaml") is None
+    assert snapshot_bundle.read_bundle(tmp_path / "none.bundle") == {}
+
+
+def test_read_rejects_other_files(tmp_path: Path):
+    path = tmp_path / "other.bundle"
+    path.write_text("name: a\n")
+    with pytest.raises(snapshot_bundle.BundleError, match="not a plan snapshot bundle"):
+        snapshot_bundle.read_bundle(path)
+
+
+def test_convert_round_trips_committed_snapshots(tmp_path: Path):
+    source = next(models.DEFAULT_TESTS_DIR.glob(f"*/{gen.PLAN_SNAPSHOTS_DIR}"))
+    ws_dir = tmp_path / "ws"
+    shutil.copytree(source, ws_dir / gen.PLAN_SNAPSHOTS_DIR)
+    original = snapshot_bundle.read_snapshot_dir(ws_dir / gen.PLAN_SNAPSHOTS_DIR)
+    (ws_dir / gen.PLAN_SNAPSHOTS_DIR / snapshot_bundle.FILES_MANIFEST).write_text("{}\n")
+
+    assert snapshot_bundle.convert(ws_dir, models.SnapshotLayout.BUNDLE) == len(original)
+    assert not (ws_dir / gen.PLAN_SNAPSHOTS_DIR).exists()
+    assert (ws_dir / snapshot_bundle.BUNDLE_MANIFEST).read_text() == "{}\n"
+    assert snapshot_bundle.read_bundle(ws_dir / snapshot_bundle.EXPECTED_BUNDLE) == original
+
+    assert snapshot_bundle.convert(ws_dir, models.SnapshotLayout.FILES) == len(original)
+    assert not (ws_dir / snapshot_bundle.EXPECTED_BUNDLE).exists()
+    assert snapshot_bundle.read_snapshot_dir(ws_dir / gen.PLAN_SNAPSHOTS_DIR) == original
+    assert (ws_dir / gen.PLAN_SNAPSHOTS_DIR / snapshot_bundle.FILES_MANIFEST).is_file()
+
+
+@pytest.mark.parametrize("to", list(models.SnapshotLayout))
+def test_convert_twice_keeps_snapshots(tmp_path: Path, to: models.SnapshotLayout):
+    ws_dir = tmp_path / "ws"
+    if to == models.SnapshotLayout.BUNDLE:
+        snapshot_bundle.write_snapshot_dir(ws_dir / gen.PLAN_SNAPSHOTS_DIR, SNAPSHOTS)
+    else:
+        ws_dir.mkdir()
+        snapshot_bundle.write_bundle(ws_dir / snapshot_bundle.EXPECTED_BUNDLE, SNAPSHOTS)
+
+    assert snapshot_bundle.convert(ws_dir, to) == len(SNAPSHOTS)
+    converted = {p: p.read_bytes() for p in ws_dir.rglob("*") if p.is_file()}
+    assert snapshot_bundle.convert(ws_dir, to) == 0
+    assert {p: p.read_bytes() for p in ws_dir.rglob("*") if p.is_file()} == converted
+
+
+def test_convert_refuses_when_both_layouts_hold_snapshots(tmp_path: Path):
+    snapshot_bundle.write_snapshot_dir(tmp_path / gen.PLAN_SNAPSHOTS_DIR, SNAPSHOTS)
+    snapshot_bundle.write_bundle(tmp_path / snapshot_bundle.EXPECTED_BUNDLE, {"old.yaml": "a\n"})
+    with pytest.raises(snapshot_bundle.BundleError, match="both"):
+        snapshot_bundle.convert(tmp_path, models.SnapshotLayout.BUNDLE)
+    assert snapshot_bundle.read_bundle(tmp_path / snapshot_bundle.EXPECTED_BUNDLE) == {
+        "old.yaml": "a\n"
+    }
+
+
+def test_generated_bundle_pytest_file(tmp_path: Path):
+    example = models.Example(
+        name="a", plan_regressions=[models.PlanRegression("x.this"), models.PlanRegression("y.z")]
+    )
+    config = models.WsConfig(
+        examples=[example], var_groups={}, snapshot_layout=models.SnapshotLayout.BUNDLE
+    )
+    (tmp_path / gen.TEST_PLAN_SNAPSHOT_PY).write_text(gen.generate_bundle_pytest_file(config))
+    actual = {"a/x_this.yaml": "name: x\n", "a/y_z.yaml": "name: ünï\n"}
+    snapshot_bundle.write_bundle(tmp_path / snapshot_bundle.ACTUAL_BUNDLE, actual)
+    expected_path = tmp_path / snapshot_bundle.EXPECTED_BUNDLE
+    snapshot_bundle.write_bundle(expected_path, {"a/x_this.yaml": "name: x\n"})
+
+    def run_pytest() -> int:
+        cmd = [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider"]
+        return subprocess.run([*cmd, gen.TEST_PLAN_SNAPSHOT_PY], cwd=tmp_path).returncode
+
+    assert run_pytest() == 1
+    # The generated writer must produce the same bytes as snapshot_bundle.render.
+    assert expected_path.read_text() == snapshot_bundle.render(actual)
+    assert run_pytest() == 0
@@ -0,0 +1,156 @@
+# path-sync copy -n sdlc
+"""Per-example content-hash cache for incremental plan-snapshot-test runs.
+
+An example's fingerprint covers its `*.tf`, the local modules it sources, the shared
+workspace `*.tf`, its var groups, the var files, the provider version and its workspace
+config (plan_regressions with their dump config). Entries live in
+`<workspace>/.plan_snapshot_cache/<example_id>.json`; deleting the directory only makes
+the next run plan every example again.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import typer
+
+from workspace import gen, models, plan, plan_cache, reg, snapshot_manifest
+
+CACHE_DIR = ".plan_snapshot_cache"
+# Bump when reg output changes for identical inputs (filtering, YAML emission).
+CACHE_VERSION = "1"
+# Generated per run/selection; not an input of any single example's plan.
+_WS_EXCLUDED_TF = {gen.MODULES_GENERATED_TF, plan.PROVIDER_VERSION_OVERRIDE_FILE}
+# Variable files in the workspace dir; a superset of those terraform loads without
+# -var-file (terraform.tfvars[.json], *.auto.tfvars[.json]).
+WS_TFVARS_PATTERNS = ("*.tfvars", "*.tfvars.json")
+
+
+@dataclass
+class CacheEntry:
+    fingerprint: str
+    files: dict[str, str]
+
+
+def _tf_dir_chunks(directory: Path, excluded: set[str]) -> Iterator[bytes]:
+    for tf_file in sorted(directory.glob("*.tf")):
+        if tf_file.name in excluded:
+            continue
+        # Hash the provider-stripped form so runs inside strip_provider_blocks match.
+        content = plan.PROVIDER_BLOCK_PATTERN.sub("", tf_file.read_text()).rstrip()
+        yield f"{tf_file}\n{content}\n".encode()
+
+
+def example_fingerprint(
+    ws_dir: Path,
+    config: models.WsConfig,
+    example: models.Example,
+    var_files: list[Path],
+    provider_version: str | None,
+) -> str:
+    digest = hashlib.sha256(f"v{CACHE_VERSION}\n".encode())
+    digest.update(repr(example).encode())
+    digest.update(repr(config.vars_for_example(example)).encode())
+    digest.update(f"provider_version={provider_version or ''}\n".encode())
+    lock_file = ws_dir / plan.LOCK_FILE
+    digest.update(lock_file.read_bytes() if lock_file.exists() else b"<no lock file>")
+    for vf in var_files:
+        path = vf if vf.is_absolute() else ws_dir / vf
+        digest.update(str(vf).encode())
+        digest.update(path.read_bytes() if path.exists() else b"<missing>")
+    for pattern in WS_TFVARS_PATTERNS:
+        for tfvars in sorted(ws_dir.glob(pattern)):
+            digest.update(f"{tfvars.name}\n".encode())
+            digest.update(tfvars.read_bytes())
+    for chunk in _tf_dir_chunks(ws_dir, _WS_EXCLUDED_TF):
+        digest.update(chunk)
+    example_dir = example.example_path(models.REPO_ROOT / gen.EXAMPLES_DIR_NAME)
+    for directory in [example_dir.resolve(), *plan.local_module_dirs(example_dir)]:
+        for chunk in _tf_dir_chunks(directory, set()):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _entry_path(ws_dir: Path, example_id: str) -> Path:
+    return ws_dir / CACHE_DIR / f"{example_id}.json"
+
+
+def load(ws_dir: Path, example_id: str) -> CacheEntry | None:
+    path = _entry_path(ws_dir, example_id)
+    if not path.exists():
+        return None
+    try:
+        data = json.loads(path.read_text())
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict) or not {"fingerprint", "files"} <= data.keys():
+        return None
+    return CacheEntry(fingerprint=data["fingerprint"], files=data["files"])
+
+
+def store(ws_dir: Path, example_id: str, entry: CacheEntry) -> None:
+    path = _entry_path(ws_dir, example_id)
+    path.parent.mkdir(exist_ok=True)
+    path.write_text(json.dumps({"fingerprint": entry.fingerprint, "files": entry.files}))
+
+
+def partition(
+    ws_dir: Path,
+    config: models.WsConfig,
+    examples: list[models.Example],
+    var_files: list[Path],
+    provider_version: str | None,
+) -> tuple[list[models.Example], dict[str, CacheEntry]]:
+    """Split `examples` into changed ones and cache entries (by identifier) for the rest."""
+    changed: list[models.Example] = []
+    unchanged: dict[str, CacheEntry] = {}
+    for ex in examples:
+        fingerprint = example_fingerprint(ws_dir, config, ex, var_files, provider_version)
+        entry = load(ws_dir, ex.identifier)
+        if entry and entry.fingerprint == fingerprint:
+            unchanged[ex.identifier] = entry
+        else:
+            changed.append(ex)
+    return changed, unchanged
+
+
+def process_workspace(
+    ws_dir: Path,
+    config: models.WsConfig,
+    changed: list[models.Example],
+    unchanged: dict[str, CacheEntry],
+    var_files: list[Path],
+    provider_version: str | None,
+    force_regen: bool,
+    plan_data: dict[str, Any] | None = None,
+    use_pytest: bool = False,
+) -> None:
+    """Dump `changed` examples from the plan, reuse cached output for the rest, run tests.
+
+    `plan_data` is the plan parsed by the caller; without it plan.json is read.
+    """
+    resources: dict[str, dict] = {}
+    if plan_data is not None:
+        resources = reg.extract_planned_resources(plan_data)
+    elif changed:
+        prefixes = tuple(f"module.ex_{ex.identifier}." for ex in changed)
+        resources = plan_cache.read_planned_resources(ws_dir, prefixes)
+        if resources is None:
+            resources = reg.read_planned_resources(ws_dir / reg.PLAN_JSON, prefixes)
+    reuse = {path: content for entry in unchanged.values() for path, content in entry.files.items()}
+    typer.echo(f"  Incremental: {len(changed)} changed, {len(unchanged)} reused from cache")
+    manifest = snapshot_manifest.load(ws_dir, config)
+    dumped = reg.write_actual_snapshots(
+        ws_dir, config, resources, changed, reuse, manifest, force_regen
+    )
+    for ex in changed:
+        # Recomputed after init, which may have rewritten the lock file.
+        fingerprint = example_fingerprint(ws_dir, config, ex, var_files, provider_version)
+        store(ws_dir, ex.identifier, CacheEntry(fingerprint, dumped.get(ex.identifier, {})))
+    snapshots = reuse | reg.flatten_snapshots(dumped)
+    reg.check_snapshots(ws_dir, config, snapshots, force_regen, use_pytest, manifest)
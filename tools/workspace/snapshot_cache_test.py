@@ -0,0 +1,149 @@
+# path-sync copy -n sdlc
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+from workspace import gen, models, plan, reg, snapshot_cache
+
+REGRESSION = "mongodbatlas_project.this"
+
+
+@pytest.fixture()
+def ws_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setattr(models, "REPO_ROOT", tmp_path)
+    (tmp_path / "main.tf").write_text("# root module\n")
+    for name in ("a", "b"):
+        example_dir = tmp_path / gen.EXAMPLES_DIR_NAME / name
+        example_dir.mkdir(parents=True)
+        (example_dir / "main.tf").write_text('module "p" {\n  source = "../.."\n}\n')
+        (example_dir / "versions.tf").write_text('terraform {}\n\nprovider "mongodbatlas" {}\n')
+    ws = tmp_path / "tests" / "workspace_x"
+    ws.mkdir(parents=True)
+    (ws / "main.tf").write_text("# workspace\n")
+    return ws
+
+
+def _config(dump: models.DumpConfig | None = None) -> models.WsConfig:
+    examples = [
+        models.Example(
+            name=name,
+            var_groups=[name],
+            plan_regressions=[models.PlanRegression(REGRESSION, dump or models.DumpConfig())],
+        )
+        for name in ("a", "b")
+    ]
+    var_groups = {
+        name: [models.WsVar(name="project_name", module_value=f'"{name}"')] for name in "ab"
+    }
+    return models.WsConfig(examples=examples, var_groups=var_groups)
+
+
+def _fingerprints(ws_dir: Path, config: models.WsConfig) -> list[str]:
+    return [
+        snapshot_cache.example_fingerprint(ws_dir, config, ex, [], None) for ex in config.examples
+    ]
+
+
+@pytest.mark.parametrize(
+    "changed_file",
+    ["examples/a/main.tf", "main.tf"],
+    ids=["example", "root-module"],
+)
+def test_fingerprint_tracks_example_sources(ws_dir: Path, changed_file: str):
+    config = _config()
+    before = _fingerprints(ws_dir, config)
+    target = models.REPO_ROOT / changed_file
+    target.write_text(target.read_text() + "# changed\n")
+    after = _fingerprints(ws_dir, config)
+    assert after[0] != before[0]
+    if changed_file == "main.tf":
+        assert after[1] != before[1]
+    else:
+        assert after[1] == before[1]
+
+
+def test_fingerprint_tracks_var_groups_and_dump_config(ws_dir: Path):
+    config = _config()
+    before = _fingerprints(ws_dir, config)
+    config.var_groups["a"][0].module_value = '"renamed"'
+    assert _fingerprints(ws_dir, config) == [_fingerprints(ws_dir, config)[0], before[1]]
+    assert _fingerprints(ws_dir, config)[0] != before[0]
+    redacting = _config(models.DumpConfig(models.SkipLines(redact_attributes=["name"])))
+    assert _fingerprints(ws_dir, redacting)[0] != before[0]
+
+
+def test_fingerprint_ignores_provider_stripping(ws_dir: Path):
+    config = _config()
+    before = _fingerprints(ws_dir, config)
+    example_dirs = [
+        ex.example_path(models.REPO_ROOT / gen.EXAMPLES_DIR_NAME) for ex in config.examples
+    ]
+    with plan.strip_provider_blocks(example_dirs):
+        assert _fingerprints(ws_dir, config) == before
+
+
+def test_fingerprint_tracks_var_files(ws_dir: Path):
+    config = _config()
+    (ws_dir / "dev.tfvars").write_text('org_id = "1"\n')
+    ex = config.examples[0]
+    before = snapshot_cache.example_fingerprint(ws_dir, config, ex, [Path("dev.tfvars")], None)
+    (ws_dir / "dev.tfvars").write_text('org_id = "2"\n')
+    after = snapshot_cache.example_fingerprint(ws_dir, config, ex, [Path("dev.tfvars")], None)
+    assert before != after
+
+
+@pytest.mark.parametrize("name", ["terraform.tfvars", "dev.auto.tfvars", "x.auto.tfvars.json"])
+def test_fingerprint_tracks_auto_loaded_var_files(ws_dir: Path, name: str):
+    config = _config()
+    before = _fingerprints(ws_dir, config)
+    (ws_dir / name).write_text('org_id = "1"\n')
+    changed = _fingerprints(ws_dir, config)
+    assert changed != before
+    (ws_dir / name).write_text('org_id = "2"\n')
+    assert _fingerprints(ws_dir, config) != changed
+
+
+def _write_plan(ws_dir: Path, example_ids: list[str]) -> None:
+    resources = [
+        {"address": f"module.ex_{ex_id}.{REGRESSION}", "values": {"name": ex_id}}
+        for ex_id in example_ids
+    ]
+    plan_json = {"planned_values": {"root_module": {"resources": resources}}}
+    (ws_dir / reg.PLAN_JSON).write_text(json.dumps(plan_json))
+
+
+def test_process_workspace_reuses_unchanged_examples(ws_dir: Path, monkeypatch: pytest.MonkeyPatch):
+    checked: list[dict[str, str]] = []
+    monkeypatch.setattr(reg, "check_snapshots", lambda _ws, _cfg, snaps, *_: checked.append(snaps))
+    config = _config()
+    actual_dir = ws_dir / reg.PLAN_SNAPSHOTS_ACTUAL_DIR
+
+    changed, unchanged = snapshot_cache.partition(ws_dir, config, config.examples, [], None)
+    assert [ex.identifier for ex in changed] == ["a", "b"]
+    _write_plan(ws_dir, ["a", "b"])
+    snapshot_cache.process_workspace(ws_dir, config, changed, unchanged, [], None, False)
+    first_run = {p.name: p.read_text() for p in actual_dir.iterdir()}
+
+    example_b = models.REPO_ROOT / gen.EXAMPLES_DIR_NAME / "b" / "main.tf"
+    example_b.write_text(example_b.read_text() + "# changed\n")
+    for path in actual_dir.iterdir():
+        path.unlink()
+    changed, unchanged = snapshot_cache.partition(ws_dir, config, config.examples, [], None)
+    assert [ex.identifier for ex in changed] == ["b"]
+    assert list(unchanged) == ["a"]
+    _write_plan(ws_dir, ["b"])
+    snapshot_cache.process_workspace(ws_dir, config, changed, unchanged, [], None, False)
+
+    assert {p.name: p.read_text() for p in actual_dir.iterdir()} == first_run
+    assert checked[0] == checked[1] == first_run
+    changed, _ = snapshot_cache.partition(ws_dir, config, config.examples, [], None)
+    assert changed == []
+
+
+def test_corrupt_cache_entry_is_a_miss(ws_dir: Path):
+    (ws_dir / snapshot_cache.CACHE_DIR).mkdir()
+    (ws_dir / snapshot_cache.CACHE_DIR / "a.json").write_text("{not json")
+    assert snapshot_cache.load(ws_dir, "a") is None
@@ -0,0 +1,142 @@
+# path-sync copy -n sdlc
+"""Compare dumped plan snapshots with plan_snapshots/ in process.
+
+Mirrors the generated test_plan_snapshot.py (pytest `file_regression`): every
+plan_regression of every configured example is checked, content is compared line by
+line, a missing expected file is created and fails, and `force_regen` rewrites differing
+expected files and fails. Snapshots not passed in memory are read from
+plan_snapshots_actual/, like the pytest path does. Workspaces with `snapshot_layout:
+bundle` read and update snapshot bundles instead of the directories.
+"""
+
+from __future__ import annotations
+
+import difflib
+import enum
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import typer
+
+from workspace import gen, models, snapshot_bundle
+
+
+class SnapshotStatus(enum.StrEnum):
+    PASSED = "PASSED"
+    CHANGED = "CHANGED"
+    REGENERATED = "REGENERATED"
+    CREATED = "CREATED"
+    MISSING_ACTUAL = "MISSING_ACTUAL"
+
+
+@dataclass
+class SnapshotResult:
+    relpath: str
+    status: SnapshotStatus
+    diff: list[str] = field(default_factory=list)
+
+    @property
+    def passed(self) -> bool:
+        return self.status == SnapshotStatus.PASSED
+
+
+def expected_relpaths(config: models.WsConfig) -> list[str]:
+    return [
+        ex.snapshot_relpath(reg.address) for ex in config.examples for reg in ex.plan_regressions
+    ]
+
+
+def compare_content(
+    relpath: str, expected: str | None, actual: str | None, force_regen: bool
+) -> SnapshotResult:
+    """Status of `actual` against `expected`; CREATED/REGENERATED mean `actual` must be stored."""
+    if actual is None:
+        return SnapshotResult(relpath, SnapshotStatus.MISSING_ACTUAL)
+    if expected is None:
+        return SnapshotResult(relpath, SnapshotStatus.CREATED)
+    expected_lines = expected.splitlines()
+    actual_lines = actual.splitlines()
+    if expected_lines == actual_lines:
+        return SnapshotResult(relpath, SnapshotStatus.PASSED)
+    diff = list(
+        difflib.unified_diff(
+            expected_lines,
+            actual_lines,
+            fromfile=f"{gen.PLAN_SNAPSHOTS_DIR}/{relpath}",
+            tofile=f"{gen.PLAN_SNAPSHOTS_ACTUAL_DIR}/{relpath}",
+            lineterm="",
+        )
+    )
+    status = SnapshotStatus.REGENERATED if force_regen else SnapshotStatus.CHANGED
+    return SnapshotResult(relpath, status, diff)
+
+
+def _stored(result: SnapshotResult) -> bool:
+    return result.status in (SnapshotStatus.CREATED, SnapshotStatus.REGENERATED)
+
+
+def compare_snapshot(
+    expected_dir: Path, relpath: str, actual: str | None, force_regen: bool
+) -> SnapshotResult:
+    expected_path = expected_dir / relpath
+    expected = expected_path.read_text() if expected_path.is_file() else None
+    result = compare_content(relpath, expected, actual, force_regen)
+    if _stored(result):
+        assert actual is not None
+        expected_path.parent.mkdir(parents=True, exist_ok=True)
+        expected_path.write_text(actual)
+    return result
+
+
+def compare_workspace(
+    ws_dir: Path, config: models.WsConfig, snapshots: dict[str, str], force_regen: bool
+) -> list[SnapshotResult]:
+    """Check each configured snapshot; `snapshots` maps relpath -> freshly dumped content."""
+    if config.snapshot_layout == models.SnapshotLayout.BUNDLE:
+        return _compare_bundle(ws_dir, config, snapshots, force_regen)
+    expected_dir = ws_dir / gen.PLAN_SNAPSHOTS_DIR
+    actual_dir = ws_dir / gen.PLAN_SNAPSHOTS_ACTUAL_DIR
+    results: list[SnapshotResult] = []
+    for relpath in expected_relpaths(config):
+        actual = snapshots.get(relpath)
+        if actual is None and (actual_dir / relpath).is_file():
+            actual = (actual_dir / relpath).read_text()
+        results.append(compare_snapshot(expected_dir, relpath, actual, force_regen))
+    return results
+
+
+def _compare_bundle(
+    ws_dir: Path, config: models.WsConfig, snapshots: dict[str, str], force_regen: bool
+) -> list[SnapshotResult]:
+    """Like compare_workspace for snapshot bundles; stored snapshots rewrite the bundle once."""
+    bundle_path = ws_dir / snapshot_bundle.EXPECTED_BUNDLE
+    expected = snapshot_bundle.read_bundle(bundle_path)
+    actual_bundle: dict[str, str] | None = None
+    results: list[SnapshotResult] = []
+    for relpath in expected_relpaths(config):
+        actual = snapshots.get(relpath)
+        if actual is None:
+            if actual_bundle is None:
+                actual_bundle = snapshot_bundle.read_bundle(ws_dir / snapshot_bundle.ACTUAL_BUNDLE)
+            actual = actual_bundle.get(relpath)
+        result = compare_content(relpath, expected.get(relpath), actual, force_regen)
+        if _stored(result):
+            assert actual is not None
+            expected[relpath] = actual
+        results.append(result)
+    if any(_stored(r) for r in results):
+        snapshot_bundle.write_bundle(bundle_path, expected)
+    return results
+
+
+def report(results: list[SnapshotResult]) -> bool:
+    """Echo per-snapshot status and diffs; returns True when every snapshot passed."""
+    for result in results:
+        typer.echo(f"  {result.status} {result.relpath}")
+        for line in result.diff:
+            typer.echo(f"    {line}")
+    failed = [r for r in results if not r.passed]
+    typer.echo(f"  Snapshots: {len(results) - len(failed)} passed, {len(failed)} failed")
+    if any(_stored(r) for r in failed):
+        typer.echo("  Expected snapshots were written; rerun to verify")
+    return not failed
@@ -0,0 +1,108 @@
+# path-sync copy -n sdlc
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from workspace import gen, models, snapshot_bundle, snapshot_compare
+
+SnapshotStatus = snapshot_compare.SnapshotStatus
+
+
+def _config() -> models.WsConfig:
+    single = models.Example(name="a", plan_regressions=[models.PlanRegression("x.this")])
+    nested = models.Example(
+        name="b",
+        plan_regressions=[models.PlanRegression("x.this"), models.PlanRegression("y.this")],
+    )
+    return models.WsConfig(examples=[single, nested], var_groups={})
+
+
+def _write_expected(ws_dir: Path, files: dict[str, str]) -> None:
+    for relpath, content in files.items():
+        path = ws_dir / gen.PLAN_SNAPSHOTS_DIR / relpath
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+
+def test_expected_relpaths_follow_nested_layout():
+    assert snapshot_compare.expected_relpaths(_config()) == [
+        "a_x_this.yaml",
+        "b/x_this.yaml",
+        "b/y_this.yaml",
+    ]
+
+
+def test_compare_workspace_statuses(tmp_path: Path):
+    _write_expected(tmp_path, {"a_x_this.yaml": "name: a\n", "b/x_this.yaml": "name: b\n"})
+    snapshots = {"a_x_this.yaml": "name: a", "b/x_this.yaml": "name: changed\n"}
+
+    results = snapshot_compare.compare_workspace(tmp_path, _config(), snapshots, False)
+
+    assert [(r.relpath, r.status) for r in results] == [
+        ("a_x_this.yaml", SnapshotStatus.PASSED),
+        ("b/x_this.yaml", SnapshotStatus.CHANGED),
+        ("b/y_this.yaml", SnapshotStatus.MISSING_ACTUAL),
+    ]
+    assert "-name: b" in results[1].diff
+    assert "+name: changed" in results[1].diff
+
+
+def test_compare_workspace_creates_and_regenerates(tmp_path: Path):
+    _write_expected(tmp_path, {"a_x_this.yaml": "name: old\n"})
+    actual_dir = tmp_path / gen.PLAN_SNAPSHOTS_ACTUAL_DIR / "b"
+    actual_dir.mkdir(parents=True)
+    (actual_dir / "y_this.yaml").write_text("name: from-disk\n")
+    snapshots = {"a_x_this.yaml": "name: new\n", "b/x_this.yaml": "name: b\n"}
+
+    results = snapshot_compare.compare_workspace(tmp_path, _config(), snapshots, True)
+
+    assert [r.status for r in results] == [
+        SnapshotStatus.REGENERATED,
+        SnapshotStatus.CREATED,
+        SnapshotStatus.CREATED,
+    ]
+    expected_dir = tmp_path / gen.PLAN_SNAPSHOTS_DIR
+    assert (expected_dir / "a_x_this.yaml").read_text() == "name: new\n"
+    assert (expected_dir / "b" / "y_this.yaml").read_text() == "name: from-disk\n"
+    assert not snapshot_compare.report(results)
+    rerun = snapshot_compare.compare_workspace(tmp_path, _config(), snapshots, False)
+    assert all(r.passed for r in rerun)
+
+
+def test_report_prints_diff_and_summary(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    _write_expected(tmp_path, {"a_x_this.yaml": "name: a\n"})
+    result = snapshot_compare.compare_snapshot(
+        tmp_path / gen.PLAN_SNAPSHOTS_DIR, "a_x_this.yaml", "name: z\n", False
+    )
+
+    assert not snapshot_compare.report([result])
+    out = capsys.readouterr().out
+    assert "CHANGED a_x_this.yaml" in out
+    assert "+++ plan_snapshots_actual/a_x_this.yaml" in out
+    assert "Snapshots: 0 passed, 1 failed" in out
+
+
+def test_compare_workspace_bundle_layout(tmp_path: Path):
+    config = _config()
+    config.snapshot_layout = models.SnapshotLayout.BUNDLE
+    expected_path = tmp_path / snapshot_bundle.EXPECTED_BUNDLE
+    snapshot_bundle.write_bundle(expected_path, {"a_x_this.yaml": "name: a\n"})
+    snapshot_bundle.write_bundle(
+        tmp_path / snapshot_bundle.ACTUAL_BUNDLE, {"b/y_this.yaml": "name: y\n"}
+    )
+    snapshots = {"a_x_this.yaml": "name: changed\n", "b/x_this.yaml": "name: b\n"}
+
+    results = snapshot_compare.compare_workspace(tmp_path, config, snapshots, force_regen=False)
+    assert [r.status for r in results] == [
+        SnapshotStatus.CHANGED,
+        SnapshotStatus.CREATED,
+        SnapshotStatus.CREATED,
+    ]
+    assert snapshot_bundle.read_bundle(expected_path) == {
+        "a_x_this.yaml": "name: a\n",
+        "b/x_this.yaml": "name: b\n",
+        "b/y_this.yaml": "name: y\n",
+    }
+    assert not (tmp_path / gen.PLAN_SNAPSHOTS_DIR).exists()
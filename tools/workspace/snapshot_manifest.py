@@ -0,0 +1,142 @@
+# path-sync copy -n sdlc
+"""Hash manifest of expected plan snapshots, to skip YAML emission for unchanged ones.
+
+For each snapshot the manifest stores the hash of the filtered resource values it was
+dumped from and the hash of the expected snapshot content. When a new plan filters to
+the same values and the expected snapshot still has the recorded content, that content
+is what the dump would produce, so it is reused without emitting YAML. The manifest is
+refreshed by the in-process comparison and ignored when `FORMAT` changes.
+
+The manifest is committed next to the expected snapshots so fresh checkouts and CI start
+on the fast path. Its content depends only on the filtered values and the expected
+snapshots, not on the machine: both YAML emitters dump byte-identical snapshots (see
+snapshot_yaml), so the PyYAML version and libyaml are not part of `FORMAT`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+from workspace import gen, models, snapshot_bundle, snapshot_compare
+
+SnapshotStatus = snapshot_compare.SnapshotStatus
+
+# Bump when the snapshot filtering or the YAML dump format changes.
+FORMAT = "v2"
+
+
+@dataclass
+class ManifestEntry:
+    values: str
+    snapshot: str
+
+
+@dataclass
+class Manifest:
+    format: str = FORMAT
+    entries: dict[str, ManifestEntry] = field(default_factory=dict)
+    # Values hash of each snapshot dumped in this run and the relpaths whose expected content
+    # was reused; not saved, see `update`.
+    current: dict[str, str] = field(default_factory=dict, repr=False)
+    reused: set[str] = field(default_factory=set, repr=False)
+
+
+def values_hash(filtered: dict[str, Any]) -> str:
+    canonical = json.dumps(filtered, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def manifest_path(ws_dir: Path, config: models.WsConfig) -> Path:
+    if config.snapshot_layout == models.SnapshotLayout.BUNDLE:
+        return ws_dir / snapshot_bundle.BUNDLE_MANIFEST
+    return ws_dir / gen.PLAN_SNAPSHOTS_DIR / snapshot_bundle.FILES_MANIFEST
+
+
+def load(ws_dir: Path, config: models.WsConfig) -> Manifest:
+    """The stored manifest, or an empty one when missing, corrupt or from another FORMAT."""
+    path = manifest_path(ws_dir, config)
+    if not path.is_file():
+        return Manifest()
+    try:
+        data = json.loads(path.read_text())
+    except json.JSONDecodeError:
+        return Manifest()
+    if not isinstance(data, dict) or data.get("format") != FORMAT:
+        return Manifest()
+    entries = {
+        relpath: ManifestEntry(entry.get("values", ""), entry.get("snapshot", ""))
+        for relpath, entry in data.get("entries", {}).items()
+    }
+    return Manifest(entries=entries)
+
+
+def save(ws_dir: Path, config: models.WsConfig, manifest: Manifest) -> None:
+    path = manifest_path(ws_dir, config)
+    data = {
+        "format": manifest.format,
+        "entries": {k: asdict(v) for k, v in manifest.entries.items()},
+    }
+    content = json.dumps(data, indent=1, sort_keys=True) + "\n"
+    if path.is_file() and path.read_text() == content:
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+
+
+def reusable_snapshot(
+    manifest: Manifest, relpath: str, filtered_hash: str, read: Callable[[str], str | None]
+) -> str | None:
+    """The expected snapshot when it is exactly what values with `filtered_hash` dump to."""
+    entry = manifest.entries.get(relpath)
+    if entry is None or entry.values != filtered_hash:
+        return None
+    expected = read(relpath)
+    if expected is None or content_hash(expected) != entry.snapshot:
+        return None
+    return expected
+
+
+def update(
+    ws_dir: Path,
+    config: models.WsConfig,
+    manifest: Manifest,
+    results: list[snapshot_compare.SnapshotResult],
+) -> None:
+    """Record this run's values hashes for snapshots whose expected content is now current,
+    drop entries of unconfigured snapshots and save the manifest.
+    """
+    read = expected_reader(ws_dir, config)
+    current = {SnapshotStatus.PASSED, SnapshotStatus.CREATED, SnapshotStatus.REGENERATED}
+    for result in results:
+        filtered_hash = manifest.current.get(result.relpath)
+        if result.status not in current or filtered_hash is None:
+            continue
+        if result.relpath in manifest.reused:
+            continue
+        if (expected := read(result.relpath)) is not None:
+            manifest.entries[result.relpath] = ManifestEntry(filtered_hash, content_hash(expected))
+    keep = set(snapshot_compare.expected_relpaths(config))
+    manifest.entries = {k: v for k, v in manifest.entries.items() if k in keep}
+    save(ws_dir, config, manifest)
+
+
+def expected_reader(ws_dir: Path, config: models.WsConfig) -> Callable[[str], str | None]:
+    """Function returning the expected content of a relpath (None when missing)."""
+    if config.snapshot_layout == models.SnapshotLayout.BUNDLE:
+        return snapshot_bundle.read_bundle(ws_dir / snapshot_bundle.EXPECTED_BUNDLE).get
+    expected_dir = ws_dir / gen.PLAN_SNAPSHOTS_DIR
+
+    def read(relpath: str) -> str | None:
+        path = expected_dir / relpath
+        return path.read_text() if path.is_file() else None
+
+    return read
@@ -0,0 +1,74 @@
+# path-sync copy -n sdlc
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+import typer
+
+from workspace import gen, models, reg, snapshot_bundle, snapshot_manifest, snapshot_yaml
+
+
+def _config(layout: models.SnapshotLayout) -> models.WsConfig:
+    example = models.Example(number=1, plan_regressions=[models.PlanRegression(address="x.r")])
+    return models.WsConfig(examples=[example], var_groups={}, snapshot_layout=layout)
+
+
+def _run(ws_dir: Path, config: models.WsConfig, values: dict, force_regen: bool = False) -> None:
+    manifest = snapshot_manifest.load(ws_dir, config)
+    resources = {"module.ex_01.x.r": values}
+    dumped = reg.write_actual_snapshots(
+        ws_dir, config, resources, config.examples, manifest=manifest, force_regen=force_regen
+    )
+    reg.check_snapshots(ws_dir, config, reg.flatten_snapshots(dumped), force_regen, False, manifest)
+
+
+@pytest.mark.parametrize("layout", list(models.SnapshotLayout))
+def test_matching_hashes_skip_yaml_emission(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, layout: models.SnapshotLayout
+):
+    config = _config(layout)
+    with pytest.raises(typer.Exit):
+        _run(tmp_path, config, {"name": "r"})
+    _run(tmp_path, config, {"name": "r"})
+    entries = snapshot_manifest.load(tmp_path, config).entries
+    assert list(entries) == ["01_x_r.yaml"]
+
+    dumps: list[dict] = []
+    real_dump = snapshot_yaml.dump
+    monkeypatch.setattr(snapshot_yaml, "dump", lambda v: dumps.append(v) or real_dump(v))
+    _run(tmp_path, config, {"name": "r"})
+    assert dumps == []
+
+    with pytest.raises(typer.Exit):
+        _run(tmp_path, config, {"name": "changed"})
+    assert dumps == [{"name": "changed"}]
+    _run(tmp_path, config, {"name": "r"}, force_regen=True)
+    assert len(dumps) == 2
+
+
+def test_edited_expected_snapshot_is_dumped_again(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    config = _config(models.SnapshotLayout.FILES)
+    with pytest.raises(typer.Exit):
+        _run(tmp_path, config, {"name": "r"})
+    _run(tmp_path, config, {"name": "r"})
+    (tmp_path / gen.PLAN_SNAPSHOTS_DIR / "01_x_r.yaml").write_text("name: edited\n")
+
+    dumps: list[dict] = []
+    real_dump = snapshot_yaml.dump
+    monkeypatch.setattr(snapshot_yaml, "dump", lambda v: dumps.append(v) or real_dump(v))
+    with pytest.raises(typer.Exit):
+        _run(tmp_path, config, {"name": "r"})
+    assert dumps == [{"name": "r"}]
+
+
+def test_load_ignores_other_format(tmp_path: Path):
+    config = _config(models.SnapshotLayout.BUNDLE)
+    path = snapshot_manifest.manifest_path(tmp_path, config)
+    assert path == tmp_path / snapshot_bundle.BUNDLE_MANIFEST
+    entry = {"values": "a", "snapshot": "b"}
+    path.write_text(json.dumps({"format": "v0", "entries": {"01_x_r.yaml": entry}}))
+    assert snapshot_manifest.load(tmp_path, config).entries == {}
+    path.write_text("{")
+    assert snapshot_manifest.load(tmp_path, config).entries == {}
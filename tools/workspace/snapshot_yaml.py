@@ -0,0 +1,73 @@
+# path-sync copy -n sdlc
+"""YAML serializers for plan snapshots.
+
+Every emitter must produce the bytes of `yaml.dump(values, default_flow_style=False,
+sort_keys=True, allow_unicode=True)`, which wrote the committed `plan_snapshots/` files.
+libyaml's C emitter is several times faster than PyYAML's pure-Python one and is used
+whenever PyYAML was built with it, except for documents with a string that needs double
+quotes: libyaml folds long double-quoted scalars at other points than PyYAML, so those
+documents always go through the pure-Python emitter.
+"""
+
+from __future__ import annotations
+
+import enum
+import re
+from typing import Any
+
+import yaml
+
+
+class YamlEmitter(enum.StrEnum):
+    AUTO = "auto"
+    LIBYAML = "libyaml"
+    PYTHON = "python"
+
+
+# Superset of the strings PyYAML emits double-quoted (see yaml.Emitter.analyze_scalar):
+# characters it does not print as-is (allow_unicode=True) and space/line-break pairs.
+_LINE_BREAKS = r"\n\x85\u2028\u2029"
+_DOUBLE_QUOTED = re.compile(
+    r"[^\n\x20-\x7e\xa0-\ud7ff\ue000-\ufffc\U00010000-\U0010fffe]|\ufeff"
+    f"| [{_LINE_BREAKS}]|[{_LINE_BREAKS}] "
+)
+# Mapping keys are also double-quoted when they span lines.
+_DOUBLE_QUOTED_KEY = re.compile(f"{_DOUBLE_QUOTED.pattern}|[{_LINE_BREAKS}]")
+
+
+def needs_double_quotes(values: Any) -> bool:
+    """Whether any string of `values` may be emitted double-quoted."""
+    pending = [values]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, dict):
+            for key, item in value.items():
+                if isinstance(key, str) and _DOUBLE_QUOTED_KEY.search(key):
+                    return True
+                pending.append(item)
+        elif isinstance(value, list):
+            pending.extend(value)
+        elif isinstance(value, str) and _DOUBLE_QUOTED.search(value):
+            return True
+    return False
+
+
+def libyaml_available() -> bool:
+    return bool(getattr(yaml, "__with_libyaml__", False))
+
+
+def resolve_emitter(emitter: YamlEmitter = YamlEmitter.AUTO) -> YamlEmitter:
+    if emitter == YamlEmitter.AUTO:
+        return YamlEmitter.LIBYAML if libyaml_available() else YamlEmitter.PYTHON
+    if emitter == YamlEmitter.LIBYAML and not libyaml_available():
+        raise ValueError("PyYAML was built without libyaml; use the python emitter")
+    return emitter
+
+
+def dump(values: dict[str, Any], emitter: YamlEmitter = YamlEmitter.AUTO) -> str:
+    # CDumper and Dumper share representers, so only the emitter differs.
+    libyaml = resolve_emitter(emitter) == YamlEmitter.LIBYAML and not needs_double_quotes(values)
+    dumper = yaml.CDumper if libyaml else yaml.Dumper
+    return yaml.dump(
+        values, Dumper=dumper, default_flow_style=False, sort_keys=True, allow_unicode=True
+    )
@@ -0,0 +1,83 @@
+# path-sync copy -n sdlc
+from __future__ import annotations
+
+import json
+import random
+import string
+from pathlib import Path
+
+import pytest
+import yaml
+
+from workspace import gen, models, snapshot_yaml
+from workspace.snapshot_yaml import YamlEmitter
+
+SNAPSHOT_FILES = sorted(models.DEFAULT_TESTS_DIR.glob(f"*/{gen.PLAN_SNAPSHOTS_DIR}/**/*.yaml"))
+EMITTERS = [
+    YamlEmitter.PYTHON,
+    pytest.param(
+        YamlEmitter.LIBYAML,
+        marks=pytest.mark.skipif(
+            not snapshot_yaml.libyaml_available(), reason="PyYAML built without libyaml"
+        ),
+    ),
+]
+
+
+@pytest.mark.parametrize("emitter", EMITTERS)
+@pytest.mark.parametrize(
+    "path",
+    SNAPSHOT_FILES,
+    ids=[str(p.relative_to(models.DEFAULT_TESTS_DIR)) for p in SNAPSHOT_FILES],
+)
+def test_dump_reproduces_committed_snapshots(path: Path, emitter: YamlEmitter):
+    content = path.read_text()
+    assert snapshot_yaml.dump(yaml.safe_load(content), emitter) == content
+
+
+@pytest.mark.parametrize("emitter", EMITTERS)
+def test_dump_matches_pyyaml_on_edge_cases(emitter: YamlEmitter):
+    values = {
+        "long": "word " * 40,
+        "multiline": "line1\nline2\n",
+        "unicode": "ünïcødé",
+        "ambiguous": ["yes", "null", "1.0", "", " lead", "a: b", "#c", "~", "2024-01-01"],
+        "numbers": [1, 1.5, True, 1e20],
+        "nested": {"z": [{"k": "v", "a": [1, [2, {"q": "w"}]]}], "empty": {}, "none": []},
+    }
+    expected = yaml.dump(values, default_flow_style=False, sort_keys=True, allow_unicode=True)
+    assert snapshot_yaml.dump(values, emitter) == expected
+
+
+def _pyyaml_dump(values: dict) -> str:
+    return yaml.dump(values, default_flow_style=False, sort_keys=True, allow_unicode=True)
+
+
+@pytest.mark.parametrize("emitter", EMITTERS)
+def test_dump_matches_pyyaml_on_long_double_quoted_strings(emitter: YamlEmitter):
+    policy = {"Statement": [{"Effect": "Allow", "Action": ["s3:GetObject"] * 8, "Id": "a\tb"}]}
+    values = {
+        "policy": json.dumps(policy, indent=2),
+        "multiline": ('say "hi"\n  indented \\ line\t' * 12) + "\n",
+        "quotes": '"' + 'x " y ' * 30 + '"\r',
+        "key with\nbreak": "v",
+        "bom": "\ufeff" + "z " * 60,
+    }
+    assert snapshot_yaml.needs_double_quotes(values)
+    assert snapshot_yaml.dump(values, emitter) == _pyyaml_dump(values)
+
+
+@pytest.mark.parametrize("emitter", EMITTERS)
+def test_dump_matches_pyyaml_on_random_strings(emitter: YamlEmitter):
+    rng = random.Random(0)
+    chars = string.printable + "    éü€\xa0\x85\u2028"
+
+    def text(length: int) -> str:
+        return "".join(rng.choice(chars) for _ in range(length))
+
+    for _ in range(1000):
+        values = {
+            text(rng.choice([1, 90])): [text(rng.choice([5, 100, 300])) for _ in range(2)],
+            "plain": "".join(rng.choice(string.ascii_letters + " '\"-:#") for _ in range(200)),
+        }
+        assert snapshot_yaml.dump(values, emitter) == _pyyaml_dump(values)
@@ -0,0 +1,208 @@
+# path-sync copy -n sdlc
+"""Lightweight span tracing for workspace runs (`workspace.run --trace out.json`).
+
+Spans record wall time, CPU time of this process and CPU time of subprocesses that
+finished inside the span (e.g. terraform), plus attributes such as workspace and
+example. Attributes of enclosing spans are inherited, except those set with `annotate`
+(e.g. resource counts), and a span raising an error is marked failed. Tracing is off
+unless `enable` was called, in which case `span` is close to free. Results are exported
+as Chrome trace-event JSON (chrome://tracing, Perfetto) and summarized as a plain table.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import json
+import os
+import resource
+import threading
+import time
+from collections.abc import Generator
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import typer
+
+_spans: list[Span] | None = None
+_lock = threading.Lock()
+_attrs: contextvars.ContextVar[dict[str, str]] = contextvars.ContextVar("trace_attrs", default={})
+_own_attrs: contextvars.ContextVar[dict[str, str] | None] = contextvars.ContextVar(
+    "trace_own_attrs", default=None
+)
+
+
+@dataclass
+class Span:
+    name: str
+    start_us: int
+    duration_us: int
+    cpu_s: float
+    children_cpu_s: float
+    pid: int
+    tid: int
+    attrs: dict[str, str] = field(default_factory=dict)
+    failed: bool = False
+
+
+def enabled() -> bool:
+    return _spans is not None
+
+
+def enable() -> None:
+    global _spans
+    with _lock:
+        if _spans is None:
+            _spans = []
+
+
+def disable() -> None:
+    global _spans
+    with _lock:
+        _spans = None
+
+
+def collect() -> list[Span]:
+    """Return and clear the spans recorded so far in this process."""
+    if _spans is None:
+        return []
+    with _lock:
+        spans = list(_spans)
+        _spans.clear()
+    return spans
+
+
+def recorded() -> list[Span]:
+    """Return the spans recorded so far in this process without clearing them."""
+    if _spans is None:
+        return []
+    with _lock:
+        return list(_spans)
+
+
+def add(spans: list[Span]) -> None:
+    """Merge spans recorded elsewhere (e.g. returned by a worker process)."""
+    if _spans is not None:
+        with _lock:
+            _spans.extend(spans)
+
+
+def _children_cpu_s() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def annotate(**attrs: object) -> None:
+    """Set attributes of the innermost open span of this thread; nested spans do not get them."""
+    if (own := _own_attrs.get()) is not None:
+        own.update({k: str(v) for k, v in attrs.items() if v is not None})
+
+
+@contextlib.contextmanager
+def span(name: str, **attrs: object) -> Generator[None]:
+    """Record `name` around the block; `attrs` also apply to nested spans."""
+    if _spans is None:
+        yield
+        return
+    merged = _attrs.get() | {k: str(v) for k, v in attrs.items() if v is not None}
+    token = _attrs.set(merged)
+    own: dict[str, str] = {}
+    own_token = _own_attrs.set(own)
+    failed = False
+    start_us = time.time_ns() // 1000
+    start = time.perf_counter_ns()
+    cpu_start = time.process_time()
+    children_start = _children_cpu_s()
+    try:
+        yield
+    except BaseException as e:
+        failed = not (isinstance(e, typer.Exit) and e.exit_code == 0)
+        raise
+    finally:
+        _attrs.reset(token)
+        _own_attrs.reset(own_token)
+        # Children CPU counts every subprocess reaped meanwhile, including ones started by
+        # other threads (e.g. concurrent shards), so it is exact only for sequential runs.
+        recorded = Span(
+            name=name,
+            start_us=start_us,
+            duration_us=(time.perf_counter_ns() - start) // 1000,
+            cpu_s=time.process_time() - cpu_start,
+            children_cpu_s=_children_cpu_s() - children_start,
+            pid=os.getpid(),
+            tid=threading.get_ident(),
+            attrs=merged | own,
+            failed=failed,
+        )
+        add([recorded])
+
+
+def chrome_trace(spans: list[Span]) -> dict[str, object]:
+    events = [
+        {
+            "name": s.name,
+            "cat": s.attrs.get("workspace", "run"),
+            "ph": "X",
+            "ts": s.start_us,
+            "dur": s.duration_us,
+            "pid": s.pid,
+            "tid": s.tid,
+            "args": s.attrs
+            | {"cpu_s": round(s.cpu_s, 3), "children_cpu_s": round(s.children_cpu_s, 3)}
+            | ({"failed": True} if s.failed else {}),
+        }
+        for s in sorted(spans, key=lambda s: (s.start_us, -s.duration_us))
+    ]
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def write_chrome_trace(path: Path, spans: list[Span]) -> None:
+    path.write_text(json.dumps(chrome_trace(spans)) + "\n")
+
+
+def summary_rows(spans: list[Span]) -> list[tuple[str, int, float, float, float, float]]:
+    """(name, count, total wall s, max wall s, cpu s, children cpu s), slowest first."""
+    totals: dict[str, list[float]] = {}
+    for s in spans:
+        row = totals.setdefault(s.name, [0, 0.0, 0.0, 0.0, 0.0])
+        wall = s.duration_us / 1e6
+        row[0] += 1
+        row[1] += wall
+        row[2] = max(row[2], wall)
+        row[3] += s.cpu_s
+        row[4] += s.children_cpu_s
+    rows = [(name, int(r[0]), r[1], r[2], r[3], r[4]) for name, r in totals.items()]
+    return sorted(rows, key=lambda r: r[2], reverse=True)
+
+
+def format_summary(spans: list[Span]) -> str:
+    rows = summary_rows(spans)
+    width = max([len("span"), *(len(r[0]) for r in rows)])
+    lines = [
+        f"{'span':<{width}}  {'count':>5}  {'wall_s':>8}  {'max_s':>8}  {'cpu_s':>7}  "
+        f"{'child_cpu_s':>11}"
+    ]
+    for name, count, wall, max_wall, cpu, children_cpu in rows:
+        lines.append(
+            f"{name:<{width}}  {count:>5}  {wall:>8.2f}  {max_wall:>8.2f}  {cpu:>7.2f}  "
+            f"{children_cpu:>11.2f}"
+        )
+    return "\n".join(lines)
+
+
+@contextlib.contextmanager
+def session(trace_path: Path | None) -> Generator[None]:
+    """Trace the block when `trace_path` is set; write the trace and echo a summary on exit."""
+    if trace_path is None:
+        yield
+        return
+    enable()
+    try:
+        with span("run"):
+            yield
+    finally:
+        spans = collect()
+        disable()
+        write_chrome_trace(trace_path, spans)
+        typer.echo(f"=== Trace summary ({trace_path}) ===")
+        typer.echo(format_summary(spans))
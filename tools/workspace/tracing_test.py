@@ -0,0 +1,80 @@
+# path-sync copy -n sdlc
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+import typer
+
+from workspace import tracing
+
+
+@pytest.fixture(autouse=True)
+def reset_tracing():
+    yield
+    tracing.disable()
+
+
+def test_span_is_noop_when_disabled():
+    with tracing.span("gen", workspace="ws"):
+        pass
+    assert tracing.collect() == []
+
+
+def test_spans_inherit_attributes_and_measure_subprocess_cpu():
+    tracing.enable()
+    with tracing.span("workspace", workspace="ws_a"):
+        with tracing.span("terraform plan", example=None, dir="ws_a"):
+            subprocess.run([sys.executable, "-c", "sum(range(2_000_000))"], check=True)
+
+    inner, outer = tracing.collect()
+    assert (inner.name, outer.name) == ("terraform plan", "workspace")
+    assert inner.attrs == {"workspace": "ws_a", "dir": "ws_a"}
+    assert outer.attrs == {"workspace": "ws_a"}
+    assert inner.children_cpu_s > 0
+    assert outer.duration_us >= inner.duration_us
+
+
+def test_annotations_and_failures_apply_to_own_span_only():
+    tracing.enable()
+    with pytest.raises(typer.Exit):
+        with tracing.span("workspace", workspace="ws_a"):
+            tracing.annotate(resources=3)
+            with tracing.span("terraform init"):
+                tracing.annotate(retries=1, skipped=None)
+            raise typer.Exit(1)
+
+    inner, outer = tracing.collect()
+    assert inner.attrs == {"workspace": "ws_a", "retries": "1"}
+    assert not inner.failed
+    assert outer.attrs == {"workspace": "ws_a", "resources": "3"}
+    assert outer.failed
+    tracing.annotate(resources=1)  # outside any span: ignored
+
+
+def test_session_writes_chrome_trace_and_summary(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str]
+):
+    trace_path = tmp_path / "out.json"
+    worker_span = tracing.Span("terraform init", 1, 2_000_000, 0.1, 3.0, 99, 1, {"workspace": "w"})
+
+    with tracing.session(trace_path):
+        with tracing.span("gen", workspace="w"):
+            pass
+        tracing.add([worker_span])
+
+    events = json.loads(trace_path.read_text())["traceEvents"]
+    assert {e["name"] for e in events} == {"run", "gen", "terraform init"}
+    init_event = next(e for e in events if e["name"] == "terraform init")
+    assert init_event["ph"] == "X"
+    assert init_event["cat"] == "w"
+    assert init_event["args"]["children_cpu_s"] == 3.0
+    out = capsys.readouterr().out
+    assert "Trace summary" in out
+    lines = out.splitlines()
+    header = next(i for i, line in enumerate(lines) if line.startswith("span"))
+    assert lines[header + 1].startswith("terraform init")
+    assert tracing.collect() == []